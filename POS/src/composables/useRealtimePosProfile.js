@@ -17,6 +17,7 @@
  * @module composables/useRealtimePosProfile
  */
 
+import { setDocRooms } from "@/socket"
 import { logger } from "@/utils/logger"
 import { readonly, ref } from "vue"
 
@@ -321,6 +322,15 @@ export function useRealtimePosProfile() {
 		}
 	}
 
+	/**
+	 * Join the realtime room of the POS Profile in use; profile events are only
+	 * published to the room of the affected profile
+	 * @param {string} posProfile - POS Profile name
+	 */
+	function subscribeProfile(posProfile) {
+		setDocRooms("POS Profile", [posProfile])
+	}
+
 	/**
 	 * Gets current handler count (useful for debugging)
 	 * @returns {number}
@@ -348,6 +358,7 @@ export function useRealtimePosProfile() {
 
 		// Primary API
 		onPosProfileUpdate,
+		subscribeProfile,
 
 		// Control methods (typically not needed - auto-managed)
 		startListening,
@@ -3,12 +3,27 @@
  *
  * Listens to Socket.IO events for stock changes and notifies registered handlers.
  * Provides intelligent event management with deduplication and batching.
- * Each handler is responsible for filtering by warehouse and updating its cache.
+ * Stock events are published to per-warehouse rooms: call subscribeWarehouses()
+ * with the terminal's warehouses to receive them. Each handler is still
+ * responsible for filtering by warehouse and updating its cache.
+ *
+ * Events carry a per-warehouse sequence number. A gap (missed events while
+ * offline) or a reconnect replays the missing events from the server log
+ * (pos_next.api.stock_events.get_stock_events_since); when they are no longer
+ * available, registered resync handlers are asked to reload stock instead.
+ *
+ * "delta" events (server in delta mode) carry delta_qty instead of absolute
+ * quantities. Deltas of the same item are summed within a batch; deltas of
+ * invoices this terminal submitted itself are dropped (see ignoreVoucher),
+ * since it reloads that stock directly. Warehouses that received deltas are
+ * reconciled with a full reload every STOCK_DELTA_RECONCILE_MS to correct drift.
  *
  * Performance optimization: Batch delay and size are dynamically adjusted
  * based on device CPU cores and performance tier.
  */
 
+import { setDocRooms } from "@/socket"
+import { call } from "@/utils/apiWrapper"
 import { performanceConfig } from "@/utils/performanceConfig"
 import { logger } from "@/utils/logger"
 import { ref } from "vue"
@@ -21,6 +36,20 @@ const eventHandlers = new Set()
 const pendingUpdates = new Map()
 let batchTimeout = null
 
+// Sequence tracking per warehouse room: warehouse -> { seq, epoch }
+const sequences = new Map()
+const resyncHandlers = new Set()
+// warehouse -> events received while a replay for it is running
+const replaying = new Map()
+
+// Invoices submitted from this terminal, whose deltas are already reflected locally
+const ignoredVouchers = new Set()
+const MAX_IGNORED_VOUCHERS = 200
+// Warehouses that received deltas since the last reconcile
+const STOCK_DELTA_RECONCILE_MS = 5 * 60 * 1000
+const deltaWarehouses = new Set()
+let reconcileInterval = null
+
 /**
  * Batch update configuration - dynamically adjusted based on device performance
  * Low-end devices (800ms, 50 items): More batching to reduce CPU load
@@ -77,10 +106,11 @@ function scheduleBatchUpdate() {
 }
 
 /**
- * Handle incoming stock update event
+ * Queue the updates of one event for the next batch
  */
-function handleStockUpdate(data) {
-	if (!data || !data.stock_updates) {
+function applyStockEvent(data) {
+	if (data.event_type === "delta") {
+		applyDeltaEvent(data)
 		return
 	}
 
@@ -93,6 +123,154 @@ function handleStockUpdate(data) {
 	scheduleBatchUpdate()
 }
 
+/**
+ * Queue the deltas of one event, summing them with pending updates of the same item
+ */
+function applyDeltaEvent(data) {
+	data.stock_updates.forEach((update) => {
+		if (!update.is_cancelled && ignoredVouchers.has(update.voucher)) {
+			return
+		}
+
+		const key = `${update.item_code}|${update.warehouse}`
+		const pending = pendingUpdates.get(key)
+		if (!pending) {
+			pendingUpdates.set(key, { ...update })
+		} else if (pending.delta_qty != null) {
+			pending.delta_qty += update.delta_qty
+		} else {
+			// Absolute quantity still pending: move it
+			pending.actual_qty += update.delta_qty
+			pending.stock_qty = pending.actual_qty
+		}
+		deltaWarehouses.add(update.warehouse)
+	})
+
+	scheduleReconcile()
+	scheduleBatchUpdate()
+}
+
+/**
+ * Periodically reload warehouses that were kept up to date by deltas
+ */
+function scheduleReconcile() {
+	if (reconcileInterval || deltaWarehouses.size === 0) {
+		return
+	}
+
+	reconcileInterval = setInterval(() => {
+		if (deltaWarehouses.size === 0) {
+			clearInterval(reconcileInterval)
+			reconcileInterval = null
+			return
+		}
+
+		const warehouses = Array.from(deltaWarehouses)
+		deltaWarehouses.clear()
+		warehouses.forEach((warehouse) => requestResync(warehouse, "reconcile"))
+	}, STOCK_DELTA_RECONCILE_MS)
+}
+
+/**
+ * Ask resync handlers to reload stock of a warehouse from the server
+ */
+function requestResync(warehouse, reason = "missed") {
+	if (reason === "reconcile") {
+		log.info(`Reconciling stock of ${warehouse} after applying deltas`)
+	} else {
+		log.warn(`Stock events for ${warehouse} are no longer available, resyncing`)
+	}
+	resyncHandlers.forEach((handler) => {
+		try {
+			handler(warehouse)
+		} catch (error) {
+			log.error("Resync handler error", error)
+		}
+	})
+}
+
+/**
+ * Replay the events of a warehouse published after the last applied one
+ */
+async function replayWarehouse(warehouse) {
+	const known = sequences.get(warehouse)
+	if (!known || replaying.has(warehouse)) {
+		return
+	}
+
+	replaying.set(warehouse, [])
+	try {
+		const response = await call("pos_next.api.stock_events.get_stock_events_since", {
+			warehouse,
+			seq: known.seq,
+			epoch: known.epoch,
+		})
+		const result = response?.message || response || {}
+
+		if (result.full_resync) {
+			requestResync(warehouse)
+		} else {
+			;(result.events || []).forEach(applyStockEvent)
+		}
+		sequences.set(warehouse, { seq: result.seq, epoch: result.epoch })
+	} catch (error) {
+		log.error(`Failed to replay stock events for ${warehouse}`, error)
+	} finally {
+		// Events that arrived meanwhile: already replayed ones are dropped by their seq
+		const buffered = replaying.get(warehouse) || []
+		replaying.delete(warehouse)
+		buffered.forEach(handleStockUpdate)
+	}
+}
+
+/**
+ * Handle incoming stock update event
+ */
+function handleStockUpdate(data) {
+	if (!data || !data.stock_updates) {
+		return
+	}
+
+	const warehouse = data.warehouses?.[0]
+	if (data.seq == null || !warehouse) {
+		applyStockEvent(data)
+		return
+	}
+
+	if (replaying.has(warehouse)) {
+		replaying.get(warehouse).push(data)
+		return
+	}
+
+	const known = sequences.get(warehouse)
+	if (known && known.epoch === data.epoch) {
+		if (data.seq <= known.seq) {
+			return // Already applied
+		}
+		if (data.seq > known.seq + 1) {
+			// Missed events: replay them (this one included)
+			replayWarehouse(warehouse)
+			return
+		}
+	} else if (known) {
+		// Server log was reset
+		replayWarehouse(warehouse)
+		return
+	}
+
+	sequences.set(warehouse, { seq: data.seq, epoch: data.epoch })
+	applyStockEvent(data)
+}
+
+/**
+ * After a reconnect, catch up on every warehouse seen so far
+ */
+function handleReconnect() {
+	for (const warehouse of sequences.keys()) {
+		replayWarehouse(warehouse)
+	}
+}
+
 /**
  * Handle invoice created event (optional, for future use)
  */
@@ -116,6 +294,7 @@ function startListening() {
 	// Subscribe to stock update events
 	window.frappe.realtime.on("pos_stock_update", handleStockUpdate)
 	window.frappe.realtime.on("pos_invoice_created", handleInvoiceCreated)
+	window.frappe.realtime.socket?.on?.("connect", handleReconnect)
 
 	isListening.value = true
 }
@@ -131,6 +310,7 @@ function stopListening() {
 	if (window.frappe?.realtime) {
 		window.frappe.realtime.off("pos_stock_update", handleStockUpdate)
 		window.frappe.realtime.off("pos_invoice_created", handleInvoiceCreated)
+		window.frappe.realtime.socket?.off?.("connect", handleReconnect)
 	}
 
 	// Clear pending updates
@@ -138,7 +318,12 @@ function stopListening() {
 		clearTimeout(batchTimeout)
 		batchTimeout = null
 	}
+	if (reconcileInterval) {
+		clearInterval(reconcileInterval)
+		reconcileInterval = null
+	}
 	pendingUpdates.clear()
+	deltaWarehouses.clear()
 
 	isListening.value = false
 }
@@ -186,12 +371,54 @@ export function useRealtimeStock() {
 		}
 	}
 
+	/**
+	 * Register a callback for when missed stock events cannot be replayed, or
+	 * stock kept up to date by deltas is due for reconciling; it should reload stock quantities of the
+	 * given warehouse from the server
+	 * @param {Function} handler - Called with the warehouse name
+	 * @returns {Function} Cleanup function to unregister handler
+	 */
+	function onStockResync(handler) {
+		if (typeof handler !== "function") {
+			throw new Error("Handler must be a function")
+		}
+		resyncHandlers.add(handler)
+		return () => resyncHandlers.delete(handler)
+	}
+
+	/**
+	 * Join the realtime rooms of the warehouses this terminal sells from
+	 * (and leave any others)
+	 * @param {Array<string>} warehouses - Warehouse names
+	 */
+	function subscribeWarehouses(warehouses) {
+		setDocRooms("Warehouse", warehouses)
+	}
+
+	/**
+	 * Ignore the stock deltas of an invoice this terminal submitted and
+	 * reloaded stock for itself (its cancellation is still applied)
+	 * @param {string} voucher - Sales Invoice name
+	 */
+	function ignoreVoucher(voucher) {
+		if (!voucher) {
+			return
+		}
+		ignoredVouchers.add(voucher)
+		if (ignoredVouchers.size > MAX_IGNORED_VOUCHERS) {
+			ignoredVouchers.delete(ignoredVouchers.values().next().value)
+		}
+	}
+
 	// Note: Each handler is responsible for its own cleanup via the returned cleanup function.
 	// The singleton listener remains active as long as there are registered handlers.
 
 	return {
 		isListening,
 		onStockUpdate,
+		onStockResync,
+		subscribeWarehouses,
+		ignoreVoucher,
 		flushUpdates,
 		startListening,
 		stopListening,
@@ -66,3 +66,71 @@ export function disconnectSocket() {
 export function useSocket() {
 	return socket
 }
+
+// ============================================================================
+// Scoped realtime rooms
+// ============================================================================
+// The server publishes stock and POS Profile events to the Frappe document
+// rooms of the affected Warehouse / POS Profile (doc:<doctype>/<name>) instead
+// of broadcasting them to every user. Joining such a room needs read
+// permission on the document; joined rooms are re-joined after a reconnect.
+
+const joinedRooms = new Map() // "doctype/name" -> [doctype, name]
+let rejoinRegistered = false
+
+function getRealtimeSocket() {
+	return window.frappe?.realtime?.socket || socket
+}
+
+function emitRoom(action, doctype, name) {
+	const realtime = window.frappe?.realtime
+	if (action === "doc_subscribe" && realtime?.doc_subscribe) {
+		realtime.doc_subscribe(doctype, name)
+	} else if (action === "doc_unsubscribe" && realtime?.doc_unsubscribe) {
+		realtime.doc_unsubscribe(doctype, name)
+	} else {
+		getRealtimeSocket()?.emit(action, doctype, name)
+	}
+}
+
+function registerRejoin() {
+	const realtimeSocket = getRealtimeSocket()
+	if (rejoinRegistered || !realtimeSocket?.on) {
+		return
+	}
+	realtimeSocket.on("connect", () => {
+		for (const [doctype, name] of joinedRooms.values()) {
+			emitRoom("doc_subscribe", doctype, name)
+		}
+	})
+	rejoinRegistered = true
+}
+
+export function joinDocRoom(doctype, name) {
+	if (!doctype || !name) return
+	const key = `${doctype}/${name}`
+	if (joinedRooms.has(key)) return
+
+	joinedRooms.set(key, [doctype, name])
+	registerRejoin()
+	emitRoom("doc_subscribe", doctype, name)
+}
+
+export function leaveDocRoom(doctype, name) {
+	const key = `${doctype}/${name}`
+	if (!joinedRooms.delete(key)) return
+	emitRoom("doc_unsubscribe", doctype, name)
+}
+
+// Keep exactly the given documents of a doctype joined
+export function setDocRooms(doctype, names) {
+	const wanted = new Set((names || []).filter(Boolean))
+	for (const [currentDoctype, name] of [...joinedRooms.values()]) {
+		if (currentDoctype === doctype && !wanted.has(name)) {
+			leaveDocRoom(doctype, name)
+		}
+	}
+	for (const name of wanted) {
+		joinDocRoom(doctype, name)
+	}
+}
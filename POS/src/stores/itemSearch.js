@@ -1,4 +1,4 @@
-import { call } from "@/utils/apiWrapper"
+import { call, conditionalCall } from "@/utils/apiWrapper"
 import { isOffline } from "@/utils/offline"
 import { offlineWorker } from "@/utils/offline/workerClient"
 import { performanceConfig } from "@/utils/performanceConfig"
@@ -16,7 +16,7 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 	const stockStore = useStockStore()
 
 	// Real-time POS Profile updates
-	const { onPosProfileUpdate } = useRealtimePosProfile()
+	const { onPosProfileUpdate, subscribeProfile } = useRealtimePosProfile()
 
 	// State
 	const allItems = ref([]) // For browsing (lazy loaded)
@@ -37,6 +37,7 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 
 	// Lazy loading state - dynamically adjusted based on device performance
 	const currentOffset = ref(0)
+	const nextCursor = ref(null) // Keyset cursor from get_items (null = fall back to offset paging)
 	const itemsPerPage = computed(() => performanceConfig.get("itemsPerPage")) // Reactive: auto-adjusted 20/50/100 based on device
 	const hasMore = ref(true)
 	const totalItemsLoaded = ref(0)
@@ -601,6 +602,7 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 
 		// Reset pagination state
 		currentOffset.value = 0
+		nextCursor.value = null
 		hasMore.value = true
 		totalItemsLoaded.value = 0
 
@@ -773,20 +775,24 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 				log.debug(`Fetching ${itemsPerPage.value} items (no filters)`)
 
 				// Fetch first batch (e.g., 20-50 items) for fast initial render
+				// Cursor mode (after: "") so later pages cost the same as the first
 				const response = await call("pos_next.api.items.get_items", {
 					pos_profile: profile,
 					search_term: "",
 					item_group: null, // No filter - get items from all groups
-					start: 0,
 					limit: itemsPerPage.value,
+					after: "",
+					order_by: "popularity", // Profile's best sellers first
 				})
-				const list = response?.message || response || []
+				const page = response?.message || response || {}
+				const list = page.items || []
 
 				if (list.length > 0) {
 					// Store first batch in allItems
 					replaceAllItems(list)
 					totalItemsLoaded.value = list.length
 					currentOffset.value = list.length
+					nextCursor.value = page.next_cursor || null
 
 					// Enable infinite scroll - more items available
 					// loadMoreItems() will fetch additional batches as user scrolls
@@ -964,16 +970,27 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 
 		try {
 			// Fetch next batch from server
-			// start: currentOffset (e.g., 50 after first batch)
+			// after: keyset cursor from the previous page (preferred, flat cost per page)
+			// start: currentOffset (e.g., 50 after first batch) when no cursor is known
 			// limit: itemsPerPage (e.g., 50 items per batch)
-			const response = await call("pos_next.api.items.get_items", {
+			const params = {
 				pos_profile: posProfile.value,
 				search_term: "",
 				item_group: null, // No filter - get items from all groups
-				start: currentOffset.value,
 				limit: itemsPerPage.value,
-			})
-			const list = response?.message || response || []
+				order_by: "popularity", // Same ordering as the first batch
+			}
+			if (nextCursor.value) {
+				params.after = JSON.stringify(nextCursor.value)
+			} else {
+				params.start = currentOffset.value
+			}
+			const response = await call("pos_next.api.items.get_items", params)
+			const page = response?.message || response || []
+			const list = Array.isArray(page) ? page : page.items || []
+			if (nextCursor.value) {
+				nextCursor.value = page.next_cursor || null
+			}
 
 			if (list.length > 0) {
 				// Append new items to existing allItems array (maintains reactivity)
@@ -1385,7 +1402,7 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 		// Fetch item groups from POS Profile FIRST
 		if (profile) {
 			try {
-				const data = await call("pos_next.api.pos_profile.get_pos_profile_data", {
+				const data = await conditionalCall("pos_next.api.pos_profile.get_pos_profile_data", {
 					pos_profile: profile
 				})
 
@@ -1402,6 +1419,7 @@ export const useItemSearchStore = defineStore("itemSearch", () => {
 				posProfileUpdateCleanup = onPosProfileUpdate(async (updateData) => {
 					await handlePosProfileUpdateWithRecovery(updateData, profile)
 				})
+				subscribeProfile(profile)
 
 				log.debug("Real-time POS Profile update listener registered")
 
@@ -15,9 +15,14 @@
  */
 
 import { useToast } from "@/composables/useToast"
+import { call } from "@/utils/apiWrapper"
 import {
 	cacheCustomersFromServer,
+	cacheItemsFromServer,
 	cachePaymentMethodsFromServer,
+	loadCatalogSnapshot,
+	saveItemsSyncToken,
+	syncItemsDeltaFromServer,
 	syncOfflineInvoices,
 } from "@/utils/offline"
 import { logger } from "@/utils/logger"
@@ -28,6 +33,9 @@ import { computed, ref } from "vue"
 
 const log = logger.create('POSSync')
 
+// Items per get_stock_quantities call when refreshing snapshot stock
+const SNAPSHOT_STOCK_BATCH_SIZE = 500
+
 export const usePOSSyncStore = defineStore("posSync", () => {
 	// =========================================================================
 	// STATE
@@ -165,6 +173,53 @@ export const usePOSSyncStore = defineStore("posSync", () => {
 		}
 	}
 
+	/**
+	 * Bring cached items up to date with the changes since the last sync token.
+	 * Without a token (cache filled before delta sync existed, or page by page),
+	 * or when the server cannot send a delta (token too old, too many changes),
+	 * the whole catalog is reloaded; later syncs continue from the token taken
+	 * before that reload, which is only stored once the items are cached.
+	 * @param {string} profile - POS Profile name
+	 */
+	async function syncItemChanges(profile) {
+		const delta = await syncItemsDeltaFromServer(profile)
+		if (!delta.full_resync) {
+			return
+		}
+
+		log.info('Item delta not available, reloading the catalog')
+		const { items, syncToken } = await cacheItemsFromServer(profile)
+		if (items.length > 0) {
+			await offlineWorker.clearItemsCache()
+			await offlineWorker.cacheItems(items)
+		}
+		await saveItemsSyncToken(profile, syncToken)
+	}
+
+	/**
+	 * Replace the stock quantities of snapshot items with current ones.
+	 * A snapshot can be up to a day old, and the item delta sync carries no stock.
+	 * @param {Object} profile - POS profile (its warehouse is used)
+	 * @param {Array} items - Items loaded from the snapshot
+	 */
+	async function refreshSnapshotStock(profile, items) {
+		if (!profile.warehouse || !items.length) {
+			return
+		}
+
+		const itemCodes = items.map((item) => item.item_code)
+		for (let i = 0; i < itemCodes.length; i += SNAPSHOT_STOCK_BATCH_SIZE) {
+			const response = await call("pos_next.api.items.get_stock_quantities", {
+				item_codes: JSON.stringify(itemCodes.slice(i, i + SNAPSHOT_STOCK_BATCH_SIZE)),
+				warehouse: profile.warehouse,
+			})
+			const stockData = response?.message || response || []
+			if (stockData.length) {
+				await offlineWorker.updateStockQuantities(stockData)
+			}
+		}
+	}
+
 	// =========================================================================
 	// PUBLIC ACTIONS
 	// =========================================================================
@@ -270,12 +325,38 @@ export const usePOSSyncStore = defineStore("posSync", () => {
 				// Continue with other data loading
 			}
 
+			// Patch cached items incrementally (the first sync without a token reloads and seeds one)
+			if (cacheReady) {
+				try {
+					await syncItemChanges(currentProfile.name)
+				} catch (error) {
+					log.error('Failed to sync item changes', error)
+				}
+			}
+
 			// Load customers if cache needs refresh
 			if (!cacheReady || needsRefresh) {
-				showSuccess(__("Loading customers for offline use..."))
-
-				const customersData = await cacheCustomersFromServer(currentProfile.name)
-				await cacheData([], customersData.customers || [])
+				// Fresh or wiped terminal: one snapshot download instead of paginated loads
+				const snapshot = !cacheReady ? await loadCatalogSnapshot(currentProfile.name) : null
+
+				if (snapshot) {
+					showSuccess(__("Loading catalog for offline use..."))
+					if (await cacheData(snapshot.items, snapshot.customers)) {
+						await saveItemsSyncToken(currentProfile.name, snapshot.header.sync_token)
+					}
+					// Catch up on what changed since the snapshot was built
+					await syncItemChanges(currentProfile.name).catch((error) =>
+						log.error('Failed to sync item changes after snapshot', error),
+					)
+					await refreshSnapshotStock(currentProfile, snapshot.items).catch((error) =>
+						log.error('Failed to refresh stock after snapshot', error),
+					)
+				} else {
+					showSuccess(__("Loading customers for offline use..."))
+
+					const customersData = await cacheCustomersFromServer(currentProfile.name)
+					await cacheData([], customersData.customers || [])
+				}
 
 				showSuccess(__("Data is ready for offline use"))
 			}
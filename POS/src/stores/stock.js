@@ -106,6 +106,23 @@ export const useStockStore = defineStore('stock', () => {
 		})
 	)
 
+	// Apply signed qty changes from realtime "delta" events
+	// Items not loaded yet, or loaded for another warehouse, are skipped
+	// Returns the resulting absolute quantities, for persisting to IndexedDB
+	const applyDeltas = (deltaUpdates) => {
+		const applied = []
+		deltaUpdates?.forEach(delta => {
+			const current = server.value.get(delta.item_code)
+			// Quantities are per warehouse: a sale elsewhere does not move this one
+			if (!current || current.warehouse !== delta.warehouse) return
+
+			const qty = (Number(current.qty) || 0) + (Number(delta.delta_qty) || 0)
+			server.value.set(delta.item_code, { ...current, qty, ts: Date.now() })
+			applied.push({ item_code: delta.item_code, warehouse: current.warehouse, actual_qty: qty, stock_qty: qty })
+		})
+		return applied
+	}
+
 	// Refresh stock from server (direct API call)
 	// Called after invoice submission, manual refresh, or warehouse change
 	// Snapshots reservations before fetching to prevent UI flicker
@@ -183,6 +200,7 @@ export const useStockStore = defineStore('stock', () => {
 		init,
 		reserve,
 		update,
+		applyDeltas,
 		refresh,
 		setWarehouse: (targetWarehouse) => warehouse.value = targetWarehouse,
 		clear: () => reserved.value.clear(),
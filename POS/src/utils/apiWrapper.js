@@ -1,6 +1,6 @@
 import { call as frappeCall } from "frappe-ui"
 
-import { forceRefreshCSRFToken, isCSRFApiError } from "./csrf"
+import { forceRefreshCSRFToken, getCSRFTokenFromCookie, isCSRFApiError } from "./csrf"
 
 // Wrapped call function with CSRF auto-refresh
 export async function call(method, params) {
@@ -26,3 +26,57 @@ export async function call(method, params) {
 		throw error
 	}
 }
+
+// Last response per request, replayed when the server answers 304 Not Modified
+const conditionalResponses = new Map()
+
+function conditionalHeaders(etag) {
+	const headers = {
+		Accept: "application/json",
+		"Content-Type": "application/json; charset=utf-8",
+		"X-Frappe-Site-Name": window.location.hostname,
+	}
+	const token = window.csrf_token || getCSRFTokenFromCookie()
+	if (token && token !== "{{ csrf_token }}") {
+		headers["X-Frappe-CSRF-Token"] = token
+	}
+	if (etag) {
+		headers["If-None-Match"] = etag
+	}
+	return headers
+}
+
+// Like call(), but revalidates with the ETag of the previous response so an
+// unchanged result costs an empty 304 (see pos_next.api.change_tracking).
+// Errors go through call() for its error handling and CSRF retry.
+export async function conditionalCall(method, params = {}) {
+	const key = `${method}:${JSON.stringify(params)}`
+	const cached = conditionalResponses.get(key)
+
+	let response
+	try {
+		response = await fetch(`/api/method/${method}`, {
+			method: "POST",
+			headers: conditionalHeaders(cached?.etag),
+			body: JSON.stringify(params),
+		})
+	} catch {
+		return await call(method, params)
+	}
+
+	if (response.status === 304 && cached) {
+		return cached.message
+	}
+	if (!response.ok) {
+		return await call(method, params)
+	}
+
+	const data = await response.json()
+	const etag = response.headers.get("ETag")
+	if (etag) {
+		conditionalResponses.set(key, { etag, message: data.message })
+	} else {
+		conditionalResponses.delete(key)
+	}
+	return data.message
+}
@@ -1,4 +1,5 @@
-import { call } from "@/utils/apiWrapper"
+import { call, conditionalCall } from "@/utils/apiWrapper"
+import { decodeColumnar, supportsCompressedCatalog } from "./columnar"
 import { db, getSetting, setSetting } from "./db"
 import { offlineState } from "./offlineState"
 
@@ -157,41 +158,168 @@ export const toggleManualOffline = async () => {
 	return newState
 }
 
+// Searchable barcode list of a server item row (barcode string or item_barcode rows)
+const getItemBarcodes = (item) => {
+	if (item.barcode) {
+		return [item.barcode]
+	}
+	if (!item.item_barcode) {
+		return []
+	}
+	return Array.isArray(item.item_barcode)
+		? item.item_barcode.map((b) => (typeof b === "object" ? b.barcode : b)).filter(Boolean)
+		: [item.item_barcode]
+}
+
 // Load items from server (returns data for worker to cache)
+// Also returns the sync token taken before the load: store it with saveItemsSyncToken
+// once the items are cached, so the next refresh can go through syncItemsDeltaFromServer
 export const cacheItemsFromServer = async (posProfile) => {
 	try {
 		console.log("Fetching items from server...")
 
-		const response = await call("pos_next.api.items.get_items", {
+		// A token request without since_token only returns a fresh token (full_resync)
+		const tokenResponse = await call("pos_next.api.items.get_items_delta", {
+			pos_profile: posProfile,
+		})
+		const syncToken = (tokenResponse?.message || tokenResponse)?.sync_token || null
+
+		// Full catalog loads use the compact columnar format (gzip when the browser can inflate it)
+		const response = await conditionalCall("pos_next.api.items.get_items", {
 			pos_profile: posProfile,
 			start: 0,
 			limit: 9999, // Get all items
+			format: "columnar",
+			compress: supportsCompressedCatalog() ? "gzip" : undefined,
 		})
 
-		if (response.message && Array.isArray(response.message)) {
-			const items = response.message
+		const payload = response?.message || response
+		const items = payload ? await decodeColumnar(payload) : null
+
+		if (Array.isArray(items)) {
 
 			// Process items to add searchable fields
 			const processedItems = items.map((item) => ({
 				...item,
-				barcodes: item.item_barcode
-					? Array.isArray(item.item_barcode)
-						? item.item_barcode.map((b) => b.barcode).filter(Boolean)
-						: [item.item_barcode]
-					: [],
+				barcodes: getItemBarcodes(item),
 			}))
 
 			console.log(`Fetched ${processedItems.length} items from server`)
-			return { items: processedItems }
+			return { items: processedItems, syncToken }
 		}
 
-		return { items: [] }
+		return { items: [], syncToken: null }
 	} catch (error) {
 		console.error("Error fetching items from server:", error)
 		throw error
 	}
 }
 
+// Store the sync token of a completed catalog load
+export const saveItemsSyncToken = async (posProfile, syncToken) => {
+	await setSetting(`items_sync_token:${posProfile}`, syncToken || null)
+}
+
+// Patch cached items with changes since the last sync (pos_next.api.items.get_items_delta)
+// Returns { full_resync: true } when the catalog must be reloaded via cacheItemsFromServer:
+// no token yet (the reload seeds one), or the server cannot send a delta. The token is
+// only advanced here when the delta was applied.
+export const syncItemsDeltaFromServer = async (posProfile) => {
+	try {
+		const tokenKey = `items_sync_token:${posProfile}`
+		const sinceToken = await getSetting(tokenKey, null)
+		if (!sinceToken) {
+			return { full_resync: true, updated: 0, deleted: 0 }
+		}
+
+		const response = await call("pos_next.api.items.get_items_delta", {
+			pos_profile: posProfile,
+			since_token: sinceToken,
+		})
+		const delta = response?.message || response || {}
+
+		if (delta.full_resync) {
+			return { full_resync: true, updated: 0, deleted: 0 }
+		}
+
+		const changedItems = (delta.items || []).map((item) => ({
+			...item,
+			barcodes: getItemBarcodes(item),
+		}))
+
+		if (changedItems.length) {
+			await db.items.bulkPut(changedItems)
+		}
+		if (delta.deleted?.length) {
+			await db.items.bulkDelete(delta.deleted)
+		}
+
+		console.log(
+			`Item delta sync: ${changedItems.length} updated, ${delta.deleted?.length || 0} removed`,
+		)
+
+		await setSetting(tokenKey, delta.sync_token || null)
+		return {
+			full_resync: false,
+			updated: changedItems.length,
+			deleted: delta.deleted?.length || 0,
+		}
+	} catch (error) {
+		console.error("Error syncing item changes from server:", error)
+		throw error
+	}
+}
+
+// Load the server-built catalog snapshot of a POS Profile (pos_next.api.catalog_snapshot)
+// in one download. Store header.sync_token with saveItemsSyncToken once the items are
+// cached, so later refreshes go through syncItemsDeltaFromServer.
+// Returns null when no complete snapshot is available yet.
+export const loadCatalogSnapshot = async (posProfile) => {
+	try {
+		const info = await call("pos_next.api.catalog_snapshot.get_catalog_snapshot_info", {
+			pos_profile: posProfile,
+		})
+		const snapshot = info?.message || info
+		if (!snapshot?.url) {
+			return null
+		}
+
+		// Served with Content-Encoding: gzip, the browser inflates it
+		const response = await fetch(snapshot.url, { credentials: "include" })
+		if (!response.ok) {
+			return null
+		}
+
+		const result = { header: null, items: [], customers: [], offers: [], counts: null }
+		const collections = { item: result.items, customer: result.customers, offer: result.offers }
+		for (const line of (await response.text()).split("\n")) {
+			if (!line) continue
+			const record = JSON.parse(line)
+			if (record.type === "header") {
+				result.header = record
+			} else if (record.type === "end") {
+				result.counts = record.counts
+			} else {
+				collections[record.type]?.push(record.data)
+			}
+		}
+
+		// A missing trailer means a truncated download
+		if (!result.header || result.counts?.item !== result.items.length) {
+			console.warn("Incomplete catalog snapshot, ignoring it")
+			return null
+		}
+
+		console.log(
+			`Loaded catalog snapshot ${result.header.version}: ${result.items.length} items, ${result.customers.length} customers`,
+		)
+		return result
+	} catch (error) {
+		console.error("Error loading catalog snapshot:", error)
+		return null
+	}
+}
+
 // Load customers from server (returns data for worker to cache)
 export const cacheCustomersFromServer = async (posProfile) => {
 	try {
@@ -374,7 +502,7 @@ export const getCacheStats = async () => {
  */
 export async function cachePaymentMethodsFromServer(posProfile) {
 	try {
-		const result = await call("pos_next.api.pos_profile.get_payment_methods", {
+		const result = await conditionalCall("pos_next.api.pos_profile.get_payment_methods", {
 			pos_profile: posProfile,
 		})
 		const paymentMethods = result?.message || result || []
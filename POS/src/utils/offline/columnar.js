@@ -0,0 +1,62 @@
+// Decoder for the columnar catalog format (pos_next.api.wire_format)
+
+const decoders = {
+	dict: (dictionary) => (code) => (code === null ? null : dictionary[code]),
+	uom_list: (dictionary) => (pairs) =>
+		pairs === null
+			? null
+			: pairs.map(([code, factor]) => ({
+					uom: dictionary[code],
+					conversion_factor: factor,
+				})),
+	uom_map: (dictionary) => (pairs) => {
+		if (pairs === null) return null
+		const map = {}
+		for (const [code, rate] of pairs) {
+			// A null UOM serializes as the "null" key in the dict format
+			map[code === null ? "null" : dictionary[code]] = rate
+		}
+		return map
+	},
+}
+
+// True when the browser can inflate gzip payloads natively
+export const supportsCompressedCatalog = () => typeof DecompressionStream !== "undefined"
+
+async function inflate(payload) {
+	if (payload.compression !== "gzip") {
+		throw new Error(`Unsupported catalog compression: ${payload.compression}`)
+	}
+	const bytes = Uint8Array.from(atob(payload.data), (c) => c.charCodeAt(0))
+	const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"))
+	return JSON.parse(await new Response(stream).text())
+}
+
+// Turn a columnar (optionally compressed) response back into a list of item dicts
+export async function decodeColumnar(payload) {
+	if (payload?.compression) {
+		payload = await inflate(payload)
+	}
+	if (payload?.format !== "columnar") {
+		throw new Error("Not a columnar payload")
+	}
+
+	const sparse = new Set(payload.sparse || [])
+	const columns = Object.entries(payload.columns).map(([field, values]) => {
+		const [kind, domain] = (payload.encoding[field] || "").split(":")
+		const decode = kind ? decoders[kind](payload.dictionaries[domain] || []) : null
+		return { field, values, decode, sparse: sparse.has(field) }
+	})
+
+	const rows = new Array(payload.count)
+	for (let i = 0; i < payload.count; i++) {
+		const row = {}
+		for (const column of columns) {
+			const value = column.values[i]
+			if (column.sparse && value === null) continue
+			row[column.field] = column.decode ? column.decode(value) : value
+		}
+		rows[i] = row
+	}
+	return rows
+}
@@ -48,6 +48,9 @@ export {
 	isStockCacheReady,
 	isManualOffline,
 	cacheItemsFromServer,
+	syncItemsDeltaFromServer,
+	saveItemsSyncToken,
+	loadCatalogSnapshot,
 	cacheCustomersFromServer,
 	cachePaymentMethodsFromServer,
 	getCachedPaymentMethods,
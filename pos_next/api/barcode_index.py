@@ -0,0 +1,334 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Unified scan-code resolution index for search_by_barcode.
+
+A single Redis hash maps every scannable code to what it identifies:
+
+	code -> "<kind>|<item_code>|<uom>"
+
+where kind is B (Item Barcode), I (item code), A (custom_alias) or S (serial
+number). When one code matches several sources the priority of the original
+lookup chain applies: barcode, then item code, then alias, then serial.
+
+Item hooks keep barcodes, codes and aliases current; a rename also reindexes
+the item's serial numbers, whose item_code is rewritten without document
+events. Serial numbers are also created by bulk inserts that fire no document
+events, so the index is read-repaired: a miss, or an entry pointing at an item
+that no longer exists, falls back to the original lookups and stores whatever
+they find. Serial status and warehouse change with every stock movement and
+are therefore never cached; they are checked on the (primary key) read that
+fetches the serial's MRP anyway.
+"""
+
+import frappe
+
+BARCODE_INDEX_KEY = "pos_next:barcode_index"
+# Field present once a full build has completed; fetched together with the scanned code
+BARCODE_INDEX_READY_FIELD = "\x00ready"
+BARCODE_INDEX_BATCH_SIZE = 5000
+
+KIND_BARCODE = "B"
+KIND_ITEM = "I"
+KIND_ALIAS = "A"
+KIND_SERIAL = "S"
+# Lower wins when a code is claimed by several sources
+_KIND_PRIORITY = {KIND_BARCODE: 0, KIND_ITEM: 1, KIND_ALIAS: 2, KIND_SERIAL: 3}
+
+
+def _index_key():
+	return frappe.cache().make_key(BARCODE_INDEX_KEY)
+
+
+def _encode(kind, item_code, uom=None):
+	return f"{kind}|{item_code}|{uom or ''}"
+
+
+def _decode(value):
+	kind, item_code, uom = frappe.safe_decode(value).split("|", 2)
+	return kind, item_code, uom or None
+
+
+def resolve_barcode(code, warehouse):
+	"""
+	Resolve a scanned code to the item it identifies.
+
+	Args:
+		code: Scanned barcode, item code, alias or serial number
+		warehouse: POS Profile warehouse; serial numbers only resolve when Active there
+
+	Returns:
+		frappe._dict | None: {item_code, uom, serial_no, serial_mrp}
+	"""
+	if not code:
+		return None
+
+	cache = frappe.cache()
+	value, ready = cache.hmget(_index_key(), [code, BARCODE_INDEX_READY_FIELD])
+	if not ready:
+		enqueue_barcode_index_rebuild()
+
+	if value:
+		kind, item_code, uom = _decode(value)
+		if kind == KIND_SERIAL:
+			serial = _get_active_serial(code, warehouse)
+			if serial and serial.item_code == item_code:
+				return serial
+		elif frappe.get_cached_value("Item", item_code, "name"):
+			return _item_match(item_code, uom)
+
+		# Stale entry (renamed or deleted item) or inactive serial: resolve from the database
+		_delete_entries([code], item_code)
+
+	kind, resolved = _resolve_from_database(code, warehouse)
+	if resolved:
+		_set_entries([(code, kind, resolved.item_code, resolved.uom)])
+	return resolved
+
+
+def _get_active_serial(serial_no, warehouse):
+	serial = frappe.db.get_value(
+		"Serial No",
+		{"name": serial_no, "status": "Active", "warehouse": warehouse},
+		["item_code", "mrp"],
+		as_dict=True,
+	)
+	if not serial:
+		return None
+
+	return frappe._dict(
+		{"item_code": serial.item_code, "uom": None, "serial_no": serial_no, "serial_mrp": serial.mrp}
+	)
+
+
+def _item_match(item_code, uom=None):
+	return frappe._dict({"item_code": item_code, "uom": uom, "serial_no": None, "serial_mrp": None})
+
+
+def _resolve_from_database(code, warehouse):
+	"""
+	The original sequential lookup chain, used for index misses.
+
+	Returns:
+		tuple: (kind, match) - (None, None) when nothing matches
+	"""
+	barcode_data = frappe.db.get_value("Item Barcode", {"barcode": code}, ["parent", "uom"], as_dict=True)
+	if barcode_data:
+		return KIND_BARCODE, _item_match(barcode_data.parent, barcode_data.uom)
+
+	item_code = frappe.db.get_value("Item", {"name": code})
+	if item_code:
+		return KIND_ITEM, _item_match(item_code)
+
+	item_code = frappe.db.get_value("Item", {"custom_alias": code, "disabled": 0})
+	if item_code:
+		return KIND_ALIAS, _item_match(item_code)
+
+	serial = _get_active_serial(code, warehouse)
+	if serial:
+		return KIND_SERIAL, serial
+
+	return None, None
+
+
+def _set_entries(entries):
+	"""
+	Write (code, kind, item_code, uom) entries, keeping claims of other items
+	with a higher priority. Failures are only logged: the index is an accelerator.
+	"""
+	entries = [entry for entry in entries if entry[0]]
+	if not entries:
+		return
+
+	try:
+		cache = frappe.cache()
+		key = _index_key()
+		existing = cache.hmget(key, [entry[0] for entry in entries])
+
+		pipe = cache.pipeline(transaction=False)
+		for (code, kind, item_code, uom), current in zip(entries, existing, strict=True):
+			if current:
+				current_kind, current_item, _current_uom = _decode(current)
+				if current_item != item_code and _KIND_PRIORITY[current_kind] < _KIND_PRIORITY[kind]:
+					continue
+			pipe.hset(key, code, _encode(kind, item_code, uom))
+		pipe.execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Barcode Index Update Error")
+
+
+def _delete_entries(codes, item_code):
+	"""Remove codes from the index if they still point at item_code."""
+	codes = [code for code in codes if code]
+	if not codes:
+		return
+
+	try:
+		cache = frappe.cache()
+		key = _index_key()
+		existing = cache.hmget(key, codes)
+
+		pipe = cache.pipeline(transaction=False)
+		for code, value in zip(codes, existing, strict=True):
+			if value and _decode(value)[1] == item_code:
+				pipe.hdel(key, code)
+		pipe.execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Barcode Index Update Error")
+
+
+def _get_item_entries(doc):
+	"""All (code, kind, item_code, uom) entries an Item document contributes."""
+	entries = [(doc.name, KIND_ITEM, doc.name, None)]
+	if doc.get("custom_alias") and not doc.disabled:
+		entries.append((doc.custom_alias, KIND_ALIAS, doc.name, None))
+	for row in doc.get("barcodes") or []:
+		if row.barcode:
+			entries.append((row.barcode, KIND_BARCODE, doc.name, row.uom))
+	return entries
+
+
+def enqueue_barcode_index_rebuild():
+	frappe.enqueue(
+		"pos_next.api.barcode_index.rebuild_barcode_index",
+		queue="long",
+		job_id="pos_next_rebuild_barcode_index",
+		deduplicate=True,
+	)
+
+
+def reindex_item_serials(item_code):
+	"""Point the index entries of an item's active serial numbers at item_code."""
+	last_serial_no = ""
+	while True:
+		serial_nos = frappe.db.sql_list(
+			"""
+			SELECT name
+			FROM `tabSerial No`
+			WHERE item_code = %s AND status = 'Active' AND name > %s
+			ORDER BY name
+			LIMIT %s
+			""",
+			(item_code, last_serial_no, BARCODE_INDEX_BATCH_SIZE),
+		)
+		if not serial_nos:
+			break
+		_set_entries([(serial_no, KIND_SERIAL, item_code, None) for serial_no in serial_nos])
+		last_serial_no = serial_nos[-1]
+
+
+def rebuild_barcode_index():
+	"""
+	Build the index from scratch.
+
+	Sources are written from lowest to highest priority so that a code claimed
+	by several sources ends up with the claim the lookup chain would pick.
+	"""
+	cache = frappe.cache()
+	key = _index_key()
+	cache.delete(key)
+
+	def write(rows, kind):
+		pipe = cache.pipeline(transaction=False)
+		for position, (code, item_code, uom) in enumerate(rows, 1):
+			if code:
+				pipe.hset(key, code, _encode(kind, item_code, uom))
+			if position % BARCODE_INDEX_BATCH_SIZE == 0:
+				pipe.execute()
+		pipe.execute()
+
+	# Serial numbers can run into millions: page through them by primary key
+	last_serial_no = ""
+	while True:
+		serial_rows = frappe.db.sql(
+			"""
+			SELECT name, item_code, NULL
+			FROM `tabSerial No`
+			WHERE status = 'Active' AND name > %s
+			ORDER BY name
+			LIMIT %s
+			""",
+			(last_serial_no, BARCODE_INDEX_BATCH_SIZE),
+		)
+		if not serial_rows:
+			break
+		write(serial_rows, KIND_SERIAL)
+		last_serial_no = serial_rows[-1][0]
+	write(
+		frappe.db.sql(
+			"""
+			SELECT custom_alias, name, NULL
+			FROM `tabItem`
+			WHERE disabled = 0 AND IFNULL(custom_alias, '') != ''
+			"""
+		),
+		KIND_ALIAS,
+	)
+	write(frappe.db.sql("SELECT name, name, NULL FROM `tabItem`"), KIND_ITEM)
+	write(
+		frappe.db.sql(
+			"""
+			SELECT barcode, parent, uom
+			FROM `tabItem Barcode`
+			WHERE parenttype = 'Item' AND IFNULL(barcode, '') != ''
+			"""
+		),
+		KIND_BARCODE,
+	)
+
+	pipe = cache.pipeline(transaction=False)
+	pipe.hset(key, BARCODE_INDEX_READY_FIELD, "1")
+	pipe.execute()
+
+
+# ---------------------------------------------------------------------------
+# Document hooks
+# ---------------------------------------------------------------------------
+# Item Barcode rows are children of Item and fire no document events of their
+# own, so they are maintained from the Item hooks.
+
+
+def on_item_update(doc, method=None):
+	entries = _get_item_entries(doc)
+
+	previous = doc.get_doc_before_save()
+	stale_codes = []
+	if previous:
+		current_codes = {entry[0] for entry in entries}
+		stale_codes = [entry[0] for entry in _get_item_entries(previous) if entry[0] not in current_codes]
+
+	def update():
+		_delete_entries(stale_codes, doc.name)
+		_set_entries(entries)
+
+	frappe.db.after_commit.add(update)
+
+
+def on_item_trash(doc, method=None):
+	codes = [entry[0] for entry in _get_item_entries(doc)]
+	frappe.db.after_commit.add(lambda: _delete_entries(codes, doc.name))
+
+
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+	entries = _get_item_entries(doc)
+
+	def update():
+		_delete_entries([old], old)
+		_set_entries(entries)
+		frappe.enqueue(
+			"pos_next.api.barcode_index.reindex_item_serials",
+			queue="long",
+			item_code=new,
+		)
+
+	frappe.db.after_commit.add(update)
+
+
+def on_serial_no_update(doc, method=None):
+	entries = [(doc.name, KIND_SERIAL, doc.item_code, None)]
+	frappe.db.after_commit.add(lambda: _set_entries(entries))
+
+
+def on_serial_no_trash(doc, method=None):
+	frappe.db.after_commit.add(lambda: _delete_entries([doc.name], doc.item_code))
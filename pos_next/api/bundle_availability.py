@@ -0,0 +1,288 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Materialized Product Bundle availability.
+
+Bundle availability (min over components of floor(available / required)) is
+stored per bundle in a Redis hash keyed by warehouse:
+
+	pos_next:bundle_availability:<bundle> -> {warehouse: qty}
+
+Group warehouses are stored as requested, i.e. computed over their leaf
+descendants, exactly like the on-the-fly calculation in pos_next.api.items.
+
+Entries are invalidated only for the bundles whose component stock changed,
+in the warehouse where it changed and all of its parent groups, and are
+recomputed lazily on the next read:
+
+- Stock Ledger Entry submits (actual qty) invalidate right after commit.
+- Reserved qty moves without a ledger entry, so a per-minute sweep picks up
+  Bin rows modified since the previous sweep.
+- Product Bundle changes drop the bundle; Warehouse changes drop everything.
+
+A global generation counter is bumped (after commit) on every invalidation.
+It is read before anything the recomputation reads, and component stock is
+read with a locking read, which sees the latest committed Bin rows rather
+than the request's transaction snapshot; recomputed values are only written
+back if the generation is still the one read first.
+"""
+
+import frappe
+from frappe.utils import cint, now_datetime
+
+from pos_next.api.warehouse_tree import get_warehouse_ancestors
+
+BUNDLE_AVAILABILITY_KEY_PREFIX = "pos_next:bundle_availability:"
+BUNDLE_DEFINITIONS_CACHE_KEY = "pos_next:bundle_definitions"
+BUNDLE_GENERATION_KEY = "pos_next:bundle_availability_generation"
+BUNDLE_BIN_WATERMARK_KEY = "pos_next:bundle_availability_bin_watermark"
+# Safety net for changes that slipped past every invalidation path
+BUNDLE_AVAILABILITY_TTL = 6 * 60 * 60
+# Stored for items that have a Product Bundle but no component with a positive qty
+NOT_A_BUNDLE = "-"
+
+# Write back recomputed values only if the generation is unchanged.
+# KEYS: generation key, bundle hash keys...; ARGV: generation, ttl, then field/value pairs per key
+_WRITE_BACK_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+	return 0
+end
+local position = 3
+for i = 2, #KEYS do
+	local count = tonumber(ARGV[position])
+	position = position + 1
+	for _ = 1, count do
+		redis.call('HSET', KEYS[i], ARGV[position], ARGV[position + 1])
+		position = position + 2
+	end
+	redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+return 1
+"""
+
+
+def _bundle_key(bundle_code):
+	return frappe.cache().make_key(f"{BUNDLE_AVAILABILITY_KEY_PREFIX}{bundle_code}")
+
+
+def _get_generation():
+	cache = frappe.cache()
+	return cint(cache.get(cache.make_key(BUNDLE_GENERATION_KEY)))
+
+
+def get_bundle_definitions():
+	"""Return {bundle_code: [(component_code, required_qty), ...]} (cached)."""
+
+	def _load():
+		definitions = {}
+		rows = frappe.db.sql(
+			"""
+			SELECT pb.new_item_code, pbi.item_code, pbi.qty
+			FROM `tabProduct Bundle` pb
+			INNER JOIN `tabProduct Bundle Item` pbi ON pbi.parent = pb.name
+			"""
+		)
+		for bundle_code, component_code, required_qty in rows:
+			definitions.setdefault(bundle_code, []).append((component_code, required_qty))
+		return definitions
+
+	return frappe.cache().get_value(BUNDLE_DEFINITIONS_CACHE_KEY, generator=_load)
+
+
+def _has_valid_components(components):
+	return any(qty and qty > 0 for _component, qty in components)
+
+
+def _read_cells(cells):
+	"""HGET many (bundle, warehouse) cells in one round trip."""
+	pipe = frappe.cache().pipeline(transaction=False)
+	for bundle_code, warehouse in cells:
+		pipe.hget(_bundle_key(bundle_code), warehouse)
+	return dict(zip(cells, pipe.execute(), strict=True))
+
+
+def _write_cells(values, generation):
+	"""Store {(bundle, warehouse): value} unless an invalidation raced the computation."""
+	if not values:
+		return
+
+	by_bundle = {}
+	for (bundle_code, warehouse), value in values.items():
+		by_bundle.setdefault(bundle_code, []).append((warehouse, value))
+
+	keys = [frappe.cache().make_key(BUNDLE_GENERATION_KEY)]
+	args = [generation, BUNDLE_AVAILABILITY_TTL]
+	for bundle_code, cells in by_bundle.items():
+		keys.append(_bundle_key(bundle_code))
+		args.append(len(cells))
+		for warehouse, value in cells:
+			args.extend([warehouse, value])
+
+	try:
+		frappe.cache().eval(_WRITE_BACK_SCRIPT, len(keys), *keys, *args)
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Bundle Availability Cache Error")
+
+
+def _decode_cells(cells, bundle_codes, warehouses):
+	"""Turn raw cell values into {bundle: {warehouse: qty}}, skipping non-bundles."""
+	result = {}
+	for bundle_code in bundle_codes:
+		for warehouse in warehouses:
+			value = frappe.safe_decode(cells.get((bundle_code, warehouse)))
+			if value is not None and value != NOT_A_BUNDLE:
+				result.setdefault(bundle_code, {})[warehouse] = cint(value)
+	return result
+
+
+def get_bundle_availability(item_codes, warehouses):
+	"""
+	Return materialized availability as {bundle_code: {warehouse: qty}}.
+
+	item_codes may contain non-bundle items; they are ignored. Cells missing from
+	the store are recomputed with the bulk calculation and written back.
+	"""
+	from pos_next.api.items import _compute_bundle_warehouse_availability_bulk
+
+	# First: any invalidation committed after this read makes the write-back fail
+	generation = _get_generation()
+	definitions = get_bundle_definitions()
+	bundle_codes = [code for code in dict.fromkeys(item_codes or []) if code in definitions]
+	warehouses = [warehouse for warehouse in dict.fromkeys(warehouses or []) if warehouse]
+	if not bundle_codes or not warehouses:
+		return {}
+
+	cells = _read_cells([(bundle_code, warehouse) for bundle_code in bundle_codes for warehouse in warehouses])
+	missing = [cell for cell, value in cells.items() if value is None]
+
+	if missing:
+		missing_bundles = list(dict.fromkeys(cell[0] for cell in missing))
+		missing_warehouses = list(dict.fromkeys(cell[1] for cell in missing))
+		computed = _compute_bundle_warehouse_availability_bulk(missing_bundles, missing_warehouses)
+
+		values = {}
+		for bundle_code in missing_bundles:
+			valid = _has_valid_components(definitions[bundle_code])
+			for warehouse in missing_warehouses:
+				if valid:
+					values[(bundle_code, warehouse)] = str(computed.get(bundle_code, {}).get(warehouse, 0))
+				else:
+					values[(bundle_code, warehouse)] = NOT_A_BUNDLE
+
+		_write_cells(values, generation)
+		cells.update({cell: values[cell] for cell in missing})
+
+	return _decode_cells(cells, bundle_codes, warehouses)
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+
+def invalidate_bundle_components(pairs):
+	"""
+	Drop materialized cells affected by stock changes.
+
+	Args:
+		pairs: Iterable of (item_code, warehouse) whose Bin changed
+	"""
+	components = {}
+	for bundle_code, rows in get_bundle_definitions().items():
+		for component_code, _qty in rows:
+			components.setdefault(component_code, set()).add(bundle_code)
+
+	warehouses_by_bundle = {}
+	for item_code, warehouse in pairs:
+		for bundle_code in components.get(item_code, ()):
+			warehouses_by_bundle.setdefault(bundle_code, set()).add(warehouse)
+
+	if not warehouses_by_bundle:
+		return
+
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=False)
+	pipe.incr(cache.make_key(BUNDLE_GENERATION_KEY))
+	for bundle_code, warehouses in warehouses_by_bundle.items():
+		affected = get_warehouse_ancestors(warehouses)
+		if affected:
+			pipe.hdel(_bundle_key(bundle_code), *affected)
+	pipe.execute()
+
+
+def clear_bundle_availability(bundle_codes=None):
+	"""Drop materialized availability for the given bundles, or for all bundles."""
+	cache = frappe.cache()
+	cache.incr(cache.make_key(BUNDLE_GENERATION_KEY))
+	if bundle_codes is None:
+		cache.delete_keys(BUNDLE_AVAILABILITY_KEY_PREFIX)
+		return
+
+	keys = [_bundle_key(bundle_code) for bundle_code in bundle_codes if bundle_code]
+	if keys:
+		cache.delete(*keys)
+
+
+def on_stock_ledger_entry_submit(doc, method=None):
+	"""Stock Ledger Entry on_submit: invalidate once per transaction, after commit."""
+	pending = frappe.flags.setdefault("pos_next_bundle_stock_changes", set())
+	if not pending:
+		frappe.db.after_commit.add(_flush_stock_changes)
+		frappe.db.after_rollback.add(lambda: frappe.flags.pop("pos_next_bundle_stock_changes", None))
+	pending.add((doc.item_code, doc.warehouse))
+
+
+def _flush_stock_changes():
+	pending = frappe.flags.pop("pos_next_bundle_stock_changes", None)
+	if pending:
+		try:
+			invalidate_bundle_components(pending)
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Bundle Availability Invalidation Error")
+
+
+def on_product_bundle_change(doc, method=None):
+	bundle_codes = {doc.new_item_code}
+	previous = doc.get_doc_before_save() if method == "on_update" else None
+	if previous:
+		bundle_codes.add(previous.new_item_code)
+
+	def clear():
+		frappe.cache().delete_value(BUNDLE_DEFINITIONS_CACHE_KEY)
+		clear_bundle_availability(bundle_codes)
+
+	frappe.db.after_commit.add(clear)
+
+
+def on_warehouse_change(doc, method=None, *args, **kwargs):
+	frappe.db.after_commit.add(clear_bundle_availability)
+
+
+def sweep_bin_changes():
+	"""
+	Scheduled every minute: invalidate cells for Bin rows modified since the
+	previous sweep (covers reserved qty, which moves without ledger entries).
+	"""
+	cache = frappe.cache()
+	started_at = now_datetime()
+	watermark = frappe.safe_decode(cache.get(cache.make_key(BUNDLE_BIN_WATERMARK_KEY)))
+
+	if watermark:
+		component_codes = {
+			component_code
+			for rows in get_bundle_definitions().values()
+			for component_code, _qty in rows
+		}
+		if component_codes:
+			changed = frappe.db.sql(
+				"""
+				SELECT item_code, warehouse
+				FROM `tabBin`
+				WHERE modified >= %s AND item_code IN %s
+				""",
+				(watermark, tuple(component_codes)),
+			)
+			invalidate_bundle_components(changed)
+
+	cache.set(cache.make_key(BUNDLE_BIN_WATERMARK_KEY), str(started_at))
@@ -0,0 +1,281 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Per-POS-Profile catalog snapshot files for provisioning terminals.
+
+A new or wiped terminal would otherwise page through get_items and
+get_customers. Instead a background job writes the whole catalog of a
+profile to one gzip-compressed NDJSON file under the site directory:
+
+	<site>/pos_snapshots/<profile hash>-<version>.ndjson.gz
+
+One JSON object per line:
+
+	{"type": "header", "format": 1, "pos_profile", "version", "built_at", "sync_token"}
+	{"type": "item", "data": {...}}        rows exactly as returned by get_items
+	{"type": "customer", "data": {...}}    rows as returned by get_customers
+	{"type": "offer", "data": {...}}       rows as returned by get_offers
+	{"type": "end", "counts": {"item": n, "customer": n, "offer": n}}
+
+Items carry their prices, barcode, UOMs and stock. After loading the file,
+the terminal continues with get_items_delta from the header's sync_token,
+which was issued before anything was read. Stock in the file is as old as
+the snapshot and the delta sync carries none, so the terminal then reloads
+quantities for its warehouse with get_stock_quantities.
+
+Snapshots are rebuilt hourly when the catalog changed since the last build,
+at least once a day (stock), and whenever the POS Profile is saved.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from urllib.parse import urlencode
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, get_datetime, now_datetime
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from pos_next.api.change_tracking import get_change_version
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_DIRECTORY = "pos_snapshots"
+SNAPSHOT_BATCH_SIZE = 1000
+SNAPSHOT_MAX_AGE_HOURS = 24
+
+# Changes to these rebuild the snapshot; terminals refresh stock themselves after loading it
+SNAPSHOT_DOCTYPES = (
+	"Customer",
+	"Customer Group",
+	"Item",
+	"Item Group",
+	"Item Price",
+	"POS Offer",
+	"POS Profile",
+	"Price List",
+	"Pricing Rule",
+	"Product Bundle",
+	"Promotional Scheme",
+)
+
+
+def _profile_slug(pos_profile):
+	return hashlib.sha1(pos_profile.encode()).hexdigest()[:16]
+
+
+def _manifest_path(pos_profile):
+	return frappe.get_site_path(SNAPSHOT_DIRECTORY, f"{_profile_slug(pos_profile)}.json")
+
+
+def _read_manifest(pos_profile):
+	try:
+		with open(_manifest_path(pos_profile)) as f:
+			return json.load(f)
+	except (OSError, ValueError):
+		return None
+
+
+def _write_atomic(path, write):
+	tmp_path = f"{path}.{frappe.generate_hash(length=8)}.tmp"
+	try:
+		write(tmp_path)
+		os.replace(tmp_path, path)
+	finally:
+		if os.path.exists(tmp_path):
+			os.remove(tmp_path)
+
+
+def _dump_json(data, path):
+	with open(path, "w") as f:
+		json.dump(data, f)
+
+
+def _iter_items(pos_profile_doc):
+	"""Yield enriched catalog rows in batches, paged by item_name keyset."""
+	from pos_next.api.items import ITEM_RESULT_COLUMNS, _build_item_base_conditions, _enrich_items
+
+	last_name, last_code = None, None
+	while True:
+		conditions, params = _build_item_base_conditions(pos_profile_doc)
+		if last_code is not None:
+			conditions.append("(item_name > %s OR (item_name = %s AND name > %s))")
+			params.extend([last_name, last_name, last_code])
+
+		items = frappe.db.sql(
+			f"""
+			SELECT {ITEM_RESULT_COLUMNS}
+			FROM `tabItem`
+			WHERE {" AND ".join(conditions)}
+			ORDER BY item_name ASC, name ASC
+			LIMIT %s
+			""",
+			(*params, SNAPSHOT_BATCH_SIZE),
+			as_dict=1,
+		)
+		if not items:
+			break
+
+		last_name, last_code = items[-1]["item_name"], items[-1]["item_code"]
+		yield _enrich_items(items, pos_profile_doc)
+
+
+def build_catalog_snapshot(pos_profile):
+	"""Write a new snapshot of a POS Profile and replace the previous one."""
+	from pos_next.api.customers import get_customers
+	from pos_next.api.items import _encode_sync_token
+	from pos_next.api.offers import get_offers
+
+	pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
+	built_at = now_datetime()
+	catalog_version = get_change_version(SNAPSHOT_DOCTYPES)
+	version = f"{built_at:%Y%m%d%H%M%S}-{frappe.generate_hash(length=6)}"
+	file_name = f"{_profile_slug(pos_profile)}-{version}.ndjson.gz"
+	directory = frappe.get_site_path(SNAPSHOT_DIRECTORY)
+	os.makedirs(directory, exist_ok=True)
+
+	header = {
+		"type": "header",
+		"format": SNAPSHOT_FORMAT_VERSION,
+		"pos_profile": pos_profile,
+		"version": version,
+		"built_at": str(built_at),
+		# Taken before reading so nothing written meanwhile is skipped by the delta sync
+		"sync_token": _encode_sync_token(pos_profile, built_at),
+	}
+	counts = {"item": 0, "customer": 0, "offer": 0}
+
+	def write(path):
+		with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+
+			def emit(record):
+				f.write(frappe.as_json(record, indent=None, separators=(",", ":")))
+				f.write("\n")
+
+			emit(header)
+			for items in _iter_items(pos_profile_doc):
+				for item in items:
+					emit({"type": "item", "data": item})
+				counts["item"] += len(items)
+			for customer in get_customers(pos_profile=pos_profile, limit=0):
+				emit({"type": "customer", "data": customer})
+				counts["customer"] += 1
+			for offer in get_offers(pos_profile):
+				emit({"type": "offer", "data": offer})
+				counts["offer"] += 1
+			emit({"type": "end", "counts": counts})
+
+	path = os.path.join(directory, file_name)
+	_write_atomic(path, write)
+
+	previous = _read_manifest(pos_profile)
+	manifest = {
+		"pos_profile": pos_profile,
+		"version": version,
+		"file": file_name,
+		"built_at": str(built_at),
+		"catalog_version": catalog_version,
+		"size": os.path.getsize(path),
+		"counts": counts,
+	}
+	_write_atomic(_manifest_path(pos_profile), lambda p: _dump_json(manifest, p))
+
+	if previous and previous.get("file") != file_name:
+		old_path = os.path.join(directory, previous["file"])
+		if os.path.exists(old_path):
+			os.remove(old_path)
+
+	return manifest
+
+
+def enqueue_catalog_snapshot_build(pos_profile):
+	frappe.enqueue(
+		"pos_next.api.catalog_snapshot.build_catalog_snapshot",
+		queue="long",
+		job_id=f"pos_next_build_catalog_snapshot::{pos_profile}",
+		deduplicate=True,
+		pos_profile=pos_profile,
+	)
+
+
+def _needs_rebuild(manifest):
+	if not manifest:
+		return True
+	if get_datetime(manifest["built_at"]) < add_to_date(now_datetime(), hours=-SNAPSHOT_MAX_AGE_HOURS):
+		return True
+	return manifest.get("catalog_version") != get_change_version(SNAPSHOT_DOCTYPES)
+
+
+def refresh_catalog_snapshots():
+	"""Scheduled hourly: queue a rebuild of every enabled profile whose snapshot is stale."""
+	for pos_profile in frappe.get_all("POS Profile", filters={"disabled": 0}, pluck="name"):
+		if _needs_rebuild(_read_manifest(pos_profile)):
+			enqueue_catalog_snapshot_build(pos_profile)
+
+
+def on_pos_profile_update(doc, method=None):
+	"""POS Profile on_update: filters or price list may have changed."""
+	frappe.db.after_commit.add(lambda: enqueue_catalog_snapshot_build(doc.name))
+
+
+# ---------------------------------------------------------------------------
+# Download
+# ---------------------------------------------------------------------------
+
+
+def _check_profile_access(pos_profile):
+	if not frappe.db.exists("POS Profile User", {"parent": pos_profile, "user": frappe.session.user}):
+		frappe.throw(_("You don't have access to this POS Profile"), frappe.PermissionError)
+
+
+@frappe.whitelist()
+def get_catalog_snapshot_info(pos_profile):
+	"""
+	Describe the current snapshot of a POS Profile.
+
+	Returns:
+		dict: {"version", "built_at", "size", "counts", "url"}, or None when no
+		snapshot exists yet (a build is queued; use the paginated APIs meanwhile)
+	"""
+	_check_profile_access(pos_profile)
+
+	manifest = _read_manifest(pos_profile)
+	if not manifest:
+		enqueue_catalog_snapshot_build(pos_profile)
+		return None
+
+	return {
+		"version": manifest["version"],
+		"built_at": manifest["built_at"],
+		"size": manifest["size"],
+		"counts": manifest["counts"],
+		"url": "/api/method/pos_next.api.catalog_snapshot.download_catalog_snapshot?"
+		+ urlencode({"pos_profile": pos_profile}),
+	}
+
+
+@frappe.whitelist(methods=["GET"])
+def download_catalog_snapshot(pos_profile):
+	"""Stream the snapshot file (gzip Content-Encoding, ETag = snapshot version)."""
+	_check_profile_access(pos_profile)
+
+	manifest = _read_manifest(pos_profile)
+	path = manifest and frappe.get_site_path(SNAPSHOT_DIRECTORY, manifest["file"])
+	if not path or not os.path.exists(path):
+		enqueue_catalog_snapshot_build(pos_profile)
+		raise frappe.DoesNotExistError(_("No catalog snapshot is available yet"))
+
+	etag = f'"{manifest["version"]}"'
+	headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+	if etag in (frappe.get_request_header("If-None-Match") or ""):
+		return Response(status=304, headers=headers)
+
+	return Response(
+		wrap_file(frappe.local.request.environ, open(path, "rb")),
+		mimetype="application/x-ndjson",
+		headers={**headers, "Content-Encoding": "gzip", "Content-Length": str(manifest["size"])},
+		direct_passthrough=True,
+	)
@@ -0,0 +1,193 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Change counters and conditional GET for catalog and configuration endpoints.
+
+Every save, submit, cancel, rename or delete of a tracked doctype bumps a
+per-doctype Redis counter once per transaction, after commit. Endpoints
+decorated with ``conditional_get`` derive their ETag from the counters of the
+doctypes they read (plus the call arguments, user, language and date), so the
+fingerprint costs one MGET instead of building and hashing the payload. When
+the request's If-None-Match matches, an empty 304 is returned without running
+the endpoint.
+
+Changes written without document events (db.set_value, bulk updates) must be
+reported with ``mark_changed`` by the code that handles them; stock is
+tracked through Stock Ledger Entry, which every movement creates. Endpoints
+returning an error fallback call ``skip_etag`` so it is never cached. Flushing
+Redis resets the epoch, which changes every ETag.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+
+import frappe
+from frappe.utils import nowdate
+from werkzeug.wrappers import Response
+
+import pos_next
+
+CHANGE_COUNTER_KEY_PREFIX = "pos_next:change_counter:"
+CHANGE_EPOCH_KEY = "pos_next:change_epoch"
+
+# Doctypes whose changes invalidate conditional responses
+TRACKED_DOCTYPES = frozenset(
+	(
+		"Address",
+		"Branch",
+		"Company",
+		"Customer",
+		"Customer Group",
+		"Item",
+		"Item Group",
+		"Item Price",
+		"Mode of Payment",
+		"POS Item Velocity",
+		"POS Offer",
+		"POS Profile",
+		"POS Settings",
+		"Price List",
+		"Pricing Rule",
+		"Product Bundle",
+		"Promotional Scheme",
+		"Sales Taxes and Charges Template",
+		"Serial No",
+		"Stock Ledger Entry",
+		"Tax Category",
+		"Warehouse",
+	)
+)
+
+
+def _counter_key(doctype):
+	return frappe.cache().make_key(f"{CHANGE_COUNTER_KEY_PREFIX}{doctype}")
+
+
+def get_change_epoch():
+	"""Random per-Redis-lifetime token, so counters restarting from zero never reuse an ETag."""
+	cache = frappe.cache()
+	key = cache.make_key(CHANGE_EPOCH_KEY)
+	epoch = cache.get(key)
+	if not epoch:
+		cache.set(key, frappe.generate_hash(length=12), nx=True)
+		epoch = cache.get(key)
+	return frappe.safe_decode(epoch)
+
+
+def get_change_version(doctypes):
+	"""Return an opaque version string that changes whenever any of the doctypes changes."""
+	doctypes = sorted(doctypes)
+	counters = frappe.cache().mget([_counter_key(doctype) for doctype in doctypes])
+	return ":".join([get_change_epoch(), *(frappe.safe_decode(counter) or "0" for counter in counters)])
+
+
+def bump_change_counters(doctypes):
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=False)
+	for doctype in doctypes:
+		pipe.incr(_counter_key(doctype))
+	pipe.execute()
+
+
+def mark_changed(*doctypes):
+	"""Bump the doctypes' counters once per transaction, after commit."""
+	pending = frappe.flags.setdefault("pos_next_changed_doctypes", set())
+	if not pending:
+		frappe.db.after_commit.add(_flush_change_counters)
+		frappe.db.after_rollback.add(lambda: frappe.flags.pop("pos_next_changed_doctypes", None))
+	pending.update(doctypes)
+
+
+def on_doc_change(doc, method=None, *args, **kwargs):
+	"""Wildcard doc event: bump the doctype's counter once per transaction, after commit."""
+	if doc.doctype in TRACKED_DOCTYPES:
+		mark_changed(doc.doctype)
+
+
+def _flush_change_counters():
+	pending = frappe.flags.pop("pos_next_changed_doctypes", None)
+	if pending:
+		try:
+			bump_change_counters(pending)
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Change Counter Error")
+
+
+def _make_etag(cmd, kwargs, doctypes):
+	fingerprint = json.dumps(
+		[
+			cmd,
+			sorted((key, str(value)) for key, value in kwargs.items()),
+			frappe.session.user,
+			frappe.local.lang,
+			nowdate(),
+			pos_next.__version__,
+			get_change_version(doctypes),
+		],
+		separators=(",", ":"),
+	)
+	return '"{}"'.format(hashlib.sha1(fingerprint.encode()).hexdigest())
+
+
+def skip_etag():
+	"""Send the current response without an ETag, e.g. for an error fallback."""
+	frappe.flags.pos_next_skip_etag = True
+
+
+def _if_none_match():
+	header = frappe.get_request_header("If-None-Match") or ""
+	return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+def conditional_get(*doctypes):
+	"""
+	Decorator for whitelisted endpoints: answer with an ETag and honour If-None-Match.
+
+	Only applies when the function is the method being requested; internal
+	Python callers get the plain return value.
+
+		@frappe.whitelist()
+		@conditional_get("POS Profile", "Mode of Payment")
+		def get_payment_methods(pos_profile):
+			...
+	"""
+	unknown = set(doctypes) - TRACKED_DOCTYPES
+	if unknown:
+		raise ValueError(f"Untracked doctypes: {', '.join(sorted(unknown))}")
+
+	def decorator(fn):
+		cmd = f"{fn.__module__}.{fn.__name__}"
+
+		@functools.wraps(fn)
+		def wrapper(*args, **kwargs):
+			if args or not frappe.request or frappe.form_dict.get("cmd") != cmd:
+				return fn(*args, **kwargs)
+
+			try:
+				etag = _make_etag(cmd, kwargs, doctypes)
+			except Exception:
+				frappe.log_error(frappe.get_traceback(), "Conditional GET Error")
+				return fn(*args, **kwargs)
+
+			headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+			if etag in _if_none_match():
+				return Response(status=304, headers=headers)
+
+			from frappe.utils.response import build_response
+
+			frappe.flags.pos_next_skip_etag = False
+			frappe.response["message"] = fn(*args, **kwargs)
+			response = build_response("json")
+			if frappe.flags.pos_next_skip_etag:
+				headers.pop("ETag")
+			response.headers.update(headers)
+			return response
+
+		# frappe.call passes only the arguments the endpoint declares
+		wrapper.fnargs = inspect.getfullargspec(fn).args
+		return wrapper
+
+	return decorator
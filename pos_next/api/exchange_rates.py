@@ -0,0 +1,117 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Exchange-rate cache for multi-currency POS profiles.
+
+ERPNext's get_exchange_rate queries Currency Exchange (and may call an
+external API) on every call. POS pricing asks for the same few currency
+pairs all day, so rates are cached in Redis per (from, to, date, purpose)
+for a TTL that can be set with the site config key
+"pos_next_exchange_rate_cache_ttl" (seconds). Caches are warmed when a shift
+is opened and dropped whenever a Currency Exchange record changes.
+"""
+
+import frappe
+from frappe.utils import cint, flt, getdate, nowdate
+
+EXCHANGE_RATE_CACHE_PREFIX = "pos_next:exchange_rate:"
+DEFAULT_EXCHANGE_RATE_CACHE_TTL = 6 * 60 * 60
+
+
+def _get_ttl():
+	return cint(frappe.conf.get("pos_next_exchange_rate_cache_ttl")) or DEFAULT_EXCHANGE_RATE_CACHE_TTL
+
+
+def get_cached_exchange_rate(from_currency, to_currency, transaction_date=None, args=None):
+	"""
+	Cached erpnext.setup.utils.get_exchange_rate.
+
+	Returns:
+		float: Exchange rate, 1 for identical currencies, 0 when no rate is available
+			   (missing rates are not cached, so they are picked up once entered)
+	"""
+	if not from_currency or not to_currency or from_currency == to_currency:
+		return 1
+
+	transaction_date = str(getdate(transaction_date or nowdate()))
+	key = f"{EXCHANGE_RATE_CACHE_PREFIX}{from_currency}:{to_currency}:{transaction_date}:{args or ''}"
+
+	cache = frappe.cache()
+	rate = cache.get_value(key)
+	if rate is None:
+		from erpnext.setup.utils import get_exchange_rate
+
+		try:
+			rate = flt(get_exchange_rate(from_currency, to_currency, transaction_date, args))
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Exchange Rate Lookup Error")
+			rate = 0
+
+		if rate:
+			cache.set_value(key, rate, expires_in_sec=_get_ttl())
+
+	return rate
+
+
+def get_price_list_exchange_rate(price_list, company, transaction_date=None, args=None):
+	"""
+	Return (price_list_currency, rate to the company currency) for a price list.
+
+	Currencies come from the document cache, so no query is issued once warm.
+	"""
+	company_currency = frappe.get_cached_value("Company", company, "default_currency")
+	price_list_currency = company_currency
+	if price_list:
+		price_list_currency = (
+			frappe.get_cached_value("Price List", price_list, "currency") or company_currency
+		)
+
+	return price_list_currency, get_cached_exchange_rate(
+		price_list_currency, company_currency, transaction_date, args
+	)
+
+
+def set_missing_exchange_rates(doc):
+	"""
+	Fill conversion_rate and plc_conversion_rate on a selling document from the
+	cache, so ERPNext's set_missing_values does not look them up again.
+	"""
+	if not doc.get("company"):
+		return
+
+	transaction_date = doc.get("posting_date") or nowdate()
+	company_currency = frappe.get_cached_value("Company", doc.company, "default_currency")
+
+	if doc.get("selling_price_list") and not flt(doc.get("plc_conversion_rate")):
+		price_list_currency, rate = get_price_list_exchange_rate(
+			doc.selling_price_list, doc.company, transaction_date, "for_selling"
+		)
+		if rate:
+			doc.price_list_currency = price_list_currency
+			doc.plc_conversion_rate = rate
+
+	if doc.get("currency") and not flt(doc.get("conversion_rate")):
+		rate = get_cached_exchange_rate(doc.currency, company_currency, transaction_date, "for_selling")
+		if rate:
+			doc.conversion_rate = rate
+
+
+def preload_exchange_rates(pos_profile):
+	"""Warm the cache for the currency pairs a POS Profile prices in."""
+	try:
+		profile = frappe.get_cached_doc("POS Profile", pos_profile)
+		company_currency = frappe.get_cached_value("Company", profile.company, "default_currency")
+
+		# get_item_detail looks the price list rate up without a purpose, invoices "for_selling"
+		for args in (None, "for_selling"):
+			get_price_list_exchange_rate(profile.selling_price_list, profile.company, args=args)
+			if profile.get("currency"):
+				get_cached_exchange_rate(profile.currency, company_currency, args=args)
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Exchange Rate Preload Error")
+
+
+def clear_exchange_rate_cache(doc=None, method=None):
+	"""Currency Exchange on_update / on_trash hook."""
+	frappe.db.after_commit.add(lambda: frappe.cache().delete_keys(EXCHANGE_RATE_CACHE_PREFIX))
@@ -864,6 +864,11 @@ def submit_invoice(data, invoice=None):
             if flt(p.amount)
         ]
 
+        # Exchange rates from the shared cache, so set_missing_values skips the lookups
+        from pos_next.api.exchange_rates import set_missing_exchange_rates
+
+        set_missing_exchange_rates(invoice_doc)
+
         invoice_doc.set_missing_values()
 
         # Restore original payments if set_missing_values wiped them
@@ -1878,21 +1883,39 @@ def apply_offers(invoice_data, selected_offers=None):
         if not customer_group:
             customer_group = "All Customer Groups"
 
+        # Rates the client did not send come from the shared exchange-rate cache
+        from pos_next.api.exchange_rates import (
+            get_cached_exchange_rate,
+            get_price_list_exchange_rate,
+        )
+
+        posting_date = invoice.get("posting_date") or nowdate()
+        currency = invoice.get("currency") or profile.get("currency") or company_currency
+        price_list = invoice.get("price_list") or profile.get("selling_price_list")
+
+        conversion_rate = flt(invoice.get("conversion_rate"))
+        if not conversion_rate:
+            conversion_rate = get_cached_exchange_rate(
+                currency, company_currency, posting_date, "for_selling"
+            )
+
+        plc_conversion_rate = flt(invoice.get("plc_conversion_rate"))
+        if not plc_conversion_rate:
+            plc_conversion_rate = get_price_list_exchange_rate(
+                price_list, profile.company, posting_date, "for_selling"
+            )[1]
+
         pricing_args = frappe._dict(
             {
                 "doctype": invoice.get("doctype") or "Sales Invoice",
                 "name": invoice.get("name") or "POS-INVOICE",
                 "company": profile.company,
-                "transaction_date": invoice.get("posting_date") or nowdate(),
-                "posting_date": invoice.get("posting_date") or nowdate(),
-                "currency": invoice.get("currency")
-                or profile.get("currency")
-                or company_currency,
-                "conversion_rate": flt(invoice.get("conversion_rate") or 1) or 1,
-                "plc_conversion_rate": flt(invoice.get("plc_conversion_rate") or 1)
-                or 1,
-                "price_list": invoice.get("price_list")
-                or profile.get("selling_price_list"),
+                "transaction_date": posting_date,
+                "posting_date": posting_date,
+                "currency": currency,
+                "conversion_rate": conversion_rate or 1,
+                "plc_conversion_rate": plc_conversion_rate or 1,
+                "price_list": price_list,
                 "customer": customer,
                 "customer_group": customer_group,
                 "territory": territory,
@@ -0,0 +1,324 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+In-process autocomplete / typo-tolerant suggestion index for POS item search.
+
+Each worker process keeps one index per company (the only catalog filter a POS
+Profile applies), built from item codes and item names:
+
+- Prefix lookups use a sorted token array searched with bisect, which gives
+  trie semantics without one Python object per trie node.
+- Typo tolerance uses a trigram index over the same tokens; candidates sharing
+  enough trigrams are verified with a bounded edit distance.
+
+Item hooks append the changed item code to a short change log in Redis under a
+global version counter. Before answering, a process replays the changes it has
+not seen yet, and rebuilds from scratch only when it fell further behind than
+the log retains.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+import frappe
+from frappe.utils import cint
+
+SUGGEST_VERSION_KEY = "pos_next:item_suggest:version"
+SUGGEST_CHANGES_KEY = "pos_next:item_suggest:changes"
+# Item changes retained for incremental catch-up; processes further behind rebuild
+SUGGEST_CHANGE_LOG_SIZE = 1000
+# Budget for the fuzzy part of a lookup; exact and prefix matches are always returned
+SUGGEST_TIME_BUDGET_MS = 30
+# Caps that keep short prefixes and common trigrams cheap
+MAX_PREFIX_TOKENS = 200
+MAX_FUZZY_CANDIDATES = 100
+MIN_TOKEN_LENGTH = 2
+
+# Relevance of a query word matching an indexed token
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+FUZZY_SCORE = 1.0  # reduced by 0.25 per edit
+
+# Atomically bump the version and append "<version>:<item_code>" to the bounded change log
+_PUBLISH_CHANGE_SCRIPT = """
+local version = redis.call('INCR', KEYS[1])
+redis.call('RPUSH', KEYS[2], version .. ':' .. ARGV[1])
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+return version
+"""
+
+_indexes = {}  # (site, company) -> _SuggestIndex
+_lock = threading.Lock()
+
+
+def _tokenize(text):
+	return [token for token in re.findall(r"\w+", (text or "").lower()) if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def _trigrams(token):
+	padded = f"^{token}$"
+	return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a, b, max_distance):
+	"""
+	Edit distance between a and b counting adjacent transpositions as one edit
+	(optimal string alignment), or max_distance + 1 once it is exceeded.
+	"""
+	if abs(len(a) - len(b)) > max_distance:
+		return max_distance + 1
+
+	before_previous = None
+	previous = list(range(len(b) + 1))
+	for i, char_a in enumerate(a, 1):
+		current = [i]
+		for j, char_b in enumerate(b, 1):
+			value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+			if before_previous and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+				value = min(value, before_previous[j - 2] + 1)
+			current.append(value)
+		if min(current) > max_distance:
+			return max_distance + 1
+		before_previous, previous = previous, current
+
+	return previous[-1]
+
+
+def _fuzzy_tolerance(word):
+	if len(word) < 3:
+		return 0
+	return 1 if len(word) <= 5 else 2
+
+
+class _SuggestIndex:
+	"""Token postings for one company's sellable catalog."""
+
+	def __init__(self, company, version):
+		self.company = company
+		self.version = version
+		self.tokens = []  # sorted, may contain tokens whose postings went empty
+		self.postings = {}  # token -> {item_code}
+		self.trigrams = {}  # trigram -> {token}
+		self.item_tokens = {}  # item_code -> {token}
+		self.item_names = {}  # item_code -> item_name
+
+	def add_item(self, item_code, item_name):
+		self.remove_item(item_code)
+		tokens = set(_tokenize(item_code)) | set(_tokenize(item_name))
+		for token in tokens:
+			if token not in self.postings:
+				self.postings[token] = set()
+				insort(self.tokens, token)
+				for gram in _trigrams(token):
+					self.trigrams.setdefault(gram, set()).add(token)
+			self.postings[token].add(item_code)
+
+		self.item_tokens[item_code] = tokens
+		self.item_names[item_code] = item_name
+
+	def remove_item(self, item_code):
+		for token in self.item_tokens.pop(item_code, ()):
+			self.postings.get(token, set()).discard(item_code)
+		self.item_names.pop(item_code, None)
+
+	def _prefix_tokens(self, prefix):
+		tokens = []
+		position = bisect_left(self.tokens, prefix)
+		while position < len(self.tokens) and len(tokens) < MAX_PREFIX_TOKENS:
+			token = self.tokens[position]
+			if not token.startswith(prefix):
+				break
+			if self.postings.get(token):
+				tokens.append(token)
+			position += 1
+		return tokens
+
+	def _fuzzy_tokens(self, word, deadline):
+		tolerance = _fuzzy_tolerance(word)
+		if not tolerance:
+			return []
+
+		word_grams = _trigrams(word)
+		shared = {}
+		for gram in word_grams:
+			for token in self.trigrams.get(gram, ()):
+				shared[token] = shared.get(token, 0) + 1
+
+		# Each edit destroys at most three trigrams
+		min_shared = max(1, len(word_grams) - 3 * tolerance)
+		candidates = sorted(
+			(token for token, count in shared.items() if count >= min_shared),
+			key=lambda token: -shared[token],
+		)[:MAX_FUZZY_CANDIDATES]
+
+		matches = []
+		for token in candidates:
+			if time.monotonic() > deadline:
+				break
+			if not self.postings.get(token):
+				continue
+			distance = _edit_distance(word, token, tolerance)
+			if distance <= tolerance:
+				matches.append((token, distance))
+		return matches
+
+	def suggest(self, search_term, limit):
+		words = re.findall(r"\w+", (search_term or "").lower())
+		# Drop one-letter words except a trailing one that is still being typed
+		words = [w for i, w in enumerate(words) if len(w) >= MIN_TOKEN_LENGTH or i == len(words) - 1]
+		if not words:
+			return []
+
+		deadline = time.monotonic() + SUGGEST_TIME_BUDGET_MS / 1000.0
+		scores = None
+		for position, word in enumerate(words):
+			word_scores = {}
+
+			def credit(token, score):
+				for item_code in self.postings.get(token, ()):
+					if score > word_scores.get(item_code, 0):
+						word_scores[item_code] = score
+
+			credit(word, EXACT_SCORE)
+			# Only the last word is completed; earlier words were typed in full
+			if position == len(words) - 1:
+				for token in self._prefix_tokens(word):
+					if token != word:
+						credit(token, PREFIX_SCORE)
+
+			if not word_scores:
+				for token, distance in self._fuzzy_tokens(word, deadline):
+					credit(token, FUZZY_SCORE - 0.25 * distance)
+
+			if scores is None:
+				scores = word_scores
+			else:
+				scores = {code: scores[code] + score for code, score in word_scores.items() if code in scores}
+
+			if not scores:
+				return []
+
+		ranked = sorted(scores.items(), key=lambda row: (-row[1], self.item_names.get(row[0]) or row[0]))
+		return [
+			{"item_code": item_code, "item_name": self.item_names.get(item_code), "score": score}
+			for item_code, score in ranked[:limit]
+		]
+
+
+def _load_catalog_rows(company, item_codes=None):
+	"""Fetch (item_code, item_name) for sellable catalog items of a company."""
+	from pos_next.api.items import _build_item_base_conditions
+
+	conditions, params = _build_item_base_conditions(frappe._dict({"company": company}))
+	if item_codes is not None:
+		conditions.append("name IN %s")
+		params.append(tuple(item_codes))
+
+	return frappe.db.sql(
+		f"""
+		SELECT name, item_name
+		FROM `tabItem`
+		WHERE {" AND ".join(conditions)}
+		""",
+		tuple(params),
+	)
+
+
+def _get_version():
+	cache = frappe.cache()
+	return cint(cache.get(cache.make_key(SUGGEST_VERSION_KEY)))
+
+
+def _get_changes_since(version):
+	"""
+	Return item codes changed after version and the newest version seen,
+	or (None, None) when the change log no longer reaches back that far.
+	"""
+	entries = []
+	for entry in frappe.cache().lrange(SUGGEST_CHANGES_KEY, 0, -1) or []:
+		entry_version, _sep, item_code = frappe.safe_decode(entry).partition(":")
+		entries.append((cint(entry_version), item_code))
+
+	if not entries or entries[0][0] > version + 1:
+		return None, None
+
+	changed = {item_code for entry_version, item_code in entries if entry_version > version}
+	return changed, max(entry_version for entry_version, _item_code in entries)
+
+
+def _build_index(company):
+	index = _SuggestIndex(company, _get_version())
+	for item_code, item_name in _load_catalog_rows(company):
+		index.add_item(item_code, item_name)
+	return index
+
+
+def _get_index(company):
+	"""Return an up-to-date index for the company, catching up or rebuilding as needed."""
+	# Workers serve several sites: never share an index across them
+	key = (frappe.local.site, company)
+	with _lock:
+		index = _indexes.get(key)
+		current_version = _get_version()
+
+		if index is not None and current_version < index.version:
+			# Redis lost the counter (restart/flush): changes can no longer be replayed
+			index = None
+
+		if index is not None and current_version > index.version:
+			changed, newest_version = _get_changes_since(index.version)
+			if changed is None:
+				index = None
+			else:
+				rows = dict(_load_catalog_rows(company, changed)) if changed else {}
+				for item_code in changed:
+					if item_code in rows:
+						index.add_item(item_code, rows[item_code])
+					else:
+						index.remove_item(item_code)
+				index.version = max(newest_version, index.version)
+
+		if index is None:
+			index = _build_index(company)
+			_indexes[key] = index
+
+		return index
+
+
+def suggest_items(pos_profile_doc, search_term, limit=10):
+	"""Return ranked item suggestions for a (possibly partial or misspelled) search term."""
+	index = _get_index(pos_profile_doc.company or "")
+	return index.suggest(search_term, limit)
+
+
+def publish_item_change(item_code):
+	"""Record an item change so every process updates its suggestion index."""
+	cache = frappe.cache()
+	cache.eval(
+		_PUBLISH_CHANGE_SCRIPT,
+		2,
+		cache.make_key(SUGGEST_VERSION_KEY),
+		cache.make_key(SUGGEST_CHANGES_KEY),
+		item_code,
+		SUGGEST_CHANGE_LOG_SIZE,
+	)
+
+
+def on_item_change(doc, method=None):
+	"""Item on_update / on_trash hook: refresh suggestion indexes once the change is committed."""
+	item_code = doc.name
+	frappe.db.after_commit.add(lambda: publish_item_change(item_code))
+
+
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+	"""Item after_rename hook: drop the old code and index the new one."""
+
+	def publish():
+		for item_code in (old, new):
+			if item_code:
+				publish_item_change(item_code)
+
+	frappe.db.after_commit.add(publish)
@@ -0,0 +1,141 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Trigram index of item codes and names for "contains" item search.
+
+POS Item Search Trigram holds every three-character fragment (lowercased)
+of the whitespace-separated words of each item's code and item_name. An item
+contains a search word in its code or name only if it has all the word's
+trigrams, so get_items reads its candidates from the (trigram, item_code)
+index and checks the word on those rows alone, instead of matching
+LIKE '%word%' against every item.
+
+Item hooks keep the rows current. The first build runs in the background
+(after install or by patch); until it has completed the index reports itself
+as not ready and search falls back to scanning.
+"""
+
+import frappe
+from frappe.utils import now
+
+TRIGRAM_DOCTYPE = "POS Item Search Trigram"
+TRIGRAM_LENGTH = 3
+TRIGRAM_BATCH_SIZE = 2000
+# Global default set once a full build has completed (cached)
+TRIGRAM_READY_KEY = "pos_next_item_trigrams_ready"
+
+
+def get_word_trigrams(word):
+	"""Trigrams of a search word, or an empty set when it is too short to be looked up."""
+	word = (word or "").lower()
+	return {word[i : i + TRIGRAM_LENGTH] for i in range(len(word) - TRIGRAM_LENGTH + 1)}
+
+
+def _get_item_trigrams(item_code, item_name):
+	trigrams = set()
+	for text in (item_code, item_name):
+		for word in (text or "").split():
+			trigrams |= get_word_trigrams(word)
+	return trigrams
+
+
+def is_trigram_index_ready():
+	return bool(
+		frappe.cache().get_value(
+			TRIGRAM_READY_KEY, generator=lambda: int(frappe.db.get_global(TRIGRAM_READY_KEY) or 0)
+		)
+	)
+
+
+def _set_ready(ready):
+	frappe.db.set_global(TRIGRAM_READY_KEY, 1 if ready else 0)
+	frappe.cache().delete_value(TRIGRAM_READY_KEY)
+
+
+def _insert_trigrams(rows):
+	"""Insert (item_code, item_name) rows' trigrams."""
+	timestamp = now()
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			timestamp,
+			timestamp,
+			"Administrator",
+			"Administrator",
+			item_code,
+			trigram,
+		)
+		for item_code, item_name in rows
+		for trigram in _get_item_trigrams(item_code, item_name)
+	]
+	if values:
+		frappe.db.bulk_insert(
+			TRIGRAM_DOCTYPE,
+			fields=["name", "creation", "modified", "owner", "modified_by", "item_code", "trigram"],
+			values=values,
+		)
+
+
+def enqueue_item_trigram_rebuild():
+	frappe.enqueue(
+		"pos_next.api.item_trigrams.rebuild_item_trigrams",
+		queue="long",
+		timeout=3600,
+		job_id="pos_next_rebuild_item_trigrams",
+		deduplicate=True,
+		enqueue_after_commit=True,
+	)
+
+
+def rebuild_item_trigrams():
+	"""Build the index from scratch, paging through items by primary key."""
+	_set_ready(False)
+	frappe.db.delete(TRIGRAM_DOCTYPE)
+	frappe.db.commit()
+
+	last_item_code = ""
+	while True:
+		rows = frappe.db.sql(
+			"""
+			SELECT name, item_name
+			FROM `tabItem`
+			WHERE name > %s
+			ORDER BY name
+			LIMIT %s
+			""",
+			(last_item_code, TRIGRAM_BATCH_SIZE),
+		)
+		if not rows:
+			break
+		_insert_trigrams(rows)
+		frappe.db.commit()
+		last_item_code = rows[-1][0]
+
+	_set_ready(True)
+	frappe.db.commit()
+
+
+# ---------------------------------------------------------------------------
+# Document hooks
+# ---------------------------------------------------------------------------
+# Rows are written in the Item's transaction, so they commit or roll back with it.
+
+
+def on_item_update(doc, method=None):
+	previous = doc.get_doc_before_save()
+	if previous and previous.item_name == doc.item_name:
+		return
+
+	frappe.db.delete(TRIGRAM_DOCTYPE, {"item_code": doc.name})
+	_insert_trigrams([(doc.name, doc.item_name)])
+
+
+def on_item_trash(doc, method=None):
+	frappe.db.delete(TRIGRAM_DOCTYPE, {"item_code": doc.name})
+
+
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+	# item_code is plain Data (so trigram rows never block deleting an Item): rewrite by hand
+	frappe.db.delete(TRIGRAM_DOCTYPE, {"item_code": ["in", [old, new]]})
+	_insert_trigrams([(new, doc.item_name)])
@@ -0,0 +1,129 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Sales velocity per POS Profile for popularity-ranked item lists.
+
+An hourly job aggregates the submitted POS Sales Invoices of the last
+VELOCITY_WINDOW_DAYS into POS Item Velocity: per profile, the number of
+invoices each item appeared on and the stock qty sold. Variant sales count
+towards their template, which is what the item grid shows. Only the top
+VELOCITY_TOP_ITEMS items per profile are kept. get_items(order_by=
+"popularity") pages through them in index order (pos_profile,
+invoice_count DESC, item_code), then through the unranked items by
+item_name, instead of aggregating invoices on every request.
+
+The window can be changed with the site config key
+``pos_next_velocity_window_days``.
+"""
+
+import frappe
+from frappe.utils import add_days, cint, flt, now, nowdate
+
+from pos_next.api.change_tracking import bump_change_counters
+
+VELOCITY_WINDOW_DAYS = 30
+VELOCITY_TOP_ITEMS = 1000
+VELOCITY_DOCTYPE = "POS Item Velocity"
+
+
+def _get_window_days():
+	return cint(frappe.conf.get("pos_next_velocity_window_days")) or VELOCITY_WINDOW_DAYS
+
+
+def _aggregate_sales(from_date):
+	"""Return {pos_profile: [(item_code, invoice_count, qty), ...]} best sellers first."""
+	rows = frappe.db.sql(
+		"""
+		SELECT si.pos_profile,
+			COALESCE(i.variant_of, sii.item_code) AS item_code,
+			COUNT(DISTINCT si.name) AS invoice_count,
+			SUM(sii.stock_qty) AS qty
+		FROM `tabSales Invoice Item` sii
+		INNER JOIN `tabSales Invoice` si ON si.name = sii.parent
+		INNER JOIN `tabItem` i ON i.name = sii.item_code
+		WHERE si.docstatus = 1
+			AND si.is_pos = 1
+			AND si.is_return = 0
+			AND si.posting_date >= %s
+			AND IFNULL(si.pos_profile, '') != ''
+		GROUP BY si.pos_profile, COALESCE(i.variant_of, sii.item_code)
+		ORDER BY si.pos_profile, invoice_count DESC, qty DESC
+		""",
+		from_date,
+	)
+
+	velocity = {}
+	for pos_profile, item_code, invoice_count, qty in rows:
+		items = velocity.setdefault(pos_profile, [])
+		if len(items) < VELOCITY_TOP_ITEMS:
+			items.append((item_code, cint(invoice_count), flt(qty)))
+	return velocity
+
+
+def update_item_velocity():
+	"""Scheduled hourly: rebuild POS Item Velocity from recent sales."""
+	velocity = _aggregate_sales(add_days(nowdate(), -_get_window_days()))
+
+	timestamp = now()
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			timestamp,
+			timestamp,
+			"Administrator",
+			"Administrator",
+			pos_profile,
+			item_code,
+			invoice_count,
+			qty,
+		)
+		for pos_profile, items in velocity.items()
+		for item_code, invoice_count, qty in items
+	]
+
+	frappe.db.delete(VELOCITY_DOCTYPE)
+	if values:
+		frappe.db.bulk_insert(
+			VELOCITY_DOCTYPE,
+			fields=[
+				"name",
+				"creation",
+				"modified",
+				"owner",
+				"modified_by",
+				"pos_profile",
+				"item_code",
+				"invoice_count",
+				"qty",
+			],
+			values=values,
+		)
+	frappe.db.commit()
+
+	# Written without document events: invalidate conditional get_items responses explicitly
+	bump_change_counters([VELOCITY_DOCTYPE])
+
+
+def get_velocity_join_sql():
+	"""FROM clause joining `tabItem` to the velocity rows of the POS Profile passed as its one parameter."""
+	# Derived table with its own column names: the item columns stay unambiguous
+	return """
+		`tabItem`
+		INNER JOIN (
+			SELECT item_code AS velocity_item_code, invoice_count AS velocity_invoice_count
+			FROM `tabPOS Item Velocity`
+			WHERE pos_profile = %s
+		) velocity ON velocity.velocity_item_code = `tabItem`.name
+	"""
+
+
+def get_unranked_condition_sql():
+	"""WHERE condition keeping `tabItem` rows without velocity for the POS Profile passed as its one parameter."""
+	return """
+		NOT EXISTS (
+			SELECT 1
+			FROM `tabPOS Item Velocity` v
+			WHERE v.pos_profile = %s AND v.item_code = `tabItem`.name
+		)
+	"""
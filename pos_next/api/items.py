@@ -1,6 +1,7 @@
 # Copyright (c) 2024, POS Next and contributors
 # For license information, please see license.txt
 
+import base64
 import json
 import re
 from collections import defaultdict
@@ -9,8 +10,20 @@ import frappe
 from erpnext.stock.doctype.batch.batch import get_batch_qty
 from erpnext.stock.get_item_details import get_item_details as erpnext_get_item_details
 from frappe import _, as_json
-from frappe.query_builder import DocType, functions as fn
-from frappe.utils import flt, nowdate
+from frappe.query_builder import DocType
+from frappe.utils import add_to_date, cint, flt, get_datetime, now_datetime, nowdate
+
+from pos_next.api.barcode_index import resolve_barcode
+from pos_next.api.change_tracking import conditional_get
+from pos_next.api.exchange_rates import get_price_list_exchange_rate
+from pos_next.api.item_trigrams import get_word_trigrams, is_trigram_index_ready
+from pos_next.api.item_velocity import get_unranked_condition_sql, get_velocity_join_sql
+from pos_next.api.price_index import get_item_prices
+from pos_next.api.serial_counts import get_active_serial_counts
+from pos_next.api.stock_matrix import get_stock_matrix
+from pos_next.api.thumbnails import get_thumbnail_urls
+from pos_next.api.warehouse_tree import get_leaf_warehouses, resolve_warehouses
+from pos_next.api.wire_format import compress_payload, encode_columnar
 
 ITEM_RESULT_FIELDS = [
 	"name as item_code",
@@ -31,16 +44,34 @@ ITEM_RESULT_FIELDS = [
 
 ITEM_RESULT_COLUMNS = ",\n\t".join(ITEM_RESULT_FIELDS)
 
+# Indexes backing get_items paging and search (see add_item_search_indexes)
+ITEM_KEYSET_INDEX = "item_name_name_index"
+ITEM_FULLTEXT_INDEX = "item_search_fulltext"
+ITEM_FULLTEXT_COLUMNS = "name, item_name, description"
+ITEM_FULLTEXT_CACHE_KEY = "pos_next:item_fulltext_config"
+
+# Optional reversed serial number index for "last digits" serial search
+SERIAL_SUFFIX_COLUMN = "pos_reversed_serial_no"
+SERIAL_SUFFIX_INDEX = "pos_reversed_serial_no_index"
+SERIAL_SUFFIX_CACHE_KEY = "pos_next:serial_suffix_index"
+MIN_SERIAL_SUFFIX_LENGTH = 4
+
+# Catalog delta sync (get_items_delta)
+SYNC_TOKEN_VERSION = 1
+# Rows stamped shortly before a token was issued may belong to transactions that had
+# not committed yet; they are re-sent on the next sync (clients upsert, so this is safe)
+SYNC_TOKEN_OVERLAP_SECONDS = 60
+# Above this many changed items a full reload is cheaper than patching row by row
+MAX_DELTA_ITEMS = 5000
+
 
 def get_stock_availability(item_code, warehouse):
 	"""Return total available quantity for an item in the given warehouse."""
 	if not warehouse:
 		return 0.0
 
-	warehouses = [warehouse]
-	if frappe.db.get_value("Warehouse", warehouse, "is_group"):
-		# Include all child warehouses when a group warehouse is set
-		warehouses = frappe.db.get_descendants("Warehouse", warehouse) or []
+	# Include all child warehouses when a group warehouse is set
+	warehouses = get_leaf_warehouses(warehouse)
 
 	# Use raw SQL for aggregate function
 	rows = frappe.db.sql(
@@ -134,111 +165,214 @@ def get_item_detail(item, doc=None, warehouse=None, price_list=None, company=Non
 		[{"serial_no": "SN001"}, {"serial_no": "SN002"}]
 
 	Database Queries:
-		- Batches: 1 query (only if has_batch_no=1)
+		- Batches: get_batch_qty plus 1 metadata query (only if has_batch_no=1)
 		- Serial Numbers: 1 query (only if has_serial_no=1)
 		- Item Details: 1 query via ERPNext's get_item_details
 		- Stock: 1 query (only if is_stock_item=1)
-		- UOMs: 1 query for conversion details
-		Total: 2-5 queries depending on item type
+		- Item attributes, item category, UOMs: 1 query each
+		The loading is shared with get_item_details_bulk, which issues the
+		same queries once for a whole set of items.
 	"""
 	# Parse item data (accept both JSON string and dict)
 	item = json.loads(item) if isinstance(item, str) else item
-	today = nowdate()
-	item_code = item.get("item_code")
-	batch_no_data = []
-	serial_no_data = []
+	context = _get_item_detail_context([item], warehouse=warehouse, price_list=price_list, company=company)
+	return _build_item_detail(item, context, doc=doc, warehouse=warehouse, price_list=price_list, company=company)
 
-	# ===========================================================================
-	# BATCH TRACKING: Get available batches with expiry filtering
-	# ===========================================================================
-	# For batch-tracked items (e.g., medicines, perishables), return only:
-	# 1. Batches with qty > 0 (available stock)
-	# 2. Non-expired batches (expiry_date > today or no expiry)
-	# 3. Enabled batches (disabled = 0)
-	#
-	# Sorted by: Expiry date (FIFO - First to Expire, First Out)
-	#
-	# Use Case: POS cashier selects batch when adding item to cart
-	# Example: Medicine "ABC" has 3 batches:
-	#   - Batch A: 50 qty, expires in 2 days → INCLUDED (sell first!)
-	#   - Batch B: 100 qty, expires in 30 days → INCLUDED
-	#   - Batch C: 20 qty, expired yesterday → EXCLUDED
-	if warehouse and item.get("has_batch_no"):
-		# Get all batches with available quantity for this item in warehouse
-		batch_list = get_batch_qty(warehouse=warehouse, item_code=item_code)
-		if batch_list:
-			for batch in batch_list:
-				# Filter 1: Only batches with available stock
-				if batch.qty > 0 and batch.batch_no:
-					# Fetch batch metadata (expiry, manufacturing dates, disabled status)
-					batch_doc = frappe.get_cached_doc("Batch", batch.batch_no)
-
-					# Filter 2: Exclude expired batches
-					# Filter 3: Exclude disabled batches
-					is_not_expired = (
-						str(batch_doc.expiry_date) > str(today)
-						or batch_doc.expiry_date in ["", None]
-					)
-					is_enabled = batch_doc.disabled == 0
-
-					if is_not_expired and is_enabled:
-						batch_no_data.append({
-							"batch_no": batch.batch_no,
-							"batch_qty": batch.qty,
-							"expiry_date": batch_doc.expiry_date,
-							"manufacturing_date": batch_doc.manufacturing_date,
-						})
 
-	# ===========================================================================
-	# SERIAL NUMBER TRACKING: Get available serial numbers
-	# ===========================================================================
-	# For serial-tracked items (e.g., laptops, phones), return only:
-	# 1. Serial numbers with status = "Active" (not sold/scrapped)
-	# 2. Serial numbers in the specified warehouse
-	#
-	# Serial numbers are unique identifiers for individual item units.
-	# Each serial number can only be sold once.
-	#
-	# Use Case: POS cashier scans or selects serial number when selling
-	# Example: Laptop "XYZ" has serial numbers:
-	#   - SN001 (Active, Main Store) → INCLUDED
-	#   - SN002 (Active, Main Store) → INCLUDED
-	#   - SN003 (Delivered, Main Store) → EXCLUDED (already sold)
-	#   - SN004 (Active, Branch Store) → EXCLUDED (different warehouse)
-	if warehouse and item.get("has_serial_no"):
-		serial_no_data = frappe.get_all(
-			"Serial No",
-			filters={
-				"item_code": item_code,
-				"status": "Active",  # Only available serial numbers
-				"warehouse": warehouse,  # From specified warehouse only
-			},
-			fields=["name as serial_no", "mrp"],
-		)
+def _get_batch_no_data(item_codes, warehouse, today):
+	"""
+	Available, non-expired, enabled batches of items in a warehouse.
 
-	item["selling_price_list"] = price_list
+	For batch-tracked items (e.g., medicines, perishables), return only:
+	1. Batches with qty > 0 (available stock)
+	2. Non-expired batches (expiry_date > today or no expiry)
+	3. Enabled batches (disabled = 0)
+
+	Batches keep the order get_batch_qty returns them in (ERPNext's FEFO/FIFO
+	picking order). Batch metadata for all items is read in one query with the
+	expiry and disabled filters applied in SQL.
+
+	Use Case: POS cashier selects batch when adding item to cart
+	Example: Medicine "ABC" has 3 batches:
+	  - Batch A: 50 qty, expires in 2 days → INCLUDED (sell first!)
+	  - Batch B: 100 qty, expires in 30 days → INCLUDED
+	  - Batch C: 20 qty, expired yesterday → EXCLUDED
+
+	Returns:
+		dict: item_code -> list of {batch_no, batch_qty, expiry_date, manufacturing_date}
+	"""
+	# Filter 1: Only batches with available stock, in picking order per item
+	available = {}
+	for item_code in item_codes:
+		available[item_code] = [
+			batch
+			for batch in get_batch_qty(warehouse=warehouse, item_code=item_code) or []
+			if batch.qty > 0 and batch.batch_no
+		]
+
+	batch_nos = list({batch.batch_no for batches in available.values() for batch in batches})
+	batch_meta = {}
+	if batch_nos:
+		# Filter 2: Exclude expired batches
+		# Filter 3: Exclude disabled batches
+		batch_meta = {
+			row.name: row
+			for row in frappe.db.sql(
+				"""
+				SELECT name, expiry_date, manufacturing_date
+				FROM `tabBatch`
+				WHERE name IN %s
+					AND disabled = 0
+					AND (expiry_date IS NULL OR expiry_date > %s)
+				""",
+				(batch_nos, today),
+				as_dict=True,
+			)
+		}
+
+	batch_no_data = {}
+	for item_code, batches in available.items():
+		batch_no_data[item_code] = [
+			{
+				"batch_no": batch.batch_no,
+				"batch_qty": batch.qty,
+				"expiry_date": batch_meta[batch.batch_no].expiry_date,
+				"manufacturing_date": batch_meta[batch.batch_no].manufacturing_date,
+			}
+			for batch in batches
+			if batch.batch_no in batch_meta
+		]
+
+	return batch_no_data
+
+
+def _get_item_detail_context(items, warehouse=None, price_list=None, company=None):
+	"""
+	Load the data get_item_detail needs for a set of items with set-based queries.
+
+	Args:
+		items (list): Item dicts with item_code, has_batch_no, has_serial_no and is_stock_item
+		warehouse (str, optional): Warehouse for stock/batch/serial lookup
+		price_list (str, optional): Selling price list name
+		company (str, optional): Company for currency conversion
+
+	Returns:
+		frappe._dict: Lookup maps keyed by item_code, consumed by _build_item_detail
+	"""
+	today = nowdate()
+	context = frappe._dict(
+		{
+			"today": today,
+			"currency": None,
+			"item_data": {},
+			"insurance_categories": set(),
+			"uoms": defaultdict(list),
+			"serials": defaultdict(list),
+			"batches": {},
+			"stock": {},
+		}
+	)
 
-	# Handle multi-currency
+	# Handle multi-currency (the same conversion applies to every item)
 	if company:
-		company_currency = frappe.db.get_value("Company", company, "default_currency")
-		price_list_currency = company_currency
-		if price_list:
-			price_list_currency = (
-				frappe.db.get_value("Price List", price_list, "currency") or company_currency
+		# Cached per currency pair and day, so repeated lookups issue no queries
+		price_list_currency, exchange_rate = get_price_list_exchange_rate(price_list, company, today)
+		if not exchange_rate:
+			frappe.log_error(
+				f"Missing exchange rate from {price_list_currency} to the currency of {company}",
+				"POS Next",
 			)
+			exchange_rate = 1
 
-		exchange_rate = 1
-		if price_list_currency != company_currency:
-			from erpnext.setup.utils import get_exchange_rate
+		context.currency = (price_list_currency, exchange_rate)
 
-			try:
-				exchange_rate = get_exchange_rate(price_list_currency, company_currency, today)
-			except Exception:
-				frappe.log_error(
-					f"Missing exchange rate from {price_list_currency} to {company_currency}",
-					"POS Next",
-				)
+	item_codes = list({item.get("item_code") for item in items if item.get("item_code")})
+	if not item_codes:
+		return context
+
+	# Discount limit, offer eligibility attributes and stock UOM
+	item_rows = frappe.db.sql(
+		"""
+		SELECT name, max_discount, item_group, brand, custom_item_category, stock_uom
+		FROM `tabItem`
+		WHERE name IN %s
+		""",
+		[item_codes],
+		as_dict=True,
+	)
+	context.item_data = {row.name: row for row in item_rows}
+
+	# Item categories that require an insurance serial number entry
+	categories = list({row.custom_item_category for row in item_rows if row.custom_item_category})
+	if categories:
+		context.insurance_categories = set(
+			frappe.get_all(
+				"Item Category",
+				filters={"name": ["in", categories], "generate_auto_purchase_reciept": 1},
+				pluck="name",
+			)
+		)
+
+	for row in frappe.get_all(
+		"UOM Conversion Detail",
+		filters={"parent": ["in", item_codes]},
+		fields=["parent", "uom", "conversion_factor"],
+	):
+		context.uoms[row.pop("parent")].append(row)
+
+	if not warehouse:
+		return context
+
+	# Serial numbers: only Active ones in the specified warehouse
+	serial_codes = list({item["item_code"] for item in items if item.get("has_serial_no")})
+	if serial_codes:
+		for row in frappe.get_all(
+			"Serial No",
+			filters={"item_code": ["in", serial_codes], "status": "Active", "warehouse": warehouse},
+			fields=["item_code", "name as serial_no", "mrp"],
+		):
+			context.serials[row.pop("item_code")].append(row)
+
+	batch_codes = list({item["item_code"] for item in items if item.get("has_batch_no")})
+	if batch_codes:
+		context.batches = _get_batch_no_data(batch_codes, warehouse, today)
+
+	# Stock for stock items whose quantity is not given by their serial numbers
+	stock_codes = list(
+		{
+			item["item_code"]
+			for item in items
+			if item.get("is_stock_item")
+			and not (item.get("has_serial_no") and context.serials.get(item["item_code"]))
+		}
+	)
+	if stock_codes:
+		context.stock = dict.fromkeys(stock_codes, 0.0)
+		for item_code, actual_qty in frappe.db.sql(
+			"""
+			SELECT item_code, SUM(actual_qty)
+			FROM `tabBin`
+			WHERE item_code IN %s AND warehouse IN %s
+			GROUP BY item_code
+			""",
+			(stock_codes, get_leaf_warehouses(warehouse)),
+		):
+			context.stock[item_code] = flt(actual_qty)
+
+	return context
+
+
+def _build_item_detail(item, context, doc=None, warehouse=None, price_list=None, company=None):
+	"""Assemble the get_item_detail result for one item from a preloaded context."""
+	item = dict(item)
+	item_code = item.get("item_code")
+	batch_no_data = context.batches.get(item_code, []) if warehouse and item.get("has_batch_no") else []
+	serial_no_data = context.serials.get(item_code, []) if warehouse and item.get("has_serial_no") else []
+
+	item["selling_price_list"] = price_list
 
+	if context.currency:
+		price_list_currency, exchange_rate = context.currency
 		item["price_list_currency"] = price_list_currency
 		item["plc_conversion_rate"] = exchange_rate
 		item["conversion_rate"] = exchange_rate
@@ -256,7 +390,7 @@ def get_item_detail(item, doc=None, warehouse=None, price_list=None, company=Non
 	if not doc and company:
 		doc = frappe._dict({"doctype": "Sales Invoice", "company": company})
 
-	max_discount = frappe.get_value("Item", item_code, "max_discount")
+	item_data = context.item_data.get(item_code) or frappe._dict()
 
 	# Prepare args dict for get_item_details - only include necessary fields
 	args = frappe._dict(
@@ -286,47 +420,28 @@ def get_item_detail(item, doc=None, warehouse=None, price_list=None, company=Non
 			# This prevents mismatches between Bin qty and actual serials
 			res["actual_qty"] = len(serial_no_data)
 		else:
-			res["actual_qty"] = get_stock_availability(item_code, warehouse)
+			res["actual_qty"] = context.stock.get(item_code, 0.0)
 
-	res["max_discount"] = max_discount
+	res["max_discount"] = item_data.get("max_discount")
 	res["batch_no_data"] = batch_no_data
 	res["serial_no_data"] = serial_no_data
 
 	# Add item_group, brand and custom_item_category for offer eligibility checking
-	item_group, brand, custom_item_category = frappe.db.get_value(
-		"Item", item_code, ["item_group", "brand", "custom_item_category"]
-	)
-	res["item_group"] = item_group
-	res["brand"] = brand
+	custom_item_category = item_data.get("custom_item_category")
+	res["item_group"] = item_data.get("item_group")
+	res["brand"] = item_data.get("brand")
 	res["custom_item_category"] = custom_item_category
 
 	# Check if item category requires insurance serial number entry
-	res["requires_insurance_sr_no"] = False
-	if custom_item_category:
-		generate_auto_purchase_reciept = frappe.db.get_value(
-			"Item Category", custom_item_category, "generate_auto_purchase_reciept"
-		)
-		if generate_auto_purchase_reciept:
-			res["requires_insurance_sr_no"] = True
-
-	# Add UOMs data
-	uoms = frappe.get_all(
-		"UOM Conversion Detail",
-		filters={"parent": item_code},
-		fields=["uom", "conversion_factor"],
+	res["requires_insurance_sr_no"] = bool(
+		custom_item_category and custom_item_category in context.insurance_categories
 	)
 
-	# Add stock UOM if not already in uoms list
-	stock_uom = frappe.db.get_value("Item", item_code, "stock_uom")
-	if stock_uom:
-		stock_uom_exists = False
-		for uom_data in uoms:
-			if uom_data.get("uom") == stock_uom:
-				stock_uom_exists = True
-				break
-
-		if not stock_uom_exists:
-			uoms.append({"uom": stock_uom, "conversion_factor": 1.0})
+	# Add UOMs data, with the stock UOM if not already in the list
+	uoms = [frappe._dict(row) for row in context.uoms.get(item_code, [])]
+	stock_uom = item_data.get("stock_uom")
+	if stock_uom and not any(uom_data.get("uom") == stock_uom for uom_data in uoms):
+		uoms.append({"uom": stock_uom, "conversion_factor": 1.0})
 
 	res["item_uoms"] = uoms
 
@@ -407,37 +522,12 @@ def search_by_barcode(barcode, pos_profile):
 		if not pos_profile_doc.warehouse:
 			frappe.throw(_("Warehouse not set in POS Profile {0}").format(pos_profile))
 
-		# Search for item by barcode - also get UOM if barcode has specific UOM
-		barcode_data = frappe.db.get_value(
-			"Item Barcode", {"barcode": barcode}, ["parent", "uom"], as_dict=True
-		)
-
-		if barcode_data:
-			item_code = barcode_data.parent
-			barcode_uom = barcode_data.uom
-		else:
-			# Try searching in item code field directly
-			item_code = frappe.db.get_value("Item", {"name": barcode})
-			barcode_uom = None
-
-			# Try searching by custom_alias field
-			if not item_code:
-				item_code = frappe.db.get_value("Item", {"custom_alias": barcode, "disabled": 0})
-
-			# If still not found, try searching in Serial No table
-			# ONLY search within the POS Profile's warehouse
-			found_serial_no = None
-			if not item_code:
-				serial_data = frappe.db.get_value(
-					"Serial No",
-					{"name": barcode, "status": "Active", "warehouse": pos_profile_doc.warehouse},
-					["item_code", "warehouse"],
-					as_dict=True
-				)
-				if serial_data:
-					item_code = serial_data.item_code
-					found_serial_no = barcode  # Store the serial number to pre-select it
-					barcode_uom = None
+		# Resolve the scanned code (barcode, item code, alias or serial number in the
+		# profile warehouse) through the unified scan-code index
+		resolved = resolve_barcode(barcode, pos_profile_doc.warehouse)
+		item_code = resolved.item_code if resolved else None
+		barcode_uom = resolved.uom if resolved else None
+		found_serial_no = resolved.serial_no if resolved else None  # Pre-selected below
 
 		if not item_code:
 			frappe.throw(_("Item with barcode {0} not found").format(barcode))
@@ -479,8 +569,8 @@ def search_by_barcode(barcode, pos_profile):
 			item_details["serial_no"] = found_serial_no
 			item_details["qty"] = 1  # Serial items are quantity 1
 			# Override price with MRP from this specific serial if set
-			serial_mrp = frappe.db.get_value("Serial No", found_serial_no, "mrp")
-			if serial_mrp and serial_mrp > 0:
+			serial_mrp = flt(resolved.serial_mrp)
+			if serial_mrp > 0:
 				item_details["mrp"] = serial_mrp
 				item_details["price_list_rate"] = serial_mrp
 				item_details["rate"] = serial_mrp
@@ -631,23 +721,8 @@ def get_item_variants(template_item, pos_profile):
 					{"uom": uom["uom"], "conversion_factor": uom["conversion_factor"]}
 				)
 
-		# Get all UOM-specific prices for variants
-		uom_prices_map = {}
-		if variant_codes:
-			prices = frappe.db.sql(
-				"""
-				SELECT item_code, uom, price_list_rate
-				FROM `tabItem Price`
-				WHERE item_code IN %s AND price_list = %s
-				ORDER BY item_code, uom
-				""",
-				[variant_codes, pos_profile_doc.selling_price_list],
-				as_dict=1,
-			)
-			for price in prices:
-				if price["item_code"] not in uom_prices_map:
-					uom_prices_map[price["item_code"]] = {}
-				uom_prices_map[price["item_code"]][price["uom"]] = price["price_list_rate"]
+		# Get all UOM-specific prices for variants (from the price index)
+		uom_prices_map = get_item_prices(pos_profile_doc.selling_price_list, variant_codes)
 
 		# Get all variant attributes in a single query (performance optimization)
 		attributes_map = {}
@@ -728,6 +803,267 @@ def _build_item_base_conditions(pos_profile_doc, item_group=None):
 	return conditions, params
 
 
+def _get_item_fulltext_config():
+	"""
+	Return (index_available, min_token_size) for the Item FULLTEXT search index.
+
+	Both values are read from the database once and cached; the patch that
+	creates the index clears the cache entry.
+	"""
+
+	def _load():
+		has_index = bool(
+			frappe.db.sql(
+				"SHOW INDEX FROM `tabItem` WHERE Key_name = %s",
+				ITEM_FULLTEXT_INDEX,
+			)
+		)
+		min_token_size = frappe.db.sql("SHOW VARIABLES LIKE 'innodb_ft_min_token_size'")
+		return {
+			"has_index": has_index,
+			"min_token_size": cint(min_token_size[0][1]) if min_token_size else 3,
+		}
+
+	config = frappe.cache().get_value(ITEM_FULLTEXT_CACHE_KEY, generator=_load)
+	return config["has_index"], config["min_token_size"]
+
+
+def _has_serial_suffix_index():
+	"""Whether the optional reversed serial number column/index exists (cached)."""
+
+	def _load():
+		return bool(
+			frappe.db.sql(
+				"SHOW INDEX FROM `tabSerial No` WHERE Key_name = %s",
+				SERIAL_SUFFIX_INDEX,
+			)
+		)
+
+	return frappe.cache().get_value(SERIAL_SUFFIX_CACHE_KEY, generator=_load)
+
+
+def add_item_search_indexes():
+	"""
+	Create the Item indexes used by get_items: (item_name, name) for cursor
+	pages and the FULLTEXT index for search. Run on install and by patch.
+	"""
+	frappe.db.add_index("Item", ["item_name", "name"], index_name=ITEM_KEYSET_INDEX)
+
+	if not frappe.db.sql("SHOW INDEX FROM `tabItem` WHERE Key_name = %s", ITEM_FULLTEXT_INDEX):
+		frappe.db.sql_ddl(
+			f"ALTER TABLE `tabItem` ADD FULLTEXT INDEX `{ITEM_FULLTEXT_INDEX}` ({ITEM_FULLTEXT_COLUMNS})"
+		)
+
+	frappe.cache().delete_value(ITEM_FULLTEXT_CACHE_KEY)
+
+
+def add_serial_suffix_index():
+	"""
+	Add the reversed serial number column and index used for "last digits" search.
+
+	Optional: on large Serial No tables the ALTER rewrites the table, so it is
+	run on demand (bench --site <site> add-pos-serial-suffix-index).
+	"""
+	if not frappe.db.has_column("Serial No", SERIAL_SUFFIX_COLUMN):
+		frappe.db.sql_ddl(
+			f"""
+			ALTER TABLE `tabSerial No`
+			ADD COLUMN `{SERIAL_SUFFIX_COLUMN}` VARCHAR(140) AS (REVERSE(name)) STORED
+			"""
+		)
+	if not frappe.db.sql("SHOW INDEX FROM `tabSerial No` WHERE Key_name = %s", SERIAL_SUFFIX_INDEX):
+		frappe.db.sql_ddl(
+			f"ALTER TABLE `tabSerial No` ADD INDEX `{SERIAL_SUFFIX_INDEX}` (`{SERIAL_SUFFIX_COLUMN}`)"
+		)
+
+	frappe.cache().delete_value(SERIAL_SUFFIX_CACHE_KEY)
+
+
+def _escape_like(value):
+	return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _find_items_by_serial_no(search_term, warehouse, limit=10):
+	"""
+	Item codes of Active serial numbers in the warehouse matching a search term.
+
+	Lookups are index range scans, tried in order until one matches:
+	exact serial number, serial numbers starting with the term and, when the
+	optional reversed index exists, serial numbers ending with the term.
+	"""
+	search_term = (search_term or "").strip()
+	if not search_term or not warehouse:
+		return []
+
+	def lookup(condition, value):
+		return frappe.db.sql_list(
+			f"""
+			SELECT DISTINCT item_code
+			FROM `tabSerial No`
+			WHERE {condition}
+				AND status = 'Active'
+				AND warehouse = %s
+			LIMIT %s
+			""",
+			(value, warehouse, limit),
+		)
+
+	item_codes = lookup("name = %s", search_term)
+	if not item_codes:
+		item_codes = lookup("name LIKE %s", f"{_escape_like(search_term)}%")
+	if (
+		not item_codes
+		and len(search_term) >= MIN_SERIAL_SUFFIX_LENGTH
+		and _has_serial_suffix_index()
+	):
+		item_codes = lookup(f"{SERIAL_SUFFIX_COLUMN} LIKE %s", f"{_escape_like(search_term[::-1])}%")
+
+	return item_codes
+
+
+def _build_item_search_conditions(search_words):
+	"""
+	Build word-order independent match conditions for get_items search.
+
+	Every search word must appear anywhere in the item code, name or
+	description (CONCAT ... LIKE '%word%'). Words the indexes can serve also
+	yield a candidates query, so the LIKE conditions are only checked on the
+	rows it returns:
+	- item code / name contains the word: all its trigrams in POS Item Search
+	  Trigram (words of at least 3 characters, once the index is built)
+	- a word of the code, name or description starts with it: the FULLTEXT
+	  index ('+word*')
+	Only when no word can be served (all shorter than a trigram, or the
+	trigram index not built yet) is the search a scan of the Item table.
+
+	Returns:
+		tuple: (candidates_sql or None, candidates_params, conditions, params)
+			candidates_sql is a derived table of (candidate_item_code,
+			candidate_prefix_words): the number of words matched through FULLTEXT
+	"""
+	search_text = "CONCAT(COALESCE(name, ''), ' ', COALESCE(item_name, ''), ' ', COALESCE(description, ''))"
+	conditions = ["(" + " AND ".join([f"{search_text} LIKE %s"] * len(search_words)) + ")"]
+	params = [f"%{_escape_like(word)}%" for word in search_words]
+
+	if not is_trigram_index_ready():
+		return None, [], conditions, params
+
+	has_index, min_token_size = _get_item_fulltext_config()
+	parts = []
+	candidates_params = []
+	for word_no, word in enumerate(search_words):
+		trigrams = get_word_trigrams(word)
+		if not trigrams:
+			continue  # Checked by LIKE on the other words' candidates
+
+		parts.append(
+			f"""
+			SELECT item_code, {word_no} AS word_no, 0 AS prefix_match
+			FROM `tabPOS Item Search Trigram`
+			WHERE trigram IN %s
+			GROUP BY item_code
+			HAVING COUNT(DISTINCT trigram) = %s
+			"""
+		)
+		candidates_params += [tuple(trigrams), len(trigrams)]
+
+		tokens = [f"+{t}*" for t in re.findall(r"\w+", word) if len(t) >= min_token_size]
+		if has_index and tokens:
+			parts.append(
+				f"""
+				SELECT name, {word_no}, 1
+				FROM `tabItem`
+				WHERE MATCH({ITEM_FULLTEXT_COLUMNS}) AGAINST (%s IN BOOLEAN MODE)
+				"""
+			)
+			candidates_params.append(" ".join(tokens))
+
+	if not parts:
+		return None, [], conditions, params
+
+	served_words = len({word_no for word_no, word in enumerate(search_words) if get_word_trigrams(word)})
+	candidates_sql = f"""
+		(
+			SELECT item_code AS candidate_item_code,
+				COUNT(DISTINCT CASE WHEN prefix_match = 1 THEN word_no END) AS candidate_prefix_words
+			FROM ({" UNION ALL ".join(parts)}) word_matches
+			GROUP BY item_code
+			HAVING COUNT(DISTINCT word_no) = %s
+		)
+	"""
+	candidates_params.append(served_words)
+	return candidates_sql, candidates_params, conditions, params
+
+
+def _search_items(pos_profile_doc, item_group, search_term, search_words, limit, cursor=None, start=0):
+	"""
+	Items matching a search, ranked by relevance, in one keyset query.
+
+	The rows come from the index candidates of _build_item_search_conditions
+	(or a scan when the words cannot be served). Relevance tiers: exact item
+	name / code, item name / code prefix, every served word matched at a word
+	start (FULLTEXT), then any other "contains" match such as "phone" inside
+	"iPhone". Pages are a keyset over (relevance DESC, item_name, name); rows
+	carry "relevance".
+	"""
+	candidates_sql, candidates_params, search_conditions, search_params = _build_item_search_conditions(
+		search_words
+	)
+
+	prefix_pattern = f"{_escape_like(search_term)}%"
+	prefix_words_tier = "WHEN search_candidates.candidate_prefix_words = %s THEN 200" if candidates_sql else ""
+	# Simple relevance scoring with case-insensitive comparison
+	relevance = f"""
+		CASE
+			WHEN LOWER(item_name) = LOWER(%s) THEN 1000
+			WHEN LOWER(name) = LOWER(%s) THEN 900
+			WHEN LOWER(item_name) LIKE LOWER(%s) THEN 500
+			WHEN LOWER(name) LIKE LOWER(%s) THEN 400
+			{prefix_words_tier}
+			ELSE 100
+		END
+	"""
+	score_params = [search_term, search_term, prefix_pattern, prefix_pattern]
+
+	from_clause = "`tabItem`"
+	if candidates_sql:
+		from_clause = f"""
+			{candidates_sql} search_candidates
+			INNER JOIN `tabItem` ON `tabItem`.name = search_candidates.candidate_item_code
+		"""
+		# Equal to the number of served words when each was matched at a word start
+		score_params.append(candidates_params[-1])
+
+	conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
+	conditions.extend(search_conditions)
+	params.extend(search_params)
+	where_clause = " AND ".join(conditions)
+
+	# Rank in the select list and filter with HAVING so the score is evaluated once per row
+	having_clause = ""
+	having_params = []
+	if cursor:
+		having_clause = """
+			HAVING relevance < %s
+				OR (relevance = %s AND (item_name > %s OR (item_name = %s AND item_code > %s)))
+		"""
+		score, item_name, item_code = cursor
+		having_params = [score, score, item_name, item_name, item_code]
+
+	return frappe.db.sql(
+		f"""
+		SELECT {ITEM_RESULT_COLUMNS}, {relevance} AS relevance
+		FROM {from_clause}
+		WHERE {where_clause}
+		{having_clause}
+		ORDER BY relevance DESC, item_name ASC, item_code ASC
+		LIMIT %s OFFSET %s
+		""",
+		(*score_params, *candidates_params, *params, *having_params, limit, start),
+		as_dict=1,
+	)
+
+
 def _calculate_bundle_availability_bulk(bundle_codes, warehouse):
 	"""
 	Calculate Product Bundle availability in bulk with component-based calculation.
@@ -756,9 +1092,9 @@ def _calculate_bundle_availability_bulk(bundle_codes, warehouse):
 
 	Performance Optimization:
 	=========================
-	- Single bulk query for all bundle components
-	- Single bulk query for all component stock levels
-	- Handles multiple bundles simultaneously
+	- Served from the materialized store in pos_next.api.bundle_availability
+	- Only bundles whose components changed stock are recomputed
+	- Misses are recomputed for all bundles at once (bulk queries)
 	- Supports group warehouses (auto-expands to child warehouses)
 
 	Group Warehouse Support:
@@ -783,9 +1119,8 @@ def _calculate_bundle_availability_bulk(bundle_codes, warehouse):
 		{"LAPTOP-COMBO": 30, "DESKTOP-BUNDLE": 15}
 
 	Database Queries:
-		1. Fetch all bundle components (1 query for all bundles)
-		2. Fetch stock for all components (1 query for all items)
-		Total: 2 queries regardless of number of bundles
+		None when every bundle is materialized; otherwise the bulk
+		calculation in _compute_bundle_warehouse_availability_bulk
 
 	Edge Cases:
 		- No bundles: Returns {}
@@ -794,150 +1129,60 @@ def _calculate_bundle_availability_bulk(bundle_codes, warehouse):
 		- Component not in stock table: Treated as 0 availability
 		- Group warehouse with no children: Falls back to warehouse itself
 	"""
-	# ===========================================================================
-	# GUARD CLAUSE: Validate inputs
-	# ===========================================================================
 	if not bundle_codes or not warehouse:
 		return {}
 
-	# ===========================================================================
-	# STEP 1: Fetch Bundle Component Definitions
-	# ===========================================================================
-	# Query all bundle definitions and their components in a single query.
-	# This is more efficient than querying each bundle separately.
-	#
-	# Example Result:
-	# [
-	#   {"bundle_code": "LAPTOP-COMBO", "component_code": "LAPTOP", "required_qty": 1},
-	#   {"bundle_code": "LAPTOP-COMBO", "component_code": "MOUSE", "required_qty": 1},
-	#   {"bundle_code": "LAPTOP-COMBO", "component_code": "KEYBOARD", "required_qty": 1}
-	# ]
-	pb = DocType("Product Bundle")
-	pbi = DocType("Product Bundle Item")
-	
-	bundle_components = (
-		frappe.qb.from_(pb)
-		.inner_join(pbi).on(pbi.parent == pb.name)
-		.select(
-			pb.new_item_code.as_("bundle_code"),
-			pbi.item_code.as_("component_code"),
-			pbi.qty.as_("required_qty")
-		)
-		.where(pb.new_item_code.isin(bundle_codes))
-		.run(as_dict=True)
-	)
+	from pos_next.api.bundle_availability import get_bundle_availability
 
-	if not bundle_components:
-		# No bundle definitions found - items are not configured as bundles
-		return {}
+	availability = get_bundle_availability(bundle_codes, [warehouse])
+	return {bundle_code: by_warehouse[warehouse] for bundle_code, by_warehouse in availability.items()}
 
-	# ===========================================================================
-	# STEP 2: Extract Unique Component Codes
-	# ===========================================================================
-	# Get all unique component item codes needed across all bundles.
-	# This allows us to fetch stock for all components in a single query.
-	#
-	# Example: {"LAPTOP", "MOUSE", "KEYBOARD", "MONITOR", "CABLE"}
-	component_codes = list(set(c["component_code"] for c in bundle_components))
 
-	# ===========================================================================
-	# STEP 3: Resolve Warehouse Hierarchy (Group Warehouse Support)
-	# ===========================================================================
-	# If the warehouse is a group warehouse, expand to include all child warehouses.
-	# This provides accurate stock availability across multiple storage locations.
-	#
-	# Example:
-	#   Input: "Main Store" (group warehouse)
-	#   Output: ["Main Store - A", "Main Store - B", "Main Store - C"]
-	warehouses = [warehouse]
-	if frappe.db.get_value("Warehouse", warehouse, "is_group"):
-		child_warehouses = frappe.db.get_descendants("Warehouse", warehouse)
-		# Fallback to original warehouse if no children found
-		warehouses = child_warehouses or [warehouse]
+def _get_bundle_warehouse_availability_bulk(bundle_codes, warehouses):
+	"""
+	Product Bundle availability across multiple warehouses (materialized).
 
-	# ===========================================================================
-	# STEP 4: Fetch Stock Availability for All Components (Bulk Query)
-	# ===========================================================================
-	# Query stock for all component items across all warehouses in ONE query.
-	# Uses available_qty (actual - reserved) to prevent overselling.
-	#
-	# Performance: Single query handles all components regardless of count
-	# Formula: available_qty = actual_qty - reserved_qty
-	#
-	# Example Result:
-	# [
-	#   {"item_code": "LAPTOP", "available_qty": 50.0},
-	#   {"item_code": "MOUSE", "available_qty": 30.0},
-	#   {"item_code": "KEYBOARD", "available_qty": 100.0}
-	# ]
-	bin = DocType("Bin")
-	
-	component_stock = (
-		frappe.qb.from_(bin)
-		.select(
-			bin.item_code,
-			fn.Coalesce(fn.Sum(bin.actual_qty - bin.reserved_qty), 0).as_("available_qty")
-		)
-		.where(bin.item_code.isin(component_codes))
-		.where(bin.warehouse.isin(warehouses))
-		.groupby(bin.item_code)
-		.run(as_dict=True)
-	)
+	Args:
+		bundle_codes (list): List of bundle item codes
+		warehouses (list): List of warehouse dicts with 'name' key
 
-	# Build fast lookup map: item_code -> available_qty
-	# Components not in map are treated as having 0 stock
-	component_stock_map = {row["item_code"]: flt(row["available_qty"]) for row in component_stock}
+	Returns:
+		dict: Nested mapping of bundle_code -> warehouse_name -> available_qty,
+			  only for warehouses where at least one bundle can be assembled
+	"""
+	if not bundle_codes or not warehouses:
+		return {}
 
-	# ===========================================================================
-	# STEP 5: Calculate Bundle Availability (Limited by Most Constrained Component)
-	# ===========================================================================
-	# For each bundle, determine how many complete bundles can be made based on
-	# component availability. The bundle quantity is limited by whichever
-	# component can make the FEWEST bundles.
-	#
-	# Formula: possible_bundles = floor(available_qty / required_qty)
-	# Final: bundle_qty = min(possible_bundles across all components)
-	#
-	# Example:
-	#   LAPTOP-COMBO components:
-	#     - LAPTOP (need 1): 50 available → 50 possible bundles
-	#     - MOUSE (need 1): 30 available → 30 possible bundles ← LIMITING FACTOR
-	#     - KEYBOARD (need 1): 100 available → 100 possible bundles
-	#   Result: LAPTOP-COMBO availability = 30 (limited by MOUSE)
-	bundle_availability = {}
-	for comp in bundle_components:
-		bundle_code = comp["bundle_code"]
-		available = component_stock_map.get(comp["component_code"], 0)
-		required = flt(comp["required_qty"])
-
-		if required > 0:
-			# Calculate how many bundles this component can supply
-			possible = int(available / required)
-
-			# Update bundle availability with minimum across all components
-			if bundle_code not in bundle_availability:
-				# First component for this bundle
-				bundle_availability[bundle_code] = possible
-			else:
-				# Subsequent components - take minimum (most constrained)
-				bundle_availability[bundle_code] = min(bundle_availability[bundle_code], possible)
+	from pos_next.api.bundle_availability import get_bundle_availability
 
-	return bundle_availability
+	warehouse_names = [w["name"] if isinstance(w, dict) else w for w in warehouses]
+	availability = get_bundle_availability(bundle_codes, warehouse_names)
 
+	result = {}
+	for bundle_code, by_warehouse in availability.items():
+		available = {wh_name: qty for wh_name, qty in by_warehouse.items() if qty > 0}
+		if available:
+			result[bundle_code] = available
+	return result
 
-def _get_bundle_warehouse_availability_bulk(bundle_codes, warehouses):
+
+def _compute_bundle_warehouse_availability_bulk(bundle_codes, warehouses):
 	"""
-	Calculate Product Bundle availability across multiple warehouses efficiently.
+	Calculate Product Bundle availability across multiple warehouses from Bin.
+
+	Used to fill the materialized store; call _get_bundle_warehouse_availability_bulk
+	or _calculate_bundle_availability_bulk instead.
 	
 	Args:
 		bundle_codes (list): List of bundle item codes
 		warehouses (list): List of warehouse dicts with 'name' key
 		
 	Returns:
-		dict: Nested mapping of bundle_code -> warehouse_name -> available_qty
+		dict: Nested mapping of bundle_code -> warehouse_name -> available_qty,
+			  including warehouses where the bundle cannot be assembled (<= 0)
 			  Example: {
-				  "BUNDLE-001": {"Warehouse A": 30, "Warehouse B": 15},
-				  "BUNDLE-002": {"Warehouse A": 10}
+				  "BUNDLE-001": {"Warehouse A": 30, "Warehouse B": 0},
+				  "BUNDLE-002": {"Warehouse A": 10, "Warehouse B": 0}
 			  }
 	"""
 	if not bundle_codes or not warehouses:
@@ -967,34 +1212,28 @@ def _get_bundle_warehouse_availability_bulk(bundle_codes, warehouses):
 		return {}
 
 	component_codes = list(set(c["component_code"] for c in bundle_components))
-	warehouse_resolution_map = {}
+	warehouse_resolution_map = resolve_warehouses(warehouse_names)
 	all_resolved_warehouses = set()
-	
-	for wh_name in warehouse_names:
-		resolved = [wh_name]
-		if frappe.db.get_value("Warehouse", wh_name, "is_group"):
-			children = frappe.db.get_descendants("Warehouse", wh_name)
-			if children:
-				resolved = children
-		warehouse_resolution_map[wh_name] = resolved
+	for resolved in warehouse_resolution_map.values():
 		all_resolved_warehouses.update(resolved)
 	
 	# ===========================================================================
 	# Fetch Component Stock Across All Warehouses (single bulk query)
 	# ===========================================================================
-	bin = DocType("Bin")
-	
-	component_stock_data = (
-		frappe.qb.from_(bin)
-		.select(
-			bin.item_code,
-			bin.warehouse,
-			fn.Coalesce(fn.Sum(bin.actual_qty - bin.reserved_qty), 0).as_("available_qty")
-		)
-		.where(bin.item_code.isin(component_codes))
-		.where(bin.warehouse.isin(list(all_resolved_warehouses)))
-		.groupby(bin.item_code, bin.warehouse)
-		.run(as_dict=True)
+	# A locking (current) read: the result is written back to the materialized
+	# store if no invalidation happened since the caller read the generation, so
+	# it must not come from a transaction snapshot taken before that read.
+	component_stock_data = frappe.db.sql(
+		"""
+		SELECT item_code, warehouse,
+			COALESCE(SUM(actual_qty - reserved_qty), 0) AS available_qty
+		FROM `tabBin`
+		WHERE item_code IN %s AND warehouse IN %s
+		GROUP BY item_code, warehouse
+		LOCK IN SHARE MODE
+		""",
+		(component_codes, list(all_resolved_warehouses)),
+		as_dict=True,
 	)
 	
 	# Build lookup: (item_code, warehouse) -> available_qty
@@ -1044,85 +1283,440 @@ def _get_bundle_warehouse_availability_bulk(bundle_codes, warehouses):
 				else:
 					min_possible = min(min_possible, possible)
 			
-			# Only include if bundle is available (min_possible > 0)
-			if min_possible is not None and min_possible > 0:
+			if min_possible is not None:
 				result[bundle_code][wh_name] = min_possible
 	
 	return dict(result)
 
 
-@frappe.whitelist()
-def get_items(pos_profile, search_term=None, item_group=None, start=0, limit=20):
-	"""Get items for POS with stock, price, and tax details"""
-	try:
-		pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
+def _enrich_items(items, pos_profile_doc):
+	"""
+	Enrich raw Item rows in place with price, stock, barcode and UOM data.
 
-		# IMPORTANT: Filtering logic (handled in _build_item_base_conditions):
-		# - disabled=0, is_sales_item=1, variant_of is null (excludes variants)
-		# - Template items (has_variants=1) are shown → users select variants via dialog
-		# - Regular items (has_variants=0, variant_of is null) are shown → direct add to cart
-		# - Variant items (has_variants=0, variant_of is not null) are HIDDEN from main list
-		# - Company filter uses IFNULL for null-safe matching (global items + company items)
+	Shared by every endpoint that returns catalog rows so that paginated loads and
+	delta syncs produce identical item structures.
 
-		# Build search conditions with fuzzy word-order independent matching
-		if search_term and len(search_term.strip()) > 0:
-			# Split search term into words for fuzzy matching
-			search_words = [word.strip() for word in search_term.split() if word.strip()]
-			# Deduplicate to keep boolean queries lean and LIKE predicates minimal
-			search_words = list(dict.fromkeys(search_words))
-
-			# Fuzzy search: match if search term appears anywhere in item fields
-			conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
+	Args:
+		items (list): Rows selected with ITEM_RESULT_COLUMNS
+		pos_profile_doc: POS Profile document (warehouse and price list source)
 
-			# Word-order independent: all words must appear somewhere
-			search_text = "CONCAT(COALESCE(name, ''), ' ', COALESCE(item_name, ''), ' ', COALESCE(description, ''))"
-			word_conditions = " AND ".join([f"{search_text} LIKE %s"] * len(search_words))
-			conditions.append(f"({word_conditions})")
-			params.extend([f"%{word}%" for word in search_words])
-
-			# Use parameterized queries - no need to escape, SQL handles it
-			prefix_pattern = f"{search_term}%"
-
-			where_clause = " AND ".join(conditions)
-
-			# Simple relevance scoring with case-insensitive comparison
-			relevance = f"""
-				CASE
-					WHEN LOWER(item_name) = LOWER(%s) THEN 1000
-					WHEN LOWER(name) = LOWER(%s) THEN 900
-					WHEN LOWER(item_name) LIKE LOWER(%s) THEN 500
-					WHEN LOWER(name) LIKE LOWER(%s) THEN 400
-					ELSE 100
-				END
+	Returns:
+		list: The same list, enriched
+	"""
+	# Prepare maps for enrichment
+	item_codes = [item["item_code"] for item in items]
+	barcode_map = {}
+	conversion_map = defaultdict(dict)  # parent -> {uom: factor}
+	uom_map = {}  # parent -> [ {uom, conversion_factor}, ... ]
+
+	# Barcodes
+	if item_codes:
+		barcodes = frappe.db.sql(
 			"""
-			score_params = [search_term, search_term, prefix_pattern, prefix_pattern]
+			SELECT parent, barcode
+			FROM `tabItem Barcode`
+			WHERE parent IN %s
+			GROUP BY parent
+			""",
+			[item_codes],
+			as_dict=1,
+		)
+		barcode_map = {b["parent"]: b["barcode"] for b in barcodes}
 
-			query = f"""
-				SELECT {ITEM_RESULT_COLUMNS}
-				FROM `tabItem`
-				WHERE {where_clause}
-				ORDER BY {relevance} DESC, item_name ASC
-				LIMIT %s OFFSET %s
+	# Thumbnail URLs, versioned by image content hash (one File query)
+	thumbnail_map = get_thumbnail_urls([item.get("image") for item in items])
+
+	# UOM conversions (both list & map for quick lookup)
+	if item_codes:
+		conversions = frappe.get_all(
+			"UOM Conversion Detail",
+			filters={"parent": ["in", item_codes]},
+			fields=["parent", "uom", "conversion_factor"],
+		)
+		for row in conversions:
+			# build list
+			uom_map.setdefault(row.parent, []).append(
+				{"uom": row.uom, "conversion_factor": row.conversion_factor}
+			)
+			# build fast lookup
+			if row.uom:
+				conversion_map[row.parent][row.uom] = row.conversion_factor
+
+	# UOM-specific prices for all items - one lookup in the price index
+	uom_prices_map = get_item_prices(pos_profile_doc.selling_price_list, item_codes)  # item_code -> {uom: price_list_rate}
+
+	# Batch query stock for all items at once (performance optimization)
+	stock_map = {}
+	serial_qty_map = {}  # For serial-tracked items: count of active serial numbers
+	if item_codes and pos_profile_doc.warehouse:
+		stock_items = [item["item_code"] for item in items if item.get("is_stock_item")]
+		if stock_items:
+			stocks = frappe.db.sql(
+				"""
+				SELECT item_code, actual_qty
+				FROM `tabBin`
+				WHERE item_code IN %s AND warehouse = %s
+				""",
+				[stock_items, pos_profile_doc.warehouse],
+				as_dict=1,
+			)
+			stock_map = {s["item_code"]: s["actual_qty"] for s in stocks}
+
+		# For serial-tracked items, count active serial numbers per item
+		# This ensures quantity matches serial number availability
+		serial_items = [item["item_code"] for item in items if item.get("has_serial_no")]
+		if serial_items:
+			serial_qty_map = get_active_serial_counts(serial_items, [pos_profile_doc.warehouse])
+
+	# ===================================================================
+	# PRODUCT BUNDLE AVAILABILITY: Calculate bundle stock (bulk optimized)
+	# ===================================================================
+	# Product Bundles are "virtual" items assembled from component items.
+	# Unlike regular stock items, bundles don't have direct stock entries.
+	# Instead, availability is calculated from component stock levels.
+	#
+	# Example:
+	#   Bundle: "Office Starter Kit"
+	#   Components:
+	#     - Desk (need 1, have 10) → can make 10 bundles
+	#     - Chair (need 2, have 15) → can make 7 bundles ← LIMITING
+	#     - Lamp (need 1, have 20) → can make 20 bundles
+	#   Result: Bundle availability = 7 (limited by chairs)
+	#
+	# Performance: Single bulk calculation for ALL bundles (not per-item)
+	# This is done BEFORE the item enrichment loop for efficiency.
+	bundle_availability_map = {}
+	if item_codes and pos_profile_doc.warehouse:
+		# Bulk calculate availability for all items (bundles auto-detected)
+		bundle_availability_map = _calculate_bundle_availability_bulk(
+			item_codes,
+			pos_profile_doc.warehouse
+		)
+	elif item_codes and not pos_profile_doc.warehouse:
+		# Warning: Bundles require warehouse for component stock lookup
+		# Without warehouse, bundles will show as unavailable (qty = 0)
+		has_bundles = frappe.db.exists("Product Bundle", {"new_item_code": ["in", item_codes]})
+		if has_bundles:
+			frappe.log_error(
+				"POS Profile missing warehouse - Product Bundles will show as unavailable",
+				"Bundle Availability Warning"
+			)
+
+	# Minimum variant price for templates without a price of their own
+	# (one grouped query for the whole page instead of one per template)
+	template_min_price_map = {}
+	unpriced_templates = [
+		item["item_code"]
+		for item in items
+		if item.get("has_variants") and not uom_prices_map.get(item["item_code"])
+	]
+	if unpriced_templates:
+		variant_prices = frappe.db.sql(
 			"""
+			SELECT i.variant_of, MIN(ip.price_list_rate) as min_price
+			FROM `tabItem Price` ip
+			INNER JOIN `tabItem` i ON i.name = ip.item_code
+			WHERE i.variant_of IN %s
+			AND ip.price_list = %s
+			AND i.disabled = 0
+			GROUP BY i.variant_of
+			""",
+			[unpriced_templates, pos_profile_doc.selling_price_list],
+			as_dict=1,
+		)
+		template_min_price_map = {row["variant_of"]: row["min_price"] for row in variant_prices}
+
+	# Enrich items with price, stock, barcode, and UOM data
+	for item in items:
+		stock_uom = item.get("stock_uom")
+
+		# Use pre-loaded price map instead of per-item queries
+		price_row = None
+		item_prices = uom_prices_map.get(item["item_code"], {})
+
+		# 1) Try price explicitly for stock UOM (preferred)
+		if stock_uom and stock_uom in item_prices:
+			price_row = {"price_list_rate": item_prices[stock_uom], "uom": stock_uom}
+
+		# 2) If not found, try any price for the item (and capture its UOM)
+		elif item_prices:
+			# Get first available price
+			first_uom = next(iter(item_prices.keys()))
+			price_row = {"price_list_rate": item_prices[first_uom], "uom": first_uom}
+
+		# 3) If still not found and it's a template, use the pre-loaded min variant price
+		derived_price = None
+		if not price_row and item.get("has_variants"):
+			derived_price = template_min_price_map.get(item["item_code"]) or None
+
+		# Finalize display price & display UOM
+		display_rate = 0.0
+		display_uom = stock_uom
+
+		if price_row:
+			raw_rate = flt(price_row.get("price_list_rate") or 0)
+			price_uom = price_row.get("uom") or stock_uom
+			if price_uom and stock_uom and price_uom != stock_uom:
+				# convert to per-stock-UOM if possible
+				cf = flt(conversion_map[item["item_code"]].get(price_uom) or 0)
+				if cf:
+					display_rate = raw_rate / cf
+					display_uom = stock_uom
+				else:
+					# no conversion available: show as is (price UOM)
+					display_rate = raw_rate
+					display_uom = price_uom
+			else:
+				display_rate = raw_rate
+				display_uom = stock_uom
+		elif derived_price is not None:
+			display_rate = flt(derived_price)
+			display_uom = stock_uom
 
-			params.extend(score_params)
-			params.extend([limit, start])
-			items = frappe.db.sql(query, tuple(params), as_dict=1)
+		item["rate"] = display_rate
+		item["price_list_rate"] = display_rate
+		item["uom"] = display_uom
+		item["price_uom"] = display_uom
+		item["conversion_factor"] = 1
+		item["price_list_rate_price_uom"] = display_rate
+
+		# ===================================================================
+		# STOCK QUANTITY ASSIGNMENT: Stock Items vs Product Bundles
+		# ===================================================================
+		# Stock items: Use actual_qty from Bin table (direct stock tracking)
+		# Serial items: Use count of active serial numbers (more accurate)
+		# Product Bundles: Use calculated availability from component stock
+		if item.get("is_stock_item"):
+			if item.get("has_serial_no") and item["item_code"] in serial_qty_map:
+				# For serial-tracked items, use serial number count
+				# This prevents mismatches between Bin qty and actual serials
+				item["actual_qty"] = serial_qty_map.get(item["item_code"], 0)
+			else:
+				item["actual_qty"] = stock_map.get(item["item_code"], 0)
+		else:
+			item["actual_qty"] = bundle_availability_map.get(item["item_code"], 0)
+
+		# ===================================================================
+		# BUNDLE MARKER: Flag items that are Product Bundles
+		# ===================================================================
+		# Add is_bundle=True flag for frontend to identify bundle items.
+		# This allows UI to show bundle-specific indicators and handle
+		# bundle logic differently (e.g., show component details on click).
+		#
+		# Bundle Detection: If item_code exists in bundle_availability_map,
+		# it means a Product Bundle definition exists for this item.
+		if item["item_code"] in bundle_availability_map:
+			item["is_bundle"] = True
+
+		# Add warehouse to item (needed for stock validation)
+		item["warehouse"] = pos_profile_doc.warehouse
+
+		# Barcode
+		item["barcode"] = barcode_map.get(item["item_code"], "")
+
+		# Resized WebP for item grids (the original stays in "image")
+		item["thumbnail"] = thumbnail_map.get(item.get("image"))
+
+		# Item UOMs (exclude stock UOM to avoid duplicates)
+		all_uoms = uom_map.get(item["item_code"], []) or []
+		item["item_uoms"] = [u for u in all_uoms if u.get("uom") != stock_uom]
+
+		# UOM-specific prices map for frontend selector
+		item["uom_prices"] = uom_prices_map.get(item["item_code"], {})
+
+	return items
+
+
+def _parse_item_cursor(after):
+	"""
+	Parse a get_items keyset cursor into (relevance, item_name, item_code).
+
+	Cursors are the next_cursor lists returned by get_items (JSON-encoded when
+	sent from the client). Empty values mean "first page" and yield None.
+	"""
+	if isinstance(after, str):
+		after = after.strip()
+		if not after:
+			return None
+		try:
+			after = json.loads(after)
+		except (json.JSONDecodeError, ValueError):
+			frappe.throw(_("Invalid item cursor"))
+
+	if not after:
+		return None
+
+	if not isinstance(after, list | tuple) or len(after) != 3:
+		frappe.throw(_("Invalid item cursor"))
+
+	score, item_name, item_code = after
+	return cint(score), item_name or "", item_code or ""
+
+
+def _get_items_by_popularity(pos_profile_doc, item_group, limit, cursor=None, start=0):
+	"""
+	List items best sellers first, in two phases that each follow an index.
+
+	First the profile's ranked POS Item Velocity rows, read in (invoice_count
+	DESC, item_code) order from pos_profile_invoice_count and joined to the
+	item filters; then the items without velocity, by the usual item_name
+	keyset. Rows carry "relevance" (the invoice count, 0 in the second phase),
+	so cursors keep the (score, item_name, item_code) shape: a score of 0
+	continues in the second phase.
+	"""
+	items = []
+	if not cursor or cursor[0] > 0:
+		conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
+		if cursor:
+			score, _item_name, item_code = cursor
+			conditions.append(
+				"(velocity_invoice_count < %s OR (velocity_invoice_count = %s AND velocity_item_code > %s))"
+			)
+			params.extend([score, score, item_code])
+
+		items = frappe.db.sql(
+			f"""
+			SELECT {ITEM_RESULT_COLUMNS}, velocity_invoice_count AS relevance
+			FROM {get_velocity_join_sql()}
+			WHERE {" AND ".join(conditions)}
+			ORDER BY velocity_invoice_count DESC, velocity_item_code ASC
+			LIMIT %s OFFSET %s
+			""",
+			(pos_profile_doc.name, *params, limit, start),
+			as_dict=1,
+		)
+		if len(items) >= limit:
+			return items
+
+	unranked_start = 0
+	if start:
+		# Offset paging: skip what the first phase would have listed before this page
+		conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
+		ranked_count = frappe.db.sql(
+			f"""
+			SELECT COUNT(*)
+			FROM {get_velocity_join_sql()}
+			WHERE {" AND ".join(conditions)}
+			""",
+			(pos_profile_doc.name, *params),
+		)[0][0]
+		unranked_start = max(0, start - cint(ranked_count))
+
+	conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
+	conditions.append(get_unranked_condition_sql())
+	params.append(pos_profile_doc.name)
+	if cursor and cursor[0] <= 0:
+		_score, item_name, item_code = cursor
+		conditions.append("(item_name > %s OR (item_name = %s AND name > %s))")
+		params.extend([item_name, item_name, item_code])
+
+	items += frappe.db.sql(
+		f"""
+		SELECT {ITEM_RESULT_COLUMNS}, 0 AS relevance
+		FROM `tabItem`
+		WHERE {" AND ".join(conditions)}
+		ORDER BY item_name ASC, name ASC
+		LIMIT %s OFFSET %s
+		""",
+		(*params, limit - len(items), unranked_start),
+		as_dict=1,
+	)
+	return items
+
+
+@frappe.whitelist()
+@conditional_get(
+	"Item",
+	"Item Group",
+	"Item Price",
+	"POS Item Velocity",
+	"POS Profile",
+	"Price List",
+	"Product Bundle",
+	"Serial No",
+	"Stock Ledger Entry",
+	"Warehouse",
+)
+def get_items(
+	pos_profile,
+	search_term=None,
+	item_group=None,
+	start=0,
+	limit=20,
+	after=None,
+	format=None,
+	compress=None,
+	order_by=None,
+):
+	"""
+	Get items for POS with stock, price, and tax details.
+
+	Pagination:
+		By default pages are addressed with start/limit (OFFSET) and a plain list
+		is returned. Passing ``after`` switches to keyset (cursor) pagination,
+		which keeps the cost of every page flat regardless of depth:
+		- after="" (or "[]") requests the first page
+		- after=<next_cursor from the previous response> requests the next one
+		In cursor mode the response is {"items": [...], "next_cursor": ...};
+		next_cursor is None on the last page.
+
+	Ordering:
+		Without a search term items are listed by item_name. order_by="popularity"
+		lists the profile's best sellers first (see pos_next.api.item_velocity),
+		then the rest by item_name. Searches are always ranked by relevance.
+
+	Wire format:
+		format="columnar" returns the page as column arrays with dictionary-
+		encoded warehouse, UOM, item group and brand values (see
+		pos_next.api.wire_format); compress="gzip" or "br" additionally
+		compresses it. The default is the plain list of item dicts.
+	"""
+	try:
+		if format not in (None, "", "dict", "columnar"):
+			frappe.throw(_("Unsupported format: {0}").format(format))
+		if compress and format != "columnar":
+			frappe.throw(_("Compression is only available with format=columnar"))
+		if order_by not in (None, "", "item_name", "popularity"):
+			frappe.throw(_("Unsupported order_by: {0}").format(order_by))
+
+		pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
+		limit = cint(limit)
+		use_cursor = after is not None
+		cursor = _parse_item_cursor(after) if use_cursor else None
+
+		# IMPORTANT: Filtering logic (handled in _build_item_base_conditions):
+		# - disabled=0, is_sales_item=1, variant_of is null (excludes variants)
+		# - Template items (has_variants=1) are shown → users select variants via dialog
+		# - Regular items (has_variants=0, variant_of is null) are shown → direct add to cart
+		# - Variant items (has_variants=0, variant_of is not null) are HIDDEN from main list
+		# - Company filter uses IFNULL for null-safe matching (global items + company items)
+
+		# Build search conditions with fuzzy word-order independent matching
+		if search_term and len(search_term.strip()) > 0:
+			# Split search term into words for fuzzy matching
+			search_words = [word.strip() for word in search_term.split() if word.strip()]
+			# Deduplicate to keep boolean queries lean and LIKE predicates minimal
+			search_words = list(dict.fromkeys(search_words))
+
+			# Fuzzy search: every word must appear somewhere in item fields
+			# (answered from the trigram and FULLTEXT indexes, see _build_item_search_conditions)
+			items = _search_items(
+				pos_profile_doc,
+				item_group,
+				search_term,
+				search_words,
+				limit,
+				cursor=cursor,
+				start=0 if use_cursor else cint(start),
+			)
 
 			# If no items found, try searching by serial number
 			# ONLY search within the POS Profile's warehouse
-			if not items:
-				serial_items = frappe.db.sql("""
-					SELECT DISTINCT sn.item_code
-					FROM `tabSerial No` sn
-					WHERE sn.name LIKE %s
-						AND sn.status = 'Active'
-						AND sn.warehouse = %s
-					LIMIT 10
-				""", (f"%{search_term}%", pos_profile_doc.warehouse), as_dict=1)
-
-				if serial_items:
-					item_codes = [s.item_code for s in serial_items]
+			# (cursor mode: only on the first page, later pages are simply exhausted)
+			if not items and not cursor:
+				item_codes = _find_items_by_serial_no(search_term, pos_profile_doc.warehouse)
+
+				if item_codes:
 					# Fetch items by codes found via serial numbers
 					conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
 					conditions.append("name IN %s")
@@ -1137,276 +1731,314 @@ def get_items(pos_profile, search_term=None, item_group=None, start=0, limit=20)
 					"""
 					params.append(limit)
 					items = frappe.db.sql(query, tuple(params), as_dict=1)
+		elif order_by == "popularity":
+			# Best sellers first, then the rest by item_name (see _get_items_by_popularity)
+			items = _get_items_by_popularity(
+				pos_profile_doc, item_group, limit, cursor=cursor, start=0 if use_cursor else cint(start)
+			)
 		else:
 			# No search term - return all items with base filters using raw SQL
 			# (consistent with search path, supports IFNULL for company filter)
 			conditions, params = _build_item_base_conditions(pos_profile_doc, item_group)
-			where_clause = " AND ".join(conditions)
 
-			query = f"""
-				SELECT {ITEM_RESULT_COLUMNS}
-				FROM `tabItem`
-				WHERE {where_clause}
-				ORDER BY item_name ASC
-				LIMIT %s OFFSET %s
-			"""
-			params.extend([limit, start])
+			if use_cursor:
+				# Keyset over (item_name, name) - served by item_name_name_index
+				if cursor:
+					_score, item_name, item_code = cursor
+					conditions.append("(item_name > %s OR (item_name = %s AND name > %s))")
+					params.extend([item_name, item_name, item_code])
+
+				where_clause = " AND ".join(conditions)
+				query = f"""
+					SELECT {ITEM_RESULT_COLUMNS}
+					FROM `tabItem`
+					WHERE {where_clause}
+					ORDER BY item_name ASC, name ASC
+					LIMIT %s
+				"""
+				params.append(limit)
+			else:
+				where_clause = " AND ".join(conditions)
+				query = f"""
+					SELECT {ITEM_RESULT_COLUMNS}
+					FROM `tabItem`
+					WHERE {where_clause}
+					ORDER BY item_name ASC
+					LIMIT %s OFFSET %s
+				"""
+				params.extend([limit, start])
 			items = frappe.db.sql(query, tuple(params), as_dict=1)
 
-		# Prepare maps for enrichment
-		item_codes = [item["item_code"] for item in items]
-		barcode_map = {}
-		conversion_map = defaultdict(dict)  # parent -> {uom: factor}
-		uom_map = {}  # parent -> [ {uom, conversion_factor}, ... ]
-		uom_prices_map = {}  # item_code -> {uom: price_list_rate}
+		next_cursor = None
+		if use_cursor and items and len(items) >= limit:
+			last = items[-1]
+			next_cursor = [last.get("relevance") or 0, last["item_name"], last["item_code"]]
+		for item in items:
+			item.pop("relevance", None)
+
+		_enrich_items(items, pos_profile_doc)
 
-		# Barcodes
-		if item_codes:
-			barcodes = frappe.db.sql(
-				"""
-				SELECT parent, barcode
-				FROM `tabItem Barcode`
-				WHERE parent IN %s
-				GROUP BY parent
+		if format == "columnar":
+			items = encode_columnar(items)
+			if compress:
+				items = compress_payload(items, compress)
+
+		if use_cursor:
+			return {"items": items, "next_cursor": next_cursor}
+		return items
+	except Exception as e:
+		frappe.log_error(frappe.get_traceback(), "Get Items Error")
+		frappe.throw(_("Error fetching items: {0}").format(str(e)))
+
+
+@frappe.whitelist()
+def get_item_suggestions(pos_profile, search_term, limit=10):
+	"""
+	Autocomplete and typo-tolerant suggestions for the item search box.
+
+	Completes the last word as a prefix and, when a word matches nothing, falls
+	back to tokens within a small edit distance, so misspelled names still find
+	items without hitting the database. See pos_next.api.item_suggest.
+
+	Returns:
+		list: [{"item_code", "item_name", "score"}] best match first
+	"""
+	try:
+		from pos_next.api.item_suggest import suggest_items
+
+		if not search_term or not search_term.strip():
+			return []
+
+		pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
+		return suggest_items(pos_profile_doc, search_term, cint(limit) or 10)
+	except Exception as e:
+		frappe.log_error(frappe.get_traceback(), "Get Item Suggestions Error")
+		frappe.throw(_("Error fetching item suggestions: {0}").format(str(e)))
+
+
+def _encode_sync_token(pos_profile, issued_at):
+	"""Pack the issue time of a catalog sync into an opaque, URL-safe token."""
+	payload = json.dumps(
+		{"v": SYNC_TOKEN_VERSION, "p": pos_profile, "ts": str(issued_at)},
+		separators=(",", ":"),
+	)
+	return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_sync_token(since_token, pos_profile):
+	"""
+	Return the datetime from which changes must be re-sent, or None when the
+	token is missing, malformed, or was issued for another POS Profile.
+	"""
+	if not since_token:
+		return None
+
+	try:
+		payload = json.loads(base64.urlsafe_b64decode(since_token.encode()).decode())
+		if payload.get("v") != SYNC_TOKEN_VERSION or payload.get("p") != pos_profile:
+			return None
+		issued_at = get_datetime(payload.get("ts"))
+	except Exception:
+		return None
+
+	if not issued_at:
+		return None
+
+	# Re-send rows written by transactions that were still open when the token was issued
+	return add_to_date(issued_at, seconds=-SYNC_TOKEN_OVERLAP_SECONDS)
+
+
+def _get_changed_item_codes(since, price_list):
+	"""
+	Collect item codes whose catalog row (as built by _enrich_items) may have
+	changed since the given datetime.
+
+	Returns:
+		tuple: (changed item codes, item codes deleted outright)
+	"""
+	changed = set(frappe.db.sql_list("SELECT name FROM `tabItem` WHERE modified >= %s", since))
+
+	for child_doctype in ("Item Barcode", "UOM Conversion Detail"):
+		changed.update(
+			frappe.db.sql_list(
+				f"""
+				SELECT DISTINCT parent
+				FROM `tab{child_doctype}`
+				WHERE parenttype = 'Item' AND modified >= %s
 				""",
-				[item_codes],
-				as_dict=1,
+				since,
 			)
-			barcode_map = {b["parent"]: b["barcode"] for b in barcodes}
+		)
 
-		# UOM conversions (both list & map for quick lookup)
-		if item_codes:
-			conversions = frappe.get_all(
-				"UOM Conversion Detail",
-				filters={"parent": ["in", item_codes]},
-				fields=["parent", "uom", "conversion_factor"],
-			)
-			for row in conversions:
-				# build list
-				uom_map.setdefault(row.parent, []).append(
-					{"uom": row.uom, "conversion_factor": row.conversion_factor}
-				)
-				# build fast lookup
-				if row.uom:
-					conversion_map[row.parent][row.uom] = row.conversion_factor
+	price_item_codes = set(
+		frappe.db.sql_list(
+			"""
+			SELECT DISTINCT item_code
+			FROM `tabItem Price`
+			WHERE price_list = %s AND modified >= %s
+			""",
+			(price_list, since),
+		)
+	)
 
-		# UOM-specific prices - batch query ALL prices for all items
-		if item_codes:
-			prices = frappe.db.sql(
+	changed.update(
+		frappe.db.sql_list("SELECT new_item_code FROM `tabProduct Bundle` WHERE modified >= %s", since)
+	)
+
+	# Deleted prices and bundles only survive as Deleted Document snapshots
+	deleted_codes = set()
+	deleted_docs = frappe.db.sql(
+		"""
+		SELECT deleted_doctype, deleted_name, data
+		FROM `tabDeleted Document`
+		WHERE deleted_doctype IN ('Item', 'Item Price', 'Product Bundle')
+		AND creation >= %s
+		""",
+		since,
+		as_dict=1,
+	)
+	for row in deleted_docs:
+		if row.deleted_doctype == "Item":
+			deleted_codes.add(row.deleted_name)
+			continue
+
+		try:
+			data = json.loads(row.data or "{}")
+		except (json.JSONDecodeError, ValueError):
+			continue
+
+		if row.deleted_doctype == "Item Price" and data.get("price_list") == price_list:
+			price_item_codes.add(data.get("item_code"))
+		elif row.deleted_doctype == "Product Bundle":
+			changed.add(data.get("new_item_code"))
+
+	changed.update(price_item_codes)
+
+	# Template rows show the minimum variant price, so variant price changes touch the template
+	if price_item_codes:
+		changed.update(
+			frappe.db.sql_list(
 				"""
-				SELECT item_code, uom, price_list_rate
-				FROM `tabItem Price`
-				WHERE item_code IN %s AND price_list = %s
-				ORDER BY item_code, uom
+				SELECT DISTINCT variant_of
+				FROM `tabItem`
+				WHERE name IN %s AND IFNULL(variant_of, '') != ''
 				""",
-				[item_codes, pos_profile_doc.selling_price_list],
-				as_dict=1,
+				[list(price_item_codes)],
 			)
-			for price in prices:
-				uom_prices_map.setdefault(price["item_code"], {})[price["uom"]] = price["price_list_rate"]
+		)
 
-		# Batch query stock for all items at once (performance optimization)
-		stock_map = {}
-		serial_qty_map = {}  # For serial-tracked items: count of active serial numbers
-		if item_codes and pos_profile_doc.warehouse:
-			stock_items = [item["item_code"] for item in items if item.get("is_stock_item")]
-			if stock_items:
-				stocks = frappe.db.sql(
-					"""
-					SELECT item_code, actual_qty
-					FROM `tabBin`
-					WHERE item_code IN %s AND warehouse = %s
-					""",
-					[stock_items, pos_profile_doc.warehouse],
-					as_dict=1,
-				)
-				stock_map = {s["item_code"]: s["actual_qty"] for s in stocks}
+	changed.discard(None)
+	deleted_codes.discard(None)
+	return changed - deleted_codes, deleted_codes
 
-			# For serial-tracked items, count active serial numbers per item
-			# This ensures quantity matches serial number availability
-			serial_items = [item["item_code"] for item in items if item.get("has_serial_no")]
-			if serial_items:
-				serial_counts = frappe.db.sql(
-					"""
-					SELECT item_code, COUNT(*) as serial_qty
-					FROM `tabSerial No`
-					WHERE item_code IN %s AND warehouse = %s AND status = 'Active'
-					GROUP BY item_code
-					""",
-					[serial_items, pos_profile_doc.warehouse],
-					as_dict=1,
-				)
-				serial_qty_map = {s["item_code"]: s["serial_qty"] for s in serial_counts}
 
-		# ===================================================================
-		# PRODUCT BUNDLE AVAILABILITY: Calculate bundle stock (bulk optimized)
-		# ===================================================================
-		# Product Bundles are "virtual" items assembled from component items.
-		# Unlike regular stock items, bundles don't have direct stock entries.
-		# Instead, availability is calculated from component stock levels.
-		#
-		# Example:
-		#   Bundle: "Office Starter Kit"
-		#   Components:
-		#     - Desk (need 1, have 10) → can make 10 bundles
-		#     - Chair (need 2, have 15) → can make 7 bundles ← LIMITING
-		#     - Lamp (need 1, have 20) → can make 20 bundles
-		#   Result: Bundle availability = 7 (limited by chairs)
-		#
-		# Performance: Single bulk calculation for ALL bundles (not per-item)
-		# This is done BEFORE the item enrichment loop for efficiency.
-		bundle_availability_map = {}
-		if item_codes and pos_profile_doc.warehouse:
-			# Bulk calculate availability for all items (bundles auto-detected)
-			bundle_availability_map = _calculate_bundle_availability_bulk(
-				item_codes,
-				pos_profile_doc.warehouse
-			)
-		elif item_codes and not pos_profile_doc.warehouse:
-			# Warning: Bundles require warehouse for component stock lookup
-			# Without warehouse, bundles will show as unavailable (qty = 0)
-			has_bundles = frappe.db.exists("Product Bundle", {"new_item_code": ["in", item_codes]})
-			if has_bundles:
-				frappe.log_error(
-					"POS Profile missing warehouse - Product Bundles will show as unavailable",
-					"Bundle Availability Warning"
-				)
+@frappe.whitelist()
+def get_items_delta(pos_profile, since_token=None):
+	"""
+	Return catalog rows that changed since a previous sync.
 
-		# Enrich items with price, stock, barcode, and UOM data
-		for item in items:
-			stock_uom = item.get("stock_uom")
-
-			# Use pre-loaded price map instead of per-item queries
-			price_row = None
-			item_prices = uom_prices_map.get(item["item_code"], {})
-
-			# 1) Try price explicitly for stock UOM (preferred)
-			if stock_uom and stock_uom in item_prices:
-				price_row = {"price_list_rate": item_prices[stock_uom], "uom": stock_uom}
-
-			# 2) If not found, try any price for the item (and capture its UOM)
-			elif item_prices:
-				# Get first available price
-				first_uom = next(iter(item_prices.keys()))
-				price_row = {"price_list_rate": item_prices[first_uom], "uom": first_uom}
-
-			# 3) If still not found and it's a template, derive min variant price
-			derived_price = None
-			if not price_row and item.get("has_variants"):
-				variant_prices = frappe.db.sql(
-					"""
-					SELECT MIN(ip.price_list_rate) as min_price
-					FROM `tabItem Price` ip
-					INNER JOIN `tabItem` i ON i.name = ip.item_code
-					WHERE i.variant_of = %s
-					AND ip.price_list = %s
-					AND i.disabled = 0
-					""",
-					[item["item_code"], pos_profile_doc.selling_price_list],
-					as_dict=1,
-				)
-				derived_price = (
-					variant_prices[0]["min_price"]
-					if variant_prices and variant_prices[0].get("min_price")
-					else None
-				)
+	Clients keep the returned sync_token and send it back on the next refresh.
+	Rows in "items" carry exactly the structure returned by get_items, so they can
+	be upserted into the offline cache as-is; codes in "deleted" must be removed
+	(items that were deleted, disabled, or no longer match the profile filters).
 
-			# Finalize display price & display UOM
-			display_rate = 0.0
-			display_uom = stock_uom
+	When full_resync is set the client must reload the catalog through get_items
+	(first sync, unusable token, or a change set too large to patch efficiently),
+	then continue with the sync_token returned here.
 
-			if price_row:
-				raw_rate = flt(price_row.get("price_list_rate") or 0)
-				price_uom = price_row.get("uom") or stock_uom
-				if price_uom and stock_uom and price_uom != stock_uom:
-					# convert to per-stock-UOM if possible
-					cf = flt(conversion_map[item["item_code"]].get(price_uom) or 0)
-					if cf:
-						display_rate = raw_rate / cf
-						display_uom = stock_uom
-					else:
-						# no conversion available: show as is (price UOM)
-						display_rate = raw_rate
-						display_uom = price_uom
-				else:
-					display_rate = raw_rate
-					display_uom = stock_uom
-			elif derived_price is not None:
-				display_rate = flt(derived_price)
-				display_uom = stock_uom
+	Args:
+		pos_profile: POS Profile name
+		since_token: Opaque token from the previous get_items_delta call
 
-			item["rate"] = display_rate
-			item["price_list_rate"] = display_rate
-			item["uom"] = display_uom
-			item["price_uom"] = display_uom
-			item["conversion_factor"] = 1
-			item["price_list_rate_price_uom"] = display_rate
-
-			# ===================================================================
-			# STOCK QUANTITY ASSIGNMENT: Stock Items vs Product Bundles
-			# ===================================================================
-			# Stock items: Use actual_qty from Bin table (direct stock tracking)
-			# Serial items: Use count of active serial numbers (more accurate)
-			# Product Bundles: Use calculated availability from component stock
-			if item.get("is_stock_item"):
-				if item.get("has_serial_no") and item["item_code"] in serial_qty_map:
-					# For serial-tracked items, use serial number count
-					# This prevents mismatches between Bin qty and actual serials
-					item["actual_qty"] = serial_qty_map.get(item["item_code"], 0)
-				else:
-					item["actual_qty"] = stock_map.get(item["item_code"], 0)
-			else:
-				item["actual_qty"] = bundle_availability_map.get(item["item_code"], 0)
+	Returns:
+		dict: {"items": [...], "deleted": [...], "sync_token": str, "full_resync": bool}
+	"""
+	try:
+		pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
 
-			# ===================================================================
-			# BUNDLE MARKER: Flag items that are Product Bundles
-			# ===================================================================
-			# Add is_bundle=True flag for frontend to identify bundle items.
-			# This allows UI to show bundle-specific indicators and handle
-			# bundle logic differently (e.g., show component details on click).
-			#
-			# Bundle Detection: If item_code exists in bundle_availability_map,
-			# it means a Product Bundle definition exists for this item.
-			if item["item_code"] in bundle_availability_map:
-				item["is_bundle"] = True
+		# Take the new token before reading so nothing written meanwhile is skipped
+		sync_token = _encode_sync_token(pos_profile_doc.name, now_datetime())
+		since = _decode_sync_token(since_token, pos_profile_doc.name)
 
-			# Add warehouse to item (needed for stock validation)
-			item["warehouse"] = pos_profile_doc.warehouse
+		result = {"items": [], "deleted": [], "sync_token": sync_token, "full_resync": False}
+		if not since:
+			result["full_resync"] = True
+			return result
 
-			# Barcode
-			item["barcode"] = barcode_map.get(item["item_code"], "")
+		changed_codes, deleted_codes = _get_changed_item_codes(since, pos_profile_doc.selling_price_list)
+		if len(changed_codes) > MAX_DELTA_ITEMS:
+			result["full_resync"] = True
+			return result
 
-			# Item UOMs (exclude stock UOM to avoid duplicates)
-			all_uoms = uom_map.get(item["item_code"], []) or []
-			item["item_uoms"] = [u for u in all_uoms if u.get("uom") != stock_uom]
+		items = []
+		if changed_codes:
+			conditions, params = _build_item_base_conditions(pos_profile_doc)
+			conditions.append("name IN %s")
+			params.append(tuple(changed_codes))
 
-			# UOM-specific prices map for frontend selector
-			item["uom_prices"] = uom_prices_map.get(item["item_code"], {})
+			items = frappe.db.sql(
+				f"""
+				SELECT {ITEM_RESULT_COLUMNS}
+				FROM `tabItem`
+				WHERE {" AND ".join(conditions)}
+				""",
+				tuple(params),
+				as_dict=1,
+			)
+			_enrich_items(items, pos_profile_doc)
 
-		return items
+		# Anything that changed but no longer qualifies for the catalog is a tombstone
+		visible_codes = {item["item_code"] for item in items}
+		result["items"] = items
+		result["deleted"] = sorted(deleted_codes | (changed_codes - visible_codes))
+		return result
 	except Exception as e:
-		frappe.log_error(frappe.get_traceback(), "Get Items Error")
-		frappe.throw(_("Error fetching items: {0}").format(str(e)))
+		frappe.log_error(frappe.get_traceback(), "Get Items Delta Error")
+		frappe.throw(_("Error fetching item changes: {0}").format(str(e)))
+
+
+def _resolve_pos_profile_name(pos_profile):
+	"""Accept a POS Profile name, a JSON string or a dict and return the profile name."""
+	# Parse pos_profile if it's a JSON string
+	if isinstance(pos_profile, str):
+		try:
+			pos_profile = json.loads(pos_profile)
+		except (json.JSONDecodeError, ValueError):
+			pass  # It's already a plain string
+
+	# Ensure pos_profile is a string (handle dict or string input)
+	if isinstance(pos_profile, dict):
+		pos_profile = pos_profile.get("name") or pos_profile.get("pos_profile")
+
+	if not pos_profile:
+		frappe.throw(_("POS Profile is required"))
+
+	return pos_profile
+
+
+def _get_customer_price_list(pos_profile_doc, customer=None):
+	"""
+	Determine price list based on customer group.
+	Internal Customer group uses "Standard Buying" price list.
+	"""
+	price_list = pos_profile_doc.selling_price_list
+	if customer:
+		try:
+			customer_group = frappe.db.get_value("Customer", customer, "customer_group")
+			if customer_group and customer_group.lower() == "internal customer":
+				# Use Standard Buying price list for internal customers
+				if frappe.db.exists("Price List", "Standard Buying"):
+					price_list = "Standard Buying"
+		except Exception:
+			pass  # Silently continue with default price list
+	return price_list
 
 
 @frappe.whitelist()
 def get_item_details(item_code, pos_profile, customer=None, qty=1, uom=None):
 	"""Get detailed item info including price, tax, stock"""
 	try:
-		# Parse pos_profile if it's a JSON string
-		if isinstance(pos_profile, str):
-			try:
-				pos_profile = json.loads(pos_profile)
-			except (json.JSONDecodeError, ValueError):
-				pass  # It's already a plain string
-
-		# Ensure pos_profile is a string (handle dict or string input)
-		if isinstance(pos_profile, dict):
-			pos_profile = pos_profile.get("name") or pos_profile.get("pos_profile")
-
-		if not pos_profile:
-			frappe.throw(_("POS Profile is required"))
-
+		pos_profile = _resolve_pos_profile_name(pos_profile)
 		pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
 		item_doc = frappe.get_cached_doc("Item", item_code)
 
@@ -1414,18 +2046,7 @@ def get_item_details(item_code, pos_profile, customer=None, qty=1, uom=None):
 		if not item_doc.is_sales_item:
 			frappe.throw(_("Item {0} is not allowed for sales").format(item_code))
 
-		# Determine price list based on customer group
-		# Internal Customer group uses "Standard Buying" price list
-		price_list = pos_profile_doc.selling_price_list
-		if customer:
-			try:
-				customer_group = frappe.db.get_value("Customer", customer, "customer_group")
-				if customer_group and customer_group.lower() == "internal customer":
-					# Use Standard Buying price list for internal customers
-					if frappe.db.exists("Price List", "Standard Buying"):
-						price_list = "Standard Buying"
-			except Exception:
-				pass  # Silently continue with default price list
+		price_list = _get_customer_price_list(pos_profile_doc, customer)
 
 		# Prepare item dict
 		item = {
@@ -1453,6 +2074,107 @@ def get_item_details(item_code, pos_profile, customer=None, qty=1, uom=None):
 
 
 @frappe.whitelist()
+def get_item_details_bulk(item_codes, pos_profile, customer=None):
+	"""
+	Get item details for many cart lines in one call.
+
+	Used to restore draft invoices and re-price carts synced from offline mode,
+	which would otherwise call get_item_details once per line. Item attributes,
+	categories, UOMs, stock, serials and the exchange rate are loaded once for
+	all lines; ERPNext's get_item_details still runs per line for pricing rules.
+
+	Args:
+		item_codes (list|str): Item codes, or dicts with item_code and optional qty/uom
+			(JSON string accepted)
+		pos_profile (str): POS Profile name
+		customer (str, optional): Customer, used to pick the price list
+
+	Returns:
+		list: One entry per line in request order - the get_item_details structure,
+			  or {"item_code": ..., "error": ...} for items that cannot be sold
+	"""
+	try:
+		if isinstance(item_codes, str):
+			item_codes = json.loads(item_codes)
+
+		lines = []
+		for line in item_codes or []:
+			if isinstance(line, dict):
+				lines.append(line)
+			elif line:
+				lines.append({"item_code": line})
+
+		if not lines:
+			return []
+
+		pos_profile = _resolve_pos_profile_name(pos_profile)
+		pos_profile_doc = frappe.get_cached_doc("POS Profile", pos_profile)
+		price_list = _get_customer_price_list(pos_profile_doc, customer)
+
+		item_flags = {
+			row.name: row
+			for row in frappe.db.sql(
+				"""
+				SELECT name, is_sales_item, has_batch_no, has_serial_no, is_stock_item
+				FROM `tabItem`
+				WHERE name IN %s
+				""",
+				[list({line.get("item_code") for line in lines})],
+				as_dict=True,
+			)
+		}
+
+		items = []
+		results = [None] * len(lines)
+		for position, line in enumerate(lines):
+			item_code = line.get("item_code")
+			flags = item_flags.get(item_code)
+			if not flags:
+				results[position] = {"item_code": item_code, "error": _("Item {0} not found").format(item_code)}
+				continue
+			if not flags.is_sales_item:
+				results[position] = {
+					"item_code": item_code,
+					"error": _("Item {0} is not allowed for sales").format(item_code),
+				}
+				continue
+
+			item = {
+				"item_code": item_code,
+				"has_batch_no": flags.has_batch_no,
+				"has_serial_no": flags.has_serial_no,
+				"is_stock_item": flags.is_stock_item,
+				"pos_profile": pos_profile,
+				"qty": line.get("qty") or 1,
+			}
+			if line.get("uom"):
+				item["uom"] = line["uom"]
+			items.append((position, item))
+
+		context = _get_item_detail_context(
+			[item for _position, item in items],
+			warehouse=pos_profile_doc.warehouse,
+			price_list=price_list,
+			company=pos_profile_doc.company,
+		)
+
+		for position, item in items:
+			results[position] = _build_item_detail(
+				item,
+				context,
+				warehouse=pos_profile_doc.warehouse,
+				price_list=price_list,
+				company=pos_profile_doc.company,
+			)
+
+		return results
+	except Exception as e:
+		frappe.log_error(frappe.get_traceback(), "Get Item Details Bulk Error")
+		frappe.throw(_("Error fetching item details: {0}").format(str(e)))
+
+
+@frappe.whitelist()
+@conditional_get("Item Group", "POS Profile")
 def get_item_groups(pos_profile):
 	"""Get item groups for filtering"""
 	try:
@@ -1525,11 +2247,7 @@ def get_stock_quantities(item_codes, warehouse):
 			return []
 
 		# Support group warehouses by expanding to leaf warehouses
-		warehouses = [warehouse]
-		if frappe.db.get_value("Warehouse", warehouse, "is_group"):
-			child_warehouses = frappe.db.get_descendants("Warehouse", warehouse) or []
-			# Fallback to original warehouse if no children are returned
-			warehouses = child_warehouses or [warehouse]
+		warehouses = get_leaf_warehouses(warehouse)
 
 		if not warehouses:
 			return []
@@ -1566,19 +2284,7 @@ def get_stock_quantities(item_codes, warehouse):
 			filters={"name": ["in", normalized_codes], "has_serial_no": 1},
 			pluck="name",
 		)
-		serial_qty_map = {}
-		if serial_items:
-			serial_counts = frappe.db.sql(
-				"""
-				SELECT item_code, COUNT(*) as serial_qty
-				FROM `tabSerial No`
-				WHERE item_code IN %s AND warehouse IN %s AND status = 'Active'
-				GROUP BY item_code
-				""",
-				[serial_items, tuple(warehouses)],
-				as_dict=1,
-			)
-			serial_qty_map = {s["item_code"]: s["serial_qty"] for s in serial_counts}
+		serial_qty_map = get_active_serial_counts(serial_items, warehouses)
 
 		# Return stock for all requested items
 		result = []
@@ -1714,62 +2420,43 @@ def get_item_warehouse_availability(item_code=None, item_codes=None, company=Non
 		result = []
 
 		# ===================================================================
-		# HANDLE REGULAR ITEMS: Query tabBin for stock items
+		# HANDLE REGULAR ITEMS: Read the per-company stock matrix
 		# ===================================================================
 		if regular_items:
-			bin = DocType("Bin")
-			warehouse_names = [w.name for w in warehouses]
-			
-			if include_item_code_in_result:
-				# When multiple items, group by both item_code and warehouse
-				stock_data = (
-					frappe.qb.from_(bin)
-					.select(
-						bin.item_code,
-						bin.warehouse,
-						fn.Sum(bin.actual_qty).as_("actual_qty"),
-						fn.Sum(bin.reserved_qty).as_("reserved_qty")
-					)
-					.where(bin.item_code.isin(regular_items))
-					.where(bin.warehouse.isin(warehouse_names))
-					.groupby(bin.item_code, bin.warehouse)
-					.having(fn.Sum(bin.actual_qty) > 0)
-					.run(as_dict=True)
-				)
-
-			else:
-				# Single item - group only by warehouse (backward compatible)
-				stock_data = (
-					frappe.qb.from_(bin)
-					.select(
-						bin.warehouse,
-						fn.Sum(bin.actual_qty).as_("actual_qty"),
-						fn.Sum(bin.reserved_qty).as_("reserved_qty")
-					)
-					.where(bin.item_code.isin(regular_items))
-					.where(bin.warehouse.isin(warehouse_names))
-					.groupby(bin.warehouse)
-					.having(fn.Sum(bin.actual_qty) > 0)
-					.run(as_dict=True)
-				)
-
-
-			# Enrich stock data with warehouse details
-			for stock in stock_data:
-				warehouse = warehouse_map.get(stock.warehouse)
-				if warehouse:
-					stock_entry = {
-						"warehouse": stock.warehouse,
-						"warehouse_name": warehouse.warehouse_name,
-						"actual_qty": flt(stock.actual_qty),
-						"reserved_qty": flt(stock.reserved_qty),
-						"available_qty": flt(stock.actual_qty) - flt(stock.reserved_qty),
-						"company": warehouse.company
-					}
-					# Add item_code if multiple items requested
-					if include_item_code_in_result:
-						stock_entry["item_code"] = stock.item_code
-					result.append(stock_entry)
+			stock_matrix = get_stock_matrix(regular_items, {w.company for w in warehouses})
+
+			# (item_code, warehouse) -> [actual_qty, reserved_qty]; a single item
+			# (template with variants) is summed per warehouse (backward compatible)
+			stock_data = {}
+			for stock_item_code in regular_items:
+				for wh_name, actual_qty, reserved_qty in stock_matrix.get(stock_item_code, []):
+					if wh_name not in warehouse_map:
+						continue
+					key = (stock_item_code if include_item_code_in_result else None, wh_name)
+					totals = stock_data.setdefault(key, [0.0, 0.0])
+					totals[0] += actual_qty
+					totals[1] += reserved_qty
+
+			# Enrich stock data with warehouse details, in warehouse_name order
+			warehouse_order = {w.name: position for position, w in enumerate(warehouses)}
+			for (stock_item_code, wh_name), (actual_qty, reserved_qty) in sorted(
+				stock_data.items(), key=lambda row: (warehouse_order[row[0][1]], row[0][0] or "")
+			):
+				if actual_qty <= 0:
+					continue
+				warehouse = warehouse_map[wh_name]
+				stock_entry = {
+					"warehouse": wh_name,
+					"warehouse_name": warehouse.warehouse_name,
+					"actual_qty": flt(actual_qty),
+					"reserved_qty": flt(reserved_qty),
+					"available_qty": flt(actual_qty) - flt(reserved_qty),
+					"company": warehouse.company
+				}
+				# Add item_code if multiple items requested
+				if include_item_code_in_result:
+					stock_entry["item_code"] = stock_item_code
+				result.append(stock_entry)
 
 		# ===================================================================
 		# HANDLE PRODUCT BUNDLES: Calculate availability per warehouse (optimized)
@@ -1856,9 +2543,7 @@ def get_product_bundle_availability(item_code, warehouse):
 			return {"available_qty": 0, "components": []}
 
 		# Get warehouses (support group warehouses)
-		warehouses = [warehouse]
-		if frappe.db.get_value("Warehouse", warehouse, "is_group"):
-			warehouses = frappe.db.get_descendants("Warehouse", warehouse) or [warehouse]
+		warehouses = get_leaf_warehouses(warehouse)
 
 		# Get component stock (use available = actual - reserved)
 		component_codes = [c["item_code"] for c in components]
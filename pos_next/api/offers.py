@@ -15,6 +15,8 @@ import frappe
 from frappe import _
 from frappe.utils import flt, getdate, nowdate
 
+from pos_next.api.change_tracking import conditional_get, skip_etag
+
 
 # ============================================================================
 # Constants
@@ -338,6 +340,7 @@ class OfferBuilder:
 # ============================================================================
 
 @frappe.whitelist()
+@conditional_get("POS Offer", "POS Profile", "Pricing Rule", "Promotional Scheme")
 def get_offers(pos_profile: str) -> List[Dict]:
 	"""
 	Fetch all auto-applicable offers for the POS profile
@@ -370,6 +373,7 @@ def get_offers(pos_profile: str) -> List[Dict]:
 
 	except Exception as e:
 		frappe.log_error(f"Error fetching offers: {str(e)}", "Offers API")
+		skip_etag()
 		return []
 
 
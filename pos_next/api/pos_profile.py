@@ -6,6 +6,8 @@ from __future__ import unicode_literals
 import frappe
 from frappe import _
 
+from pos_next.api.change_tracking import conditional_get
+
 
 @frappe.whitelist()
 def get_pos_profiles():
@@ -27,6 +29,7 @@ def get_pos_profiles():
 
 
 @frappe.whitelist()
+@conditional_get("Company", "Customer Group", "POS Profile", "POS Settings")
 def get_pos_profile_data(pos_profile):
 	"""Get detailed POS Profile data"""
 	if not pos_profile:
@@ -133,6 +136,7 @@ def get_pos_settings(pos_profile):
 
 
 @frappe.whitelist()
+@conditional_get("Mode of Payment", "POS Profile")
 def get_payment_methods(pos_profile):
 	"""Get available payment methods from POS Profile"""
 	try:
@@ -164,6 +168,15 @@ def get_payment_methods(pos_profile):
 
 
 @frappe.whitelist()
+@conditional_get(
+	"Address",
+	"Branch",
+	"Company",
+	"Customer",
+	"POS Profile",
+	"Sales Taxes and Charges Template",
+	"Tax Category",
+)
 def get_taxes(pos_profile, customer=None, shipping_address=None):
 	"""Get tax configuration based on POS Profile and customer's GST state.
 
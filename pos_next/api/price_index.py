@@ -0,0 +1,342 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Per-price-list Item Price index for the item APIs.
+
+Each price list is one Redis hash with one packed field per item:
+
+	pos_next:price_index:<price_list> -> {item_code: "uom\\x1frate\\x1euom\\x1frate..."}
+
+UOMs are stored in the order of the original query (ORDER BY uom). Item Price
+hooks rewrite the affected (price list, item) fields from the database after
+commit, so a page of items is priced with a single HMGET. Until a price list
+has been fully built the readers fall back to SQL and a rebuild is queued.
+
+Rebuilds fill a separate "<key>:building" hash and RENAME it into place.
+Hook writes made meanwhile go to both hashes and are never overwritten by
+the rebuild (HSETNX; deletions are kept as empty tombstones, read as
+absent). ERPNext's "update existing price list rate" writes Item Price with
+db.set_value, which fires no hooks: submitted sales transactions refresh
+their items' prices instead, and the index is verified hourly.
+
+Rebuild / verify from the command line:
+
+	bench --site <site> rebuild-pos-price-index [--price-list <name>]
+	bench --site <site> check-pos-price-index [--price-list <name>] [--repair]
+"""
+
+import frappe
+from frappe.utils import flt
+
+from pos_next.api.change_tracking import bump_change_counters, mark_changed
+
+PRICE_INDEX_KEY_PREFIX = "pos_next:price_index:"
+# Field present once a full build of the price list has completed
+PRICE_INDEX_READY_FIELD = "\x00ready"
+PRICE_INDEX_BATCH_SIZE = 5000
+
+PRICE_INDEX_BUILDING_SUFFIX = ":building"
+# Field marking a building hash, so it exists (and receives hook writes) before any price is added
+PRICE_INDEX_BUILDING_FIELD = "\x00building"
+
+_PAIR_SEPARATOR = "\x1e"
+_VALUE_SEPARATOR = "\x1f"
+
+# KEYS[1] = index, KEYS[2] = building index; ARGV = field, value, ... ("" deletes)
+# Writes reach a rebuild in progress too, where they take precedence over its rows
+_WRITE_SCRIPT = """
+local building = redis.call('EXISTS', KEYS[2]) == 1
+for i = 1, #ARGV, 2 do
+	if ARGV[i + 1] == '' then
+		redis.call('HDEL', KEYS[1], ARGV[i])
+	else
+		redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+	end
+	if building then
+		redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+	end
+end
+return 0
+"""
+
+
+def _index_key(price_list):
+	return frappe.cache().make_key(f"{PRICE_INDEX_KEY_PREFIX}{price_list}")
+
+
+def _building_key(price_list):
+	return _index_key(price_list) + PRICE_INDEX_BUILDING_SUFFIX
+
+
+def _pack(prices):
+	"""{uom: rate} -> packed field value."""
+	return _PAIR_SEPARATOR.join(f"{uom or ''}{_VALUE_SEPARATOR}{flt(rate)!r}" for uom, rate in prices.items())
+
+
+def _unpack(value):
+	prices = {}
+	for pair in frappe.safe_decode(value).split(_PAIR_SEPARATOR):
+		uom, _sep, rate = pair.partition(_VALUE_SEPARATOR)
+		prices[uom or None] = flt(rate)
+	return prices
+
+
+def _load_prices(price_list, item_codes):
+	"""Read {item_code: {uom: rate}} from Item Price (the query the index replaces)."""
+	prices = {}
+	if not item_codes:
+		return prices
+
+	for row in frappe.db.sql(
+		"""
+		SELECT item_code, uom, price_list_rate
+		FROM `tabItem Price`
+		WHERE item_code IN %s AND price_list = %s
+		ORDER BY item_code, uom, modified
+		""",
+		[list(item_codes), price_list],
+		as_dict=1,
+	):
+		prices.setdefault(row.item_code, {})[row.uom] = row.price_list_rate
+
+	return prices
+
+
+def get_item_prices(price_list, item_codes):
+	"""
+	Return {item_code: {uom: price_list_rate}} for the given items.
+
+	Items without an Item Price in the price list are absent from the result.
+	"""
+	item_codes = list(dict.fromkeys(code for code in item_codes or [] if code))
+	if not price_list or not item_codes:
+		return {}
+
+	try:
+		values = frappe.cache().hmget(_index_key(price_list), [*item_codes, PRICE_INDEX_READY_FIELD])
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Price Index Read Error")
+		return _load_prices(price_list, item_codes)
+
+	if not values[-1]:
+		enqueue_price_index_rebuild(price_list)
+		return _load_prices(price_list, item_codes)
+
+	return {
+		item_code: _unpack(value)
+		for item_code, value in zip(item_codes, values[:-1], strict=True)
+		if value
+	}
+
+
+def _write_items(price_list, item_codes):
+	"""Rewrite the index fields of some items of a price list from the database."""
+	item_codes = [code for code in set(item_codes) if code]
+	if not price_list or not item_codes:
+		return
+
+	prices = _load_prices(price_list, item_codes)
+	args = []
+	for item_code in item_codes:
+		args.extend([item_code, _pack(prices[item_code]) if prices.get(item_code) else ""])
+	frappe.cache().eval(_WRITE_SCRIPT, 2, _index_key(price_list), _building_key(price_list), *args)
+
+
+# ---------------------------------------------------------------------------
+# Build, rebuild and verification
+# ---------------------------------------------------------------------------
+
+
+def enqueue_price_index_rebuild(price_list):
+	frappe.enqueue(
+		"pos_next.api.price_index.rebuild_price_index",
+		queue="long",
+		job_id=f"pos_next_rebuild_price_index::{price_list}",
+		deduplicate=True,
+		price_list=price_list,
+	)
+
+
+def _iter_price_rows(price_list):
+	"""Yield {item_code: {uom: rate}} chunks of a price list, paged by item code."""
+	last_item_code = ""
+	while True:
+		item_codes = frappe.db.sql_list(
+			"""
+			SELECT DISTINCT item_code
+			FROM `tabItem Price`
+			WHERE price_list = %s AND item_code > %s
+			ORDER BY item_code
+			LIMIT %s
+			""",
+			(price_list, last_item_code, PRICE_INDEX_BATCH_SIZE),
+		)
+		if not item_codes:
+			break
+		yield _load_prices(price_list, item_codes)
+		last_item_code = item_codes[-1]
+
+
+def rebuild_price_index(price_list=None):
+	"""Build the index of one price list, or of every price list, from scratch."""
+	price_lists = [price_list] if price_list else frappe.get_all("Price List", pluck="name")
+
+	cache = frappe.cache()
+	for name in price_lists:
+		building_key = _building_key(name)
+		pipe = cache.pipeline(transaction=False)
+		pipe.delete(building_key)
+		pipe.hset(building_key, PRICE_INDEX_BUILDING_FIELD, "1")
+		pipe.execute()
+
+		for prices in _iter_price_rows(name):
+			pipe = cache.pipeline(transaction=False)
+			for item_code, item_prices in prices.items():
+				# Fields already written by hooks during the build are newer
+				pipe.hsetnx(building_key, item_code, _pack(item_prices))
+			pipe.execute()
+
+		pipe = cache.pipeline(transaction=True)
+		pipe.hdel(building_key, PRICE_INDEX_BUILDING_FIELD)
+		pipe.hset(building_key, PRICE_INDEX_READY_FIELD, "1")
+		pipe.rename(building_key, _index_key(name))
+		pipe.execute()
+
+
+def check_price_index(price_list=None, repair=False):
+	"""
+	Compare the index with Item Price.
+
+	Args:
+		price_list: Price list to check, or None for every built price list
+		repair: Rewrite mismatching items from the database
+
+	Returns:
+		dict: {price_list: [item_code, ...]} of items whose index entry differs
+	"""
+	cache = frappe.cache()
+	price_lists = [price_list] if price_list else frappe.get_all("Price List", pluck="name")
+
+	mismatches = {}
+	for name in price_lists:
+		pipe = cache.pipeline(transaction=False)
+		pipe.hgetall(_index_key(name))
+		indexed = {
+			frappe.safe_decode(field): value
+			for field, value in (pipe.execute()[0] or {}).items()
+			if value  # Empty values are deletion tombstones
+		}
+		# Price lists that were never built are served from SQL: nothing to check
+		if not indexed.pop(PRICE_INDEX_READY_FIELD, None):
+			continue
+
+		bad = []
+		for prices in _iter_price_rows(name):
+			for item_code, item_prices in prices.items():
+				value = indexed.pop(item_code, None)
+				if value is None or _unpack(value) != {uom: flt(rate) for uom, rate in item_prices.items()}:
+					bad.append(item_code)
+		# Whatever is left is indexed but no longer priced
+		bad.extend(indexed)
+
+		if bad:
+			mismatches[name] = bad
+			if repair:
+				for start in range(0, len(bad), PRICE_INDEX_BATCH_SIZE):
+					_write_items(name, bad[start : start + PRICE_INDEX_BATCH_SIZE])
+
+	return mismatches
+
+
+def verify_price_indexes():
+	"""Scheduled hourly: repair drift (prices written without hooks) and record it."""
+	mismatches = check_price_index(repair=True)
+	if mismatches:
+		bump_change_counters(["Item Price"])
+		frappe.log_error(
+			"\n".join(f"{name}: {len(codes)} item(s)" for name, codes in mismatches.items()),
+			"Price Index Repaired",
+		)
+
+
+# ---------------------------------------------------------------------------
+# Document hooks
+# ---------------------------------------------------------------------------
+
+
+def on_item_price_change(doc, method=None):
+	"""Item Price on_update / on_trash hook."""
+	affected = {(doc.price_list, doc.item_code)}
+	previous = doc.get_doc_before_save() if method == "on_update" else None
+	if previous:
+		affected.add((previous.price_list, previous.item_code))
+
+	def update():
+		try:
+			for price_list, item_code in affected:
+				_write_items(price_list, [item_code])
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Price Index Update Error")
+
+	frappe.db.after_commit.add(update)
+
+
+def on_price_list_trash(doc, method=None):
+	key = _index_key(doc.name)
+	frappe.db.after_commit.add(lambda: frappe.cache().delete(key))
+
+
+def on_price_list_rename(doc, method=None, old=None, new=None, merge=False):
+	"""Price List after_rename hook: drop the old index and build the new name's."""
+
+	def update():
+		frappe.cache().delete(_index_key(old), _building_key(old))
+		enqueue_price_index_rebuild(new)
+
+	frappe.db.after_commit.add(update)
+
+
+def on_sales_transaction_submit(doc, method=None):
+	"""
+	Sales Invoice / Sales Order / Delivery Note on_submit hook.
+
+	With Stock Settings "Update Existing Price List Rate" enabled, ERPNext
+	changes Item Price rows of the transaction's items through db.set_value,
+	which fires no Item Price hooks: rewrite those items after commit.
+	"""
+	price_list = doc.get("selling_price_list")
+	if not price_list or not frappe.db.get_single_value("Stock Settings", "update_existing_price_list_rate"):
+		return
+
+	item_codes = {row.item_code for row in doc.get("items") or [] if row.item_code}
+	mark_changed("Item Price")
+
+	def update():
+		try:
+			_write_items(price_list, item_codes)
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Price Index Update Error")
+
+	frappe.db.after_commit.add(update)
+
+
+def on_item_rename(doc, method=None, old=None, new=None, merge=False):
+	"""Item after_rename hook: Item Price rows are renamed without document events."""
+
+	def update():
+		try:
+			price_lists = frappe.get_all("Price List", pluck="name")
+			pipe = frappe.cache().pipeline(transaction=False)
+			for price_list in price_lists:
+				pipe.hdel(_index_key(price_list), old)
+			pipe.execute()
+
+			for price_list in frappe.get_all(
+				"Item Price", filters={"item_code": new}, pluck="price_list", distinct=True
+			):
+				_write_items(price_list, [new])
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Price Index Update Error")
+
+	frappe.db.after_commit.add(update)
@@ -0,0 +1,141 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Maintained count of Active serial numbers per (item, warehouse).
+
+Serial-tracked items report their stock as the number of Active serials
+rather than Bin qty. Counting those on every page and every stock event does
+not scale to millions of Serial No rows, so counts are kept in one Redis hash:
+
+	pos_next:serial_counts -> {"<item_code>\\x1f<warehouse>": count}
+
+ERPNext changes serial status and warehouse with bulk updates that fire no
+Serial No events, so counts are recomputed after commit for every (item,
+warehouse) a serialized Stock Ledger Entry touched, in addition to the
+Serial No document hooks. Missing pairs are counted on first read. Read fills
+never overwrite a value (HSETNX) while recomputations always do, so a fill
+computed before a concurrent commit cannot replace the newer count.
+"""
+
+import frappe
+from frappe.utils import cint
+
+SERIAL_COUNTS_KEY = "pos_next:serial_counts"
+_FIELD_SEPARATOR = "\x1f"
+
+
+def _counts_key():
+	return frappe.cache().make_key(SERIAL_COUNTS_KEY)
+
+
+def _field(item_code, warehouse):
+	return f"{item_code}{_FIELD_SEPARATOR}{warehouse}"
+
+
+def _count_serials(item_codes, warehouses):
+	"""COUNT Active serials for every (item, warehouse) combination, zero included."""
+	counts = {(item_code, warehouse): 0 for item_code in item_codes for warehouse in warehouses}
+	for item_code, warehouse, count in frappe.db.sql(
+		"""
+		SELECT item_code, warehouse, COUNT(*)
+		FROM `tabSerial No`
+		WHERE item_code IN %s AND warehouse IN %s AND status = 'Active'
+		GROUP BY item_code, warehouse
+		""",
+		[list(item_codes), list(warehouses)],
+	):
+		counts[(item_code, warehouse)] = cint(count)
+	return counts
+
+
+def _store(counts, overwrite):
+	try:
+		key = _counts_key()
+		pipe = frappe.cache().pipeline(transaction=False)
+		for (item_code, warehouse), count in counts.items():
+			if overwrite:
+				pipe.hset(key, _field(item_code, warehouse), count)
+			else:
+				pipe.hsetnx(key, _field(item_code, warehouse), count)
+		pipe.execute()
+	except Exception:
+		frappe.log_error(frappe.get_traceback(), "Serial Count Cache Error")
+
+
+def get_active_serial_counts(item_codes, warehouses):
+	"""
+	Return {item_code: Active serial count summed over warehouses}.
+
+	Only items with at least one Active serial are included, like the
+	GROUP BY query this replaces.
+	"""
+	item_codes = list(dict.fromkeys(code for code in item_codes or [] if code))
+	warehouses = list(dict.fromkeys(warehouse for warehouse in warehouses or [] if warehouse))
+	if not item_codes or not warehouses:
+		return {}
+
+	pairs = [(item_code, warehouse) for item_code in item_codes for warehouse in warehouses]
+	values = frappe.cache().hmget(_counts_key(), [_field(*pair) for pair in pairs])
+
+	counts = {}
+	missing = []
+	for pair, value in zip(pairs, values, strict=True):
+		if value is None:
+			missing.append(pair)
+		else:
+			counts[pair] = cint(value)
+
+	if missing:
+		computed = _count_serials({pair[0] for pair in missing}, {pair[1] for pair in missing})
+		filled = {pair: computed[pair] for pair in missing}
+		_store(filled, overwrite=False)
+		counts.update(filled)
+
+	totals = {}
+	for (item_code, _warehouse), count in counts.items():
+		totals[item_code] = totals.get(item_code, 0) + count
+	return {item_code: total for item_code, total in totals.items() if total > 0}
+
+
+def refresh_serial_counts(pairs):
+	"""Recount the given (item_code, warehouse) pairs and overwrite the stored values."""
+	pairs = {(item_code, warehouse) for item_code, warehouse in pairs if item_code and warehouse}
+	if not pairs:
+		return
+
+	computed = _count_serials({pair[0] for pair in pairs}, {pair[1] for pair in pairs})
+	_store({pair: computed[pair] for pair in pairs}, overwrite=True)
+
+
+def _queue_refresh(pairs):
+	"""Recount pairs once per transaction, after commit."""
+	pending = frappe.flags.setdefault("pos_next_serial_count_changes", set())
+	if not pending:
+		frappe.db.after_commit.add(_flush_refresh)
+		frappe.db.after_rollback.add(lambda: frappe.flags.pop("pos_next_serial_count_changes", None))
+	pending.update(pairs)
+
+
+def _flush_refresh():
+	pending = frappe.flags.pop("pos_next_serial_count_changes", None)
+	if pending:
+		try:
+			refresh_serial_counts(pending)
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Serial Count Refresh Error")
+
+
+def on_stock_ledger_entry_submit(doc, method=None):
+	"""Stock Ledger Entry on_submit: serialized movements change Active serial counts."""
+	if doc.get("serial_and_batch_bundle") or doc.get("serial_no"):
+		_queue_refresh([(doc.item_code, doc.warehouse)])
+
+
+def on_serial_no_change(doc, method=None):
+	"""Serial No after_insert / on_update / on_trash hook."""
+	pairs = [(doc.item_code, doc.warehouse)]
+	previous = doc.get_doc_before_save() if method == "on_update" else None
+	if previous:
+		pairs.append((previous.item_code, previous.warehouse))
+	_queue_refresh(pairs)
@@ -8,6 +8,8 @@ import frappe
 from frappe import _
 from frappe.utils import nowdate, nowtime, get_datetime
 
+from pos_next.api.exchange_rates import preload_exchange_rates
+
 
 @frappe.whitelist()
 def get_opening_dialog_data():
@@ -124,6 +126,9 @@ def create_opening_shift(pos_profile, company, balance_details):
 	new_pos_opening.insert(ignore_permissions=True)
 	new_pos_opening.submit()
 
+	# Warm the exchange-rate cache so item lookups during the shift skip currency queries
+	preload_exchange_rates(pos_profile)
+
 	data = {}
 	data["pos_opening_shift"] = new_pos_opening.as_dict()
 	data["pos_profile"] = frappe.get_doc("POS Profile", pos_profile)
@@ -0,0 +1,122 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Sequenced, replayable log of pos_stock_update events.
+
+Every event published to a warehouse room gets the next number of that
+warehouse's sequence and is appended to a bounded Redis stream:
+
+	pos_next:stock_events:seq:<warehouse>   INCR counter
+	pos_next:stock_events:log:<warehouse>   stream, entry ID "<seq>-0"
+
+Both happen in one Lua call, so stream order always matches sequence order
+even when publishers overlap. Events carry "seq" and "epoch" (which changes
+when Redis is flushed and the counters restart). A terminal that notices a
+gap, or reconnects, calls get_stock_events_since to replay what it missed;
+if those events have already been trimmed from the log it is told to do a
+full stock refresh instead.
+"""
+
+import json
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+from pos_next.api.change_tracking import get_change_epoch
+
+STOCK_EVENT_SEQ_KEY_PREFIX = "pos_next:stock_events:seq:"
+STOCK_EVENT_LOG_KEY_PREFIX = "pos_next:stock_events:log:"
+STOCK_EVENT_LOG_LENGTH = 1000
+
+# KEYS[1] = sequence key, KEYS[2] = stream key
+# ARGV[1] = event JSON, ARGV[2] = max stream length
+_APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], seq .. '-0', 'event', ARGV[1])
+return seq
+"""
+
+
+def _seq_key(warehouse):
+	return frappe.cache().make_key(f"{STOCK_EVENT_SEQ_KEY_PREFIX}{warehouse}")
+
+
+def _log_key(warehouse):
+	return frappe.cache().make_key(f"{STOCK_EVENT_LOG_KEY_PREFIX}{warehouse}")
+
+
+def append_stock_event(warehouse, event):
+	"""
+	Number an event and append it to the warehouse's log.
+
+	Returns:
+		dict: The event with "seq" and "epoch" added, ready to publish
+	"""
+	seq = frappe.cache().eval(
+		_APPEND_SCRIPT,
+		2,
+		_seq_key(warehouse),
+		_log_key(warehouse),
+		frappe.as_json(event, indent=None, separators=(",", ":")),
+		STOCK_EVENT_LOG_LENGTH,
+	)
+	return {**event, "seq": cint(seq), "epoch": get_change_epoch()}
+
+
+@frappe.whitelist()
+def get_stock_events_since(warehouse, seq, epoch=None):
+	"""
+	Replay the stock events of a warehouse published after a sequence number.
+
+	Args:
+		warehouse: Warehouse whose room the client joined
+		seq: Last sequence number the client applied
+		epoch: Epoch of that event; a different epoch means the log was reset
+
+	Returns:
+		dict: {"warehouse", "seq", "epoch", "events": [...], "full_resync": bool}
+		"seq" is the latest sequence number. When full_resync is set the
+		missed events are no longer available: the client must reload stock
+		quantities and continue from "seq".
+	"""
+	if not frappe.has_permission("Warehouse", "read", warehouse):
+		frappe.throw(_("Not permitted to read Warehouse {0}").format(warehouse), frappe.PermissionError)
+
+	try:
+		seq = cint(seq)
+		cache = frappe.cache()
+		current_epoch = get_change_epoch()
+		current_seq = cint(cache.get(_seq_key(warehouse)))
+
+		result = {
+			"warehouse": warehouse,
+			"seq": current_seq,
+			"epoch": current_epoch,
+			"events": [],
+			"full_resync": False,
+		}
+		if (epoch and epoch != current_epoch) or seq > current_seq:
+			result["full_resync"] = True
+			return result
+		if seq == current_seq:
+			return result
+
+		entries = cache.xrange(_log_key(warehouse), min=f"{seq + 1}-0", max="+")
+		first_seq = cint(frappe.safe_decode(entries[0][0]).split("-")[0]) if entries else None
+		if first_seq != seq + 1:
+			# Trimmed from the log
+			result["full_resync"] = True
+			return result
+
+		for entry_id, fields in entries:
+			event = json.loads(frappe.safe_decode(fields[b"event"]))
+			event["seq"] = cint(frappe.safe_decode(entry_id).split("-")[0])
+			event["epoch"] = current_epoch
+			result["events"].append(event)
+		result["seq"] = result["events"][-1]["seq"]
+		return result
+	except Exception as e:
+		frappe.log_error(frappe.get_traceback(), "Get Stock Events Error")
+		frappe.throw(_("Error fetching stock events: {0}").format(str(e)))
@@ -0,0 +1,273 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Per-company stock matrix for warehouse availability lookups.
+
+Every Bin row of a company is kept in one Redis hash per company, one packed
+field per item:
+
+	pos_next:stock_matrix:<company> -> {item_code: "warehouse\\x1factual\\x1freserved\\x1e..."}
+
+so "where else is this in stock" is answered without touching Bin. Fields are
+rewritten from Bin after commit for every item a Stock Ledger Entry moved;
+reserved qty changes without a ledger entry and is picked up by a per-minute
+sweep of recently modified Bin rows. Until a company's matrix has been built,
+readers fall back to Bin and a build is queued.
+
+A build fills a side hash and renames it into place; refreshes that commit
+meanwhile are written to both hashes and are not overwritten by the build's
+older reads (HSETNX).
+"""
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+from pos_next.api.warehouse_tree import get_warehouse_companies
+
+STOCK_MATRIX_KEY_PREFIX = "pos_next:stock_matrix:"
+STOCK_MATRIX_WATERMARK_KEY = "pos_next:stock_matrix_bin_watermark"
+# Field present once a full build of the company has completed
+STOCK_MATRIX_READY_FIELD = "\x00ready"
+STOCK_MATRIX_BATCH_SIZE = 5000
+
+STOCK_MATRIX_BUILDING_SUFFIX = ":building"
+# Field marking a building hash, so it exists (and receives refreshes) before any item is added
+STOCK_MATRIX_BUILDING_FIELD = "\x00building"
+
+_ROW_SEPARATOR = "\x1e"
+_VALUE_SEPARATOR = "\x1f"
+
+# KEYS[1] = matrix, KEYS[2] = building matrix; ARGV = field, value, ... ("" deletes)
+# Refreshes reach a build in progress too, where they take precedence over its rows
+_WRITE_SCRIPT = """
+local building = redis.call('EXISTS', KEYS[2]) == 1
+for i = 1, #ARGV, 2 do
+	if ARGV[i + 1] == '' then
+		redis.call('HDEL', KEYS[1], ARGV[i])
+	else
+		redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+	end
+	if building then
+		redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+	end
+end
+return 0
+"""
+
+
+def _matrix_key(company):
+	return frappe.cache().make_key(f"{STOCK_MATRIX_KEY_PREFIX}{company}")
+
+
+def _building_key(company):
+	return _matrix_key(company) + STOCK_MATRIX_BUILDING_SUFFIX
+
+
+def _pack(rows):
+	return _ROW_SEPARATOR.join(
+		f"{warehouse}{_VALUE_SEPARATOR}{flt(actual)!r}{_VALUE_SEPARATOR}{flt(reserved)!r}"
+		for warehouse, actual, reserved in rows
+	)
+
+
+def _unpack(value):
+	rows = []
+	for packed in frappe.safe_decode(value).split(_ROW_SEPARATOR):
+		warehouse, actual, reserved = packed.split(_VALUE_SEPARATOR)
+		rows.append((warehouse, flt(actual), flt(reserved)))
+	return rows
+
+
+def _load_bin_rows(company, item_codes):
+	"""Read {item_code: [(warehouse, actual_qty, reserved_qty)]} from Bin for one company."""
+	matrix = {}
+	if not item_codes:
+		return matrix
+
+	for item_code, warehouse, actual_qty, reserved_qty in frappe.db.sql(
+		"""
+		SELECT b.item_code, b.warehouse, b.actual_qty, b.reserved_qty
+		FROM `tabBin` b
+		INNER JOIN `tabWarehouse` w ON w.name = b.warehouse
+		WHERE b.item_code IN %s AND w.company = %s
+			AND (b.actual_qty != 0 OR b.reserved_qty != 0)
+		ORDER BY b.item_code, b.warehouse
+		""",
+		(list(item_codes), company),
+	):
+		matrix.setdefault(item_code, []).append((warehouse, flt(actual_qty), flt(reserved_qty)))
+
+	return matrix
+
+
+def get_stock_matrix(item_codes, companies):
+	"""
+	Return {item_code: [(warehouse, actual_qty, reserved_qty), ...]} across companies.
+
+	Only warehouses with non-zero actual or reserved qty are listed.
+	"""
+	item_codes = list(dict.fromkeys(code for code in item_codes or [] if code))
+	matrix = {}
+	if not item_codes:
+		return matrix
+
+	for company in dict.fromkeys(company for company in companies if company):
+		try:
+			values = frappe.cache().hmget(_matrix_key(company), [*item_codes, STOCK_MATRIX_READY_FIELD])
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Stock Matrix Read Error")
+			values = None
+
+		if values and values[-1]:
+			company_rows = {
+				item_code: _unpack(value)
+				for item_code, value in zip(item_codes, values[:-1], strict=True)
+				if value  # Empty values are deletion tombstones of a build
+			}
+		else:
+			if values is not None:
+				enqueue_stock_matrix_build(company)
+			company_rows = _load_bin_rows(company, item_codes)
+
+		for item_code, rows in company_rows.items():
+			matrix.setdefault(item_code, []).extend(rows)
+
+	return matrix
+
+
+def _write_items(company, item_codes):
+	"""Rewrite the matrix fields of some items of a company from Bin."""
+	item_codes = [code for code in set(item_codes) if code]
+	if not company or not item_codes:
+		return
+
+	matrix = _load_bin_rows(company, item_codes)
+	args = []
+	for item_code in item_codes:
+		args.extend([item_code, _pack(matrix[item_code]) if matrix.get(item_code) else ""])
+	frappe.cache().eval(_WRITE_SCRIPT, 2, _matrix_key(company), _building_key(company), *args)
+
+
+def refresh_stock_matrix(pairs):
+	"""Rewrite the items of the given (item_code, warehouse) pairs in their company's matrix."""
+	pairs = [(item_code, warehouse) for item_code, warehouse in pairs if item_code and warehouse]
+	companies = get_warehouse_companies({warehouse for _item_code, warehouse in pairs})
+
+	items_by_company = {}
+	for item_code, warehouse in pairs:
+		company = companies.get(warehouse)
+		if company:
+			items_by_company.setdefault(company, set()).add(item_code)
+
+	for company, item_codes in items_by_company.items():
+		item_codes = list(item_codes)
+		for start in range(0, len(item_codes), STOCK_MATRIX_BATCH_SIZE):
+			_write_items(company, item_codes[start : start + STOCK_MATRIX_BATCH_SIZE])
+
+
+# ---------------------------------------------------------------------------
+# Build and maintenance
+# ---------------------------------------------------------------------------
+
+
+def enqueue_stock_matrix_build(company):
+	frappe.enqueue(
+		"pos_next.api.stock_matrix.build_stock_matrix",
+		queue="long",
+		job_id=f"pos_next_build_stock_matrix::{company}",
+		deduplicate=True,
+		company=company,
+	)
+
+
+def build_stock_matrix(company):
+	"""Build a company's matrix from scratch, paging Bin by item code."""
+	cache = frappe.cache()
+	building_key = _building_key(company)
+	pipe = cache.pipeline(transaction=False)
+	pipe.delete(building_key)
+	pipe.hset(building_key, STOCK_MATRIX_BUILDING_FIELD, "1")
+	pipe.execute()
+
+	last_item_code = ""
+	while True:
+		item_codes = frappe.db.sql_list(
+			"""
+			SELECT DISTINCT b.item_code
+			FROM `tabBin` b
+			INNER JOIN `tabWarehouse` w ON w.name = b.warehouse
+			WHERE w.company = %s AND b.item_code > %s
+			ORDER BY b.item_code
+			LIMIT %s
+			""",
+			(company, last_item_code, STOCK_MATRIX_BATCH_SIZE),
+		)
+		if not item_codes:
+			break
+
+		pipe = cache.pipeline(transaction=False)
+		for item_code, rows in _load_bin_rows(company, item_codes).items():
+			# Fields already written by refreshes during the build are newer
+			pipe.hsetnx(building_key, item_code, _pack(rows))
+		pipe.execute()
+		last_item_code = item_codes[-1]
+
+	pipe = cache.pipeline(transaction=True)
+	pipe.hdel(building_key, STOCK_MATRIX_BUILDING_FIELD)
+	pipe.hset(building_key, STOCK_MATRIX_READY_FIELD, "1")
+	pipe.rename(building_key, _matrix_key(company))
+	pipe.execute()
+
+
+def on_stock_ledger_entry_submit(doc, method=None):
+	"""Stock Ledger Entry on_submit: refresh the moved items once per transaction, after commit."""
+	pending = frappe.flags.setdefault("pos_next_stock_matrix_changes", set())
+	if not pending:
+		frappe.db.after_commit.add(_flush_stock_changes)
+		frappe.db.after_rollback.add(lambda: frappe.flags.pop("pos_next_stock_matrix_changes", None))
+	pending.add((doc.item_code, doc.warehouse))
+
+
+def _flush_stock_changes():
+	pending = frappe.flags.pop("pos_next_stock_matrix_changes", None)
+	if pending:
+		try:
+			refresh_stock_matrix(pending)
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Stock Matrix Refresh Error")
+
+
+def sweep_bin_changes():
+	"""
+	Scheduled every minute: refresh items whose Bin changed since the previous
+	sweep (covers reserved qty, which moves without ledger entries).
+	"""
+	cache = frappe.cache()
+	started_at = now_datetime()
+	watermark = frappe.safe_decode(cache.get(cache.make_key(STOCK_MATRIX_WATERMARK_KEY)))
+
+	if watermark:
+		refresh_stock_matrix(
+			frappe.db.sql(
+				"""
+				SELECT item_code, warehouse
+				FROM `tabBin`
+				WHERE modified >= %s
+				""",
+				watermark,
+			)
+		)
+
+	cache.set(cache.make_key(STOCK_MATRIX_WATERMARK_KEY), str(started_at))
+
+
+def on_warehouse_change(doc, method=None, *args, **kwargs):
+	"""Warehouse on_update / on_trash / after_rename: rebuild the company's matrix."""
+	company = doc.company
+
+	def rebuild():
+		frappe.cache().delete(_matrix_key(company))
+		enqueue_stock_matrix_build(company)
+
+	frappe.db.after_commit.add(rebuild)
@@ -0,0 +1,191 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Resized WebP thumbnails of item images.
+
+Item grids would otherwise load full-resolution product photos. Thumbnails
+are produced at a few fixed sizes on first request and stored under the
+site directory, keyed by the content hash of the image (File.content_hash):
+
+	<site>/pos_thumbnails/<content hash>_<size>.webp
+
+Thumbnail URLs carry the hash as their "v" parameter, so replacing a file at
+the same URL changes the thumbnail URL too, and responses whose "v" matches
+can be cached by the browser indefinitely. Thumbnails of replaced or unused
+images are removed daily. Only local files are resized; external image URLs
+are returned unchanged.
+"""
+
+import hashlib
+import os
+from urllib.parse import urlencode
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+from PIL import Image, ImageOps
+from werkzeug.wrappers import Response
+
+THUMBNAIL_SIZES = (128, 256, 512)
+DEFAULT_THUMBNAIL_SIZE = 256
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_DIRECTORY = "pos_thumbnails"
+THUMBNAIL_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+_THUMBNAIL_METHOD = "/api/method/pos_next.api.thumbnails.get_item_thumbnail"
+
+
+def _is_local_image(image):
+	return bool(image) and image.startswith(("/files/", "/private/files/"))
+
+
+def _get_content_hashes(images):
+	"""Return {file_url: content_hash} of the File records of the given URLs."""
+	images = list({image for image in images if _is_local_image(image)})
+	if not images:
+		return {}
+	return {
+		row.file_url: row.content_hash
+		for row in frappe.get_all(
+			"File",
+			filters={"file_url": ["in", images], "content_hash": ["is", "set"]},
+			fields=["file_url", "content_hash"],
+		)
+	}
+
+
+def get_thumbnail_urls(images, size=DEFAULT_THUMBNAIL_SIZE):
+	"""
+	Return {image: thumbnail URL} for item images, with one File query.
+
+	Images that are not local files map to themselves.
+	"""
+	content_hashes = _get_content_hashes(images)
+	urls = {}
+	for image in images:
+		if not _is_local_image(image):
+			urls[image] = image
+			continue
+		params = {"src": image, "size": size}
+		if content_hashes.get(image):
+			params["v"] = content_hashes[image]
+		urls[image] = f"{_THUMBNAIL_METHOD}?{urlencode(params)}"
+	return urls
+
+
+def _source_path(src):
+	"""Resolve a /files or /private/files URL to a path inside the site's file directories."""
+	if src.startswith("/private/files/"):
+		base = frappe.get_site_path("private", "files")
+		relative = src[len("/private/files/") :]
+	elif src.startswith("/files/"):
+		base = frappe.get_site_path("public", "files")
+		relative = src[len("/files/") :]
+	else:
+		return None
+
+	base = os.path.realpath(base)
+	path = os.path.realpath(os.path.join(base, relative))
+	if os.path.commonpath([base, path]) != base or not os.path.isfile(path):
+		return None
+	return path
+
+
+def _check_read_permission(src):
+	if not src.startswith("/private/files/"):
+		return
+
+	file_name = frappe.db.get_value("File", {"file_url": src}, "name")
+	if not file_name or not frappe.has_permission("File", "read", doc=frappe.get_doc("File", file_name)):
+		raise frappe.PermissionError
+
+
+def _get_content_hash(src, source_path):
+	"""Content hash of an image: File.content_hash, or computed like it for files without one."""
+	content_hash = _get_content_hashes([src]).get(src)
+	if content_hash:
+		return content_hash
+
+	digest = hashlib.md5()
+	with open(source_path, "rb") as f:
+		for chunk in iter(lambda: f.read(1024 * 1024), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+def _thumbnail_path(content_hash, size):
+	return frappe.get_site_path(THUMBNAIL_DIRECTORY, f"{content_hash}_{size}.webp")
+
+
+def _make_thumbnail(source_path, target_path, size):
+	with Image.open(source_path) as image:
+		image = ImageOps.exif_transpose(image)
+		image.thumbnail((size, size))
+		if image.mode not in ("RGB", "RGBA"):
+			image = image.convert("RGBA")
+
+		os.makedirs(os.path.dirname(target_path), exist_ok=True)
+		# Write to a temporary file first so concurrent requests never read a partial image
+		tmp_path = f"{target_path}.{frappe.generate_hash(length=8)}.tmp"
+		try:
+			image.save(tmp_path, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+			os.replace(tmp_path, target_path)
+		finally:
+			if os.path.exists(tmp_path):
+				os.remove(tmp_path)
+
+
+@frappe.whitelist(methods=["GET"])
+def get_item_thumbnail(src, size=DEFAULT_THUMBNAIL_SIZE, v=None):
+	"""
+	Serve the WebP thumbnail of a local image, creating it on first request.
+
+	Only responses whose "v" is the current content hash are cacheable for
+	good; an outdated URL gets the current image, revalidated on every use.
+	"""
+	size = cint(size)
+	if size not in THUMBNAIL_SIZES:
+		frappe.throw(_("Unsupported thumbnail size: {0}").format(size))
+
+	source_path = _source_path(src or "")
+	if not source_path:
+		raise frappe.DoesNotExistError(_("Image {0} not found").format(src))
+	_check_read_permission(src)
+
+	content_hash = _get_content_hash(src, source_path)
+	target_path = _thumbnail_path(content_hash, size)
+	if not os.path.exists(target_path):
+		try:
+			_make_thumbnail(source_path, target_path, size)
+		except Exception:
+			frappe.log_error(frappe.get_traceback(), "Item Thumbnail Error")
+			frappe.throw(_("Could not create a thumbnail for {0}").format(src))
+
+	with open(target_path, "rb") as f:
+		content = f.read()
+
+	return Response(
+		content,
+		mimetype="image/webp",
+		headers={"Cache-Control": THUMBNAIL_CACHE_CONTROL if v == content_hash else "private, no-cache"},
+	)
+
+
+def cleanup_thumbnails():
+	"""Scheduled daily: remove thumbnails of images no item uses anymore (replaced or removed)."""
+	directory = frappe.get_site_path(THUMBNAIL_DIRECTORY)
+	if not os.path.isdir(directory):
+		return
+
+	images = frappe.get_all("Item", filters={"image": ["is", "set"]}, pluck="image", distinct=True)
+	current = set(_get_content_hashes(images).values())
+
+	for file_name in os.listdir(directory):
+		content_hash, _sep, _size = file_name.partition("_")
+		if content_hash in current:
+			continue
+		try:
+			os.remove(os.path.join(directory, file_name))
+		except OSError:
+			pass
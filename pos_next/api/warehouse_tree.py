@@ -0,0 +1,134 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Cached Warehouse hierarchy for the stock APIs.
+
+Group warehouses hold no stock themselves, so every stock query expands them
+to their leaf descendants. The whole tree is small and changes rarely: it is
+loaded in one query, cached in Redis and kept per process, and dropped
+whenever a Warehouse is saved, renamed or deleted.
+
+Changes bump a version number and the Redis entry is keyed by it: a request
+that read the previous version and loads the tree late (from a transaction
+that began before the change) can only fill the previous version's entry.
+"""
+
+import threading
+
+import frappe
+from frappe.utils import cint
+
+WAREHOUSE_TREE_CACHE_KEY = "pos_next:warehouse_tree"
+WAREHOUSE_TREE_VERSION_KEY = "pos_next:warehouse_tree_version"
+# Entries of superseded versions are never read again
+WAREHOUSE_TREE_CACHE_TTL = 24 * 60 * 60
+
+_trees = {}  # site -> (version, tree)
+_lock = threading.Lock()
+
+
+def _load_tree():
+	"""
+	Returns:
+		dict: {
+			"leaves": {group: [leaf, ...]},
+			"ancestors": {warehouse: [self and groups above]},
+			"company": {warehouse: company},
+		}
+	"""
+	rows = frappe.db.sql(
+		"""
+		SELECT name, is_group, lft, rgt, company
+		FROM `tabWarehouse`
+		ORDER BY lft
+		""",
+		as_dict=True,
+	)
+
+	leaves = {}
+	ancestors = {}
+	companies = {}
+	# Rows come in lft order, so the open groups form a stack of the current path
+	path = []
+	for row in rows:
+		while path and path[-1].rgt < row.lft:
+			path.pop()
+		ancestors[row.name] = [row.name] + [group.name for group in path]
+		companies[row.name] = row.company
+		if row.is_group:
+			leaves[row.name] = []
+			path.append(row)
+		else:
+			for group in path:
+				leaves[group.name].append(row.name)
+
+	return {"leaves": leaves, "ancestors": ancestors, "company": companies}
+
+
+def _tree_cache_key(version):
+	return f"{WAREHOUSE_TREE_CACHE_KEY}:{version}"
+
+
+def _get_tree():
+	cache = frappe.cache()
+	version = cint(cache.get(cache.make_key(WAREHOUSE_TREE_VERSION_KEY)))
+	site = frappe.local.site
+
+	cached = _trees.get(site)
+	if cached and cached[0] == version:
+		return cached[1]
+
+	with _lock:
+		key = _tree_cache_key(version)
+		tree = cache.get_value(key)
+		if tree is None:
+			tree = _load_tree()
+			cache.set_value(key, tree, expires_in_sec=WAREHOUSE_TREE_CACHE_TTL)
+		_trees[site] = (version, tree)
+	return tree
+
+
+def get_leaf_warehouses(warehouse):
+	"""
+	Expand a warehouse to the warehouses that can hold its stock.
+
+	Returns the leaf descendants of a group warehouse, or [warehouse] for a
+	leaf warehouse and for a group without children.
+	"""
+	if not warehouse:
+		return []
+	return _get_tree()["leaves"].get(warehouse) or [warehouse]
+
+
+def resolve_warehouses(warehouses):
+	"""Return {warehouse: [leaf warehouses]} for each given warehouse."""
+	leaves = _get_tree()["leaves"]
+	return {warehouse: leaves.get(warehouse) or [warehouse] for warehouse in warehouses if warehouse}
+
+
+def get_warehouse_ancestors(warehouses):
+	"""Return the given warehouses plus every group warehouse above them."""
+	ancestors = _get_tree()["ancestors"]
+	result = set()
+	for warehouse in warehouses:
+		if warehouse:
+			result.update(ancestors.get(warehouse) or [warehouse])
+	return list(result)
+
+
+def get_warehouse_companies(warehouses):
+	"""Return {warehouse: company} for the given warehouses."""
+	companies = _get_tree()["company"]
+	return {warehouse: companies.get(warehouse) for warehouse in warehouses if warehouse}
+
+
+def clear_warehouse_tree_cache():
+	cache = frappe.cache()
+	version = cache.incr(cache.make_key(WAREHOUSE_TREE_VERSION_KEY))
+	cache.delete_value(_tree_cache_key(version - 1))
+
+
+def on_warehouse_change(doc, method=None, *args, **kwargs):
+	"""Warehouse on_update / on_trash / after_rename hook."""
+	frappe.db.after_commit.add(clear_warehouse_tree_cache)
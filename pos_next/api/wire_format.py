@@ -0,0 +1,151 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+"""
+Compact columnar encoding for catalog responses.
+
+Item rows are turned into one array per field. Low-cardinality strings
+(warehouse, UOMs, item group, brand) are replaced by indexes into per-domain
+dictionaries; the UOM domain is shared by the scalar UOM fields, item_uoms
+and uom_prices:
+
+	{
+		"format": "columnar",
+		"version": 1,
+		"count": 2,
+		"dictionaries": {"uom": ["Nos", "Box"], "warehouse": ["Stores - C"]},
+		"encoding": {"stock_uom": "dict:uom", "item_uoms": "uom_list:uom", ...},
+		"sparse": ["is_bundle"],
+		"columns": {"item_code": ["A", "B"], "stock_uom": [0, 0], ...}
+	}
+
+Encodings:
+	dict:<domain>      value is an index into dictionaries[domain] (null stays null)
+	uom_list:<domain>  [{uom, conversion_factor}] -> [[uom index, conversion_factor], ...]
+	uom_map:<domain>   {uom: rate} -> [[uom index, rate], ...]
+
+Columns listed in "sparse" are missing from some rows; null means "absent".
+The whole document can additionally be gzip (or brotli, when installed)
+compressed and returned base64-encoded as {"format", "compression", "data"}.
+"""
+
+import base64
+import gzip
+
+from frappe import as_json
+
+try:
+	import brotli
+except ImportError:  # pragma: no cover - optional dependency
+	brotli = None
+
+COLUMNAR_VERSION = 1
+
+DICTIONARY_COLUMNS = {
+	"warehouse": "warehouse",
+	"stock_uom": "uom",
+	"uom": "uom",
+	"price_uom": "uom",
+	"item_group": "item_group",
+	"brand": "brand",
+	"custom_company": "company",
+	"custom_item_category": "item_category",
+}
+UOM_LIST_COLUMNS = {"item_uoms": "uom"}
+UOM_MAP_COLUMNS = {"uom_prices": "uom"}
+
+
+class _Dictionary:
+	def __init__(self):
+		self.values = []
+		self.codes = {}
+
+	def encode(self, value):
+		if value is None:
+			return None
+		code = self.codes.get(value)
+		if code is None:
+			code = self.codes[value] = len(self.values)
+			self.values.append(value)
+		return code
+
+
+def encode_columnar(rows):
+	"""Encode a list of row dicts in the columnar format described above."""
+	columns = {}
+	for row in rows:
+		for field in row:
+			columns.setdefault(field, None)
+	columns = list(columns)
+
+	dictionaries = {}
+
+	def dictionary(domain):
+		return dictionaries.setdefault(domain, _Dictionary())
+
+	encoding = {}
+	sparse = []
+	data = {}
+	for field in columns:
+		values = [row.get(field) for row in rows]
+		if any(field not in row for row in rows):
+			sparse.append(field)
+
+		if field in DICTIONARY_COLUMNS:
+			domain = DICTIONARY_COLUMNS[field]
+			encoding[field] = f"dict:{domain}"
+			values = [dictionary(domain).encode(value) for value in values]
+		elif field in UOM_LIST_COLUMNS:
+			domain = UOM_LIST_COLUMNS[field]
+			encoding[field] = f"uom_list:{domain}"
+			values = [
+				None
+				if value is None
+				else [[dictionary(domain).encode(u.get("uom")), u.get("conversion_factor")] for u in value]
+				for value in values
+			]
+		elif field in UOM_MAP_COLUMNS:
+			domain = UOM_MAP_COLUMNS[field]
+			encoding[field] = f"uom_map:{domain}"
+			values = [
+				None
+				if value is None
+				else [[dictionary(domain).encode(uom), rate] for uom, rate in value.items()]
+				for value in values
+			]
+
+		data[field] = values
+
+	return {
+		"format": "columnar",
+		"version": COLUMNAR_VERSION,
+		"count": len(rows),
+		"dictionaries": {domain: d.values for domain, d in dictionaries.items()},
+		"encoding": encoding,
+		"sparse": sparse,
+		"columns": data,
+	}
+
+
+def compress_payload(payload, compression):
+	"""
+	Compress a JSON-serializable payload.
+
+	Args:
+		compression: "gzip" or "br"; "br" falls back to gzip when brotli is not installed
+
+	Returns:
+		dict: {"format": payload["format"], "compression": ..., "data": base64 string}
+	"""
+	raw = as_json(payload, indent=None, separators=(",", ":")).encode()
+	if compression == "br" and brotli is not None:
+		compressed = brotli.compress(raw)
+	else:
+		compression = "gzip"
+		compressed = gzip.compress(raw, compresslevel=6)
+
+	return {
+		"format": payload.get("format"),
+		"compression": compression,
+		"data": base64.b64encode(compressed).decode(),
+	}
@@ -0,0 +1,71 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-pos-price-index")
+@click.option("--price-list", help="Only rebuild this price list")
+@pass_context
+def rebuild_pos_price_index(context, price_list=None):
+	"""Rebuild the POS Item Price index from Item Price."""
+	import frappe
+
+	from pos_next.api.price_index import rebuild_price_index
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		rebuild_price_index(price_list)
+	finally:
+		frappe.destroy()
+
+
+@click.command("check-pos-price-index")
+@click.option("--price-list", help="Only check this price list")
+@click.option("--repair", is_flag=True, default=False, help="Rewrite mismatching entries")
+@pass_context
+def check_pos_price_index(context, price_list=None, repair=False):
+	"""Compare the POS Item Price index with Item Price."""
+	import frappe
+
+	from pos_next.api.price_index import check_price_index
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		mismatches = check_price_index(price_list, repair=repair)
+		for name, item_codes in mismatches.items():
+			click.echo(f"{name}: {len(item_codes)} mismatching item(s)")
+			for item_code in item_codes[:20]:
+				click.echo(f"  {item_code}")
+		if not mismatches:
+			click.echo("Price index is consistent")
+		elif repair:
+			click.echo("Mismatching entries were repaired")
+	finally:
+		frappe.destroy()
+
+
+@click.command("add-pos-serial-suffix-index")
+@pass_context
+def add_pos_serial_suffix_index(context):
+	"""Index reversed serial numbers so POS search can match their last digits."""
+	import frappe
+
+	from pos_next.api.items import add_serial_suffix_index
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		add_serial_suffix_index()
+		click.echo("Serial number suffix index is ready")
+	finally:
+		frappe.destroy()
+
+
+commands = [rebuild_pos_price_index, check_pos_price_index, add_pos_serial_suffix_index]
@@ -185,8 +185,87 @@ standard_queries = {
 # Hook on document methods and events
 
 doc_events = {
+	"*": {
+		"on_update": "pos_next.api.change_tracking.on_doc_change",
+		"on_submit": "pos_next.api.change_tracking.on_doc_change",
+		"on_cancel": "pos_next.api.change_tracking.on_doc_change",
+		"on_update_after_submit": "pos_next.api.change_tracking.on_doc_change",
+		"on_trash": "pos_next.api.change_tracking.on_doc_change",
+		"after_rename": "pos_next.api.change_tracking.on_doc_change",
+	},
 	"Item": {
-		"validate": "pos_next.validations.validate_item"
+		"validate": "pos_next.validations.validate_item",
+		"on_update": [
+			"pos_next.api.item_suggest.on_item_change",
+			"pos_next.api.barcode_index.on_item_update",
+			"pos_next.api.item_trigrams.on_item_update"
+		],
+		"on_trash": [
+			"pos_next.api.item_suggest.on_item_change",
+			"pos_next.api.barcode_index.on_item_trash",
+			"pos_next.api.item_trigrams.on_item_trash"
+		],
+		"after_rename": [
+			"pos_next.api.item_suggest.on_item_rename",
+			"pos_next.api.item_trigrams.on_item_rename",
+			"pos_next.api.barcode_index.on_item_rename",
+			"pos_next.api.price_index.on_item_rename"
+		]
+	},
+	"Serial No": {
+		"after_insert": [
+			"pos_next.api.barcode_index.on_serial_no_update",
+			"pos_next.api.serial_counts.on_serial_no_change"
+		],
+		"on_update": [
+			"pos_next.api.barcode_index.on_serial_no_update",
+			"pos_next.api.serial_counts.on_serial_no_change"
+		],
+		"on_trash": [
+			"pos_next.api.barcode_index.on_serial_no_trash",
+			"pos_next.api.serial_counts.on_serial_no_change"
+		]
+	},
+	"Item Price": {
+		"on_update": "pos_next.api.price_index.on_item_price_change",
+		"on_trash": "pos_next.api.price_index.on_item_price_change"
+	},
+	"Price List": {
+		"on_trash": "pos_next.api.price_index.on_price_list_trash",
+		"after_rename": "pos_next.api.price_index.on_price_list_rename"
+	},
+	"Currency Exchange": {
+		"on_update": "pos_next.api.exchange_rates.clear_exchange_rate_cache",
+		"on_trash": "pos_next.api.exchange_rates.clear_exchange_rate_cache"
+	},
+	"Stock Ledger Entry": {
+		"on_submit": [
+			"pos_next.api.bundle_availability.on_stock_ledger_entry_submit",
+			"pos_next.api.serial_counts.on_stock_ledger_entry_submit",
+			"pos_next.api.stock_matrix.on_stock_ledger_entry_submit",
+			"pos_next.realtime_events.on_stock_ledger_entry_submit"
+		]
+	},
+	"Product Bundle": {
+		"on_update": "pos_next.api.bundle_availability.on_product_bundle_change",
+		"on_trash": "pos_next.api.bundle_availability.on_product_bundle_change"
+	},
+	"Warehouse": {
+		"on_update": [
+			"pos_next.api.warehouse_tree.on_warehouse_change",
+			"pos_next.api.bundle_availability.on_warehouse_change",
+			"pos_next.api.stock_matrix.on_warehouse_change"
+		],
+		"on_trash": [
+			"pos_next.api.warehouse_tree.on_warehouse_change",
+			"pos_next.api.bundle_availability.on_warehouse_change",
+			"pos_next.api.stock_matrix.on_warehouse_change"
+		],
+		"after_rename": [
+			"pos_next.api.warehouse_tree.on_warehouse_change",
+			"pos_next.api.bundle_availability.on_warehouse_change",
+			"pos_next.api.stock_matrix.on_warehouse_change"
+		]
 	},
 	"Sales Invoice": {
 		"validate": "pos_next.api.sales_invoice_hooks.validate",
@@ -194,14 +273,24 @@ doc_events = {
 		"before_submit": "pos_next.api.sales_invoice_hooks.before_submit",
 		"on_submit": [
 			"pos_next.api.sales_invoice_hooks.on_submit",
-			"pos_next.realtime_events.emit_stock_update_event"
+			"pos_next.realtime_events.emit_stock_update_event",
+			"pos_next.api.price_index.on_sales_transaction_submit"
 		],
 		"before_cancel": "pos_next.api.sales_invoice_hooks.before_cancel",
 		"on_cancel": "pos_next.realtime_events.emit_stock_update_event",
 		"after_insert": "pos_next.realtime_events.emit_invoice_created_event"
 	},
+	"Sales Order": {
+		"on_submit": "pos_next.api.price_index.on_sales_transaction_submit"
+	},
+	"Delivery Note": {
+		"on_submit": "pos_next.api.price_index.on_sales_transaction_submit"
+	},
 	"POS Profile": {
-		"on_update": "pos_next.realtime_events.emit_pos_profile_updated_event"
+		"on_update": [
+			"pos_next.realtime_events.emit_pos_profile_updated_event",
+			"pos_next.api.catalog_snapshot.on_pos_profile_update"
+		]
 	}
 }
 
@@ -209,8 +298,20 @@ doc_events = {
 # ---------------
 
 scheduler_events = {
+	"cron": {
+		"* * * * *": [
+			"pos_next.api.bundle_availability.sweep_bin_changes",
+			"pos_next.api.stock_matrix.sweep_bin_changes",
+		],
+	},
+	"hourly_long": [
+		"pos_next.api.item_velocity.update_item_velocity",
+		"pos_next.api.catalog_snapshot.refresh_catalog_snapshots",
+		"pos_next.api.price_index.verify_price_indexes",
+	],
 	"daily": [
 		"pos_next.tasks.cleanup_expired_promotions.cleanup_expired_promotions",
+		"pos_next.api.thumbnails.cleanup_thumbnails",
 	],
 }
 
@@ -15,6 +15,8 @@ def after_install():
 		install_fixtures()
 		setup_default_print_format()
 		frappe.db.commit()
+		# Patches are not run on a fresh install: create the indexes they add
+		add_search_indexes()
 		log_message("POS Next installation completed successfully", level="success")
 	except Exception as e:
 		frappe.db.rollback()
@@ -44,6 +46,16 @@ def after_migrate():
 		raise
 
 
+def add_search_indexes():
+	"""Create the Item indexes used by item listing and search"""
+	from pos_next.api.item_trigrams import enqueue_item_trigram_rebuild
+	from pos_next.api.items import add_item_search_indexes
+
+	add_item_search_indexes()
+	enqueue_item_trigram_rebuild()
+	log_message("Created item search indexes", level="info")
+
+
 def install_fixtures(quiet=False):
 	"""
 	Install or update fixtures from JSON files
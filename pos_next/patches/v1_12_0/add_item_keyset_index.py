@@ -0,0 +1,6 @@
+from pos_next.api.items import add_item_search_indexes
+
+
+def execute():
+	"""Index Item on (item_name, name) so get_items cursor pages are index range scans."""
+	add_item_search_indexes()
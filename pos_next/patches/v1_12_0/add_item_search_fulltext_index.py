@@ -0,0 +1,6 @@
+from pos_next.api.items import add_item_search_indexes
+
+
+def execute():
+	"""Add the FULLTEXT index used by get_items search and reset its cached availability."""
+	add_item_search_indexes()
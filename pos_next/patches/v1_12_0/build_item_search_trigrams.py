@@ -0,0 +1,6 @@
+from pos_next.api.item_trigrams import enqueue_item_trigram_rebuild
+
+
+def execute():
+	"""Build the trigram index used by get_items "contains" search in the background."""
+	enqueue_item_trigram_rebuild()
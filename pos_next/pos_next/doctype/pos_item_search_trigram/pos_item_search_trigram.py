@@ -0,0 +1,15 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class POSItemSearchTrigram(Document):
+	pass
+
+
+def on_doctype_update():
+	# Search reads every item having a trigram; hooks delete an item's rows
+	frappe.db.add_index("POS Item Search Trigram", ["trigram", "item_code"], "trigram_item_code")
+	frappe.db.add_index("POS Item Search Trigram", ["item_code"], "item_code")
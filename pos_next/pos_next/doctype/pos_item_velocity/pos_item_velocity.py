@@ -0,0 +1,17 @@
+# Copyright (c) 2025, POS Next and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class POSItemVelocity(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_unique("POS Item Velocity", ["pos_profile", "item_code"], "pos_profile_item_code")
+	# Popularity paging in get_items reads a profile's rows in this order
+	frappe.db.add_index(
+		"POS Item Velocity", ["pos_profile", "invoice_count DESC", "item_code"], "pos_profile_invoice_count"
+	)
@@ -5,20 +5,62 @@
 """
 Real-time event handlers for POS Next.
 Emits Socket.IO events when stock-affecting transactions occur.
+
+Stock updates are coalesced: document hooks (POS invoices, and the Stock
+Ledger Entry of any other stock movement) only record which (item,
+warehouse) pairs changed, and a short background job publishes them about
+STOCK_EVENT_WINDOW_MS later as one event per warehouse, so a burst of sales
+costs one stock query and one broadcast per warehouse instead of one per
+invoice.
+
+Events are scoped to Frappe document rooms rather than broadcast: stock
+updates go to the room of the warehouse (and of each group warehouse above
+it, with the group's totals), POS events to the room of the POS Profile.
+Terminals join those rooms when they connect. Stock events carry a
+per-warehouse sequence number and can be replayed (pos_next.api.stock_events).
+
+With the site config key ``pos_next_stock_event_mode`` set to "delta",
+invoices publish signed qty changes taken from their own lines instead, and
+terminals apply them to the quantities they hold (reconciling periodically
+with a full read).
 """
 
+import time
+
 import frappe
 from frappe import _
 
 from pos_next.api.items import get_stock_quantities
+from pos_next.api.stock_events import append_stock_event
+from pos_next.api.warehouse_tree import get_warehouse_ancestors
+
+
+# Coalesced stock updates: changed (item, warehouse) pairs are collected in a
+# Redis set and published by one short job per window, one event per warehouse
+STOCK_EVENT_PENDING_KEY = "pos_next:stock_events:pending"
+STOCK_EVENT_SCHEDULED_KEY = "pos_next:stock_events:scheduled"
+STOCK_EVENT_WINDOW_MS = 250
+_PAIR_SEPARATOR = "\x1f"
+
+# Delta mode (site config pos_next_stock_event_mode = "delta"): invoices queue
+# signed qty changes instead of pairs, summed in a Redis hash keyed by
+# item, warehouse, voucher and cancel flag, and published without reading stock
+STOCK_EVENT_MODE_DELTA = "delta"
+STOCK_EVENT_DELTA_KEY = "pos_next:stock_events:deltas"
+
+
+def get_stock_event_mode():
+	return frappe.conf.get("pos_next_stock_event_mode") or "quantities"
 
 
 def emit_stock_update_event(doc, method=None):
 	"""
-	Emit real-time stock update event when Sales Invoice is submitted.
+	Queue a real-time stock update when a POS Sales Invoice is submitted or cancelled.
 
-	This event notifies all connected POS terminals about stock changes,
-	allowing them to update their cached item quantities in real-time.
+	Only the changed (item, warehouse) pairs are recorded; quantities are read
+	and broadcast by publish_stock_updates, so the submit path never waits on
+	stock queries. In delta mode the signed qty changes of the invoice lines
+	are queued instead and no stock is read at all.
 
 	Args:
 		doc: Sales Invoice document
@@ -31,72 +73,296 @@ def emit_stock_update_event(doc, method=None):
 	if hasattr(doc, 'is_pos') and not doc.is_pos:
 		return
 
+	if get_stock_event_mode() == STOCK_EVENT_MODE_DELTA:
+		# Its ledger entries must not trigger a stock read (see on_stock_ledger_entry_submit)
+		frappe.flags.setdefault("pos_next_stock_event_vouchers", set()).add((doc.doctype, doc.name))
+		deltas = _get_invoice_stock_deltas(doc, method)
+		if deltas:
+			queue_stock_deltas(deltas)
+		return
+
+	pairs = {(item.item_code, item.warehouse) for item in doc.items if _affects_stock(item)}
+	if pairs:
+		queue_stock_updates(pairs)
+
+
+def _affects_stock(item):
+	# Skip rows that don't affect stock
+	if not getattr(item, "item_code", None) or not getattr(item, "warehouse", None):
+		return False
+
+	if hasattr(item, "is_stock_item") and item.is_stock_item is not None:
+		return bool(int(item.is_stock_item))
+	if hasattr(item, "stock_qty"):
+		return bool(frappe.utils.flt(item.stock_qty))
+	return True
+
+
+def _get_invoice_stock_deltas(doc, method):
+	"""
+	Return {(item_code, warehouse, voucher, is_cancelled): qty change} of an invoice.
+
+	Computed from the document alone: submitting removes each line's stock_qty
+	(returns have negative quantities and so add stock back), cancelling
+	reverses it. Product Bundle lines are replaced by their packed_items
+	components, which is what the stock ledger moves. Non-stock items and
+	lines delivered by the supplier are skipped.
+	"""
+	is_cancelled = 1 if method == "on_cancel" else 0
+	sign = 1 if is_cancelled else -1
+	packed_items = doc.get("packed_items") or []
+	bundle_rows = {packed.parent_detail_docname for packed in packed_items}
+
+	deltas = {}
+
+	def add(item_code, warehouse, qty):
+		key = (item_code, warehouse, doc.name, is_cancelled)
+		deltas[key] = deltas.get(key, 0) + sign * frappe.utils.flt(qty)
+
+	def is_stock_row(row):
+		# Sales Invoice Item has no is_stock_item field: read it from the (cached) Item
+		return (
+			row.item_code
+			and row.warehouse
+			and frappe.get_cached_value("Item", row.item_code, "is_stock_item")
+		)
+
+	for item in doc.items:
+		if item.name not in bundle_rows and not item.get("delivered_by_supplier") and is_stock_row(item):
+			add(item.item_code, item.warehouse, item.stock_qty)
+
+	for packed in packed_items:
+		if is_stock_row(packed):
+			add(packed.item_code, packed.warehouse, packed.qty)
+
+	return {key: qty for key, qty in deltas.items() if qty}
+
+
+def on_stock_ledger_entry_submit(doc, method=None):
+	"""
+	Stock Ledger Entry on_submit: queue a stock update for every stock movement.
+
+	Every stock transaction (Purchase Receipt, Stock Entry, Delivery Note,
+	Stock Reconciliation, ...) submits ledger entries, and so does cancelling
+	one (reversal entries). In delta mode POS invoices are skipped after
+	commit, since emit_stock_update_event already queued their deltas;
+	otherwise their pairs simply merge into the same set.
+	"""
+	pending = frappe.flags.setdefault("pos_next_stock_ledger_pairs", {})
+	if not pending:
+		frappe.db.after_commit.add(_flush_stock_ledger_pairs)
+		frappe.db.after_rollback.add(_discard_stock_ledger_pairs)
+	pending.setdefault((doc.voucher_type, doc.voucher_no), set()).add((doc.item_code, doc.warehouse))
+
+
+def _discard_stock_ledger_pairs():
+	frappe.flags.pop("pos_next_stock_ledger_pairs", None)
+	frappe.flags.pop("pos_next_stock_event_vouchers", None)
+
+
+def _flush_stock_ledger_pairs():
+	pending = frappe.flags.pop("pos_next_stock_ledger_pairs", None) or {}
+	handled = frappe.flags.pop("pos_next_stock_event_vouchers", None) or set()
+
+	pairs = set()
+	for voucher, voucher_pairs in pending.items():
+		if voucher not in handled:
+			pairs.update(voucher_pairs)
+	if pairs:
+		_add_pending_pairs(pairs)
+
+
+def queue_stock_updates(pairs):
+	"""Record changed (item_code, warehouse) pairs once per transaction, after commit."""
+	pending = frappe.flags.setdefault("pos_next_stock_event_pairs", set())
+	if not pending:
+		frappe.db.after_commit.add(_flush_stock_event_pairs)
+		frappe.db.after_rollback.add(lambda: frappe.flags.pop("pos_next_stock_event_pairs", None))
+	pending.update(pairs)
+
+
+def queue_stock_deltas(deltas):
+	"""Record {(item_code, warehouse, voucher, is_cancelled): qty} changes, after commit."""
+	pending = frappe.flags.setdefault("pos_next_stock_event_deltas", {})
+	if not pending:
+		frappe.db.after_commit.add(_flush_stock_event_deltas)
+		frappe.db.after_rollback.add(lambda: frappe.flags.pop("pos_next_stock_event_deltas", None))
+	for key, qty in deltas.items():
+		pending[key] = pending.get(key, 0) + qty
+
+
+def _schedule_publisher(cache):
+	# The first change of a window schedules the publisher; later ones ride along.
+	# The flag expires on its own in case the job never runs.
+	if cache.set(cache.make_key(STOCK_EVENT_SCHEDULED_KEY), "1", nx=True, px=STOCK_EVENT_WINDOW_MS * 20):
+		frappe.enqueue("pos_next.realtime_events.publish_stock_updates", queue="short")
+
+
+def _flush_stock_event_pairs():
+	pairs = frappe.flags.pop("pos_next_stock_event_pairs", None)
+	if pairs:
+		_add_pending_pairs(pairs)
+
+
+def _add_pending_pairs(pairs):
+	try:
+		cache = frappe.cache()
+		# Raw pipeline, like _take_pending: RedisWrapper.sadd would prefix the key again
+		pipe = cache.pipeline(transaction=False)
+		pipe.sadd(
+			cache.make_key(STOCK_EVENT_PENDING_KEY),
+			*(f"{item_code}{_PAIR_SEPARATOR}{warehouse}" for item_code, warehouse in pairs),
+		)
+		pipe.execute()
+		_schedule_publisher(cache)
+	except Exception as e:
+		# Log error but don't fail the request
+		frappe.log_error(
+			title=_("Real-time Stock Update Event Error"),
+			message=f"Failed to queue stock update event: {str(e)}"
+		)
+
+
+def _flush_stock_event_deltas():
+	deltas = frappe.flags.pop("pos_next_stock_event_deltas", None)
+	if not deltas:
+		return
+
 	try:
-		# Collect unique item codes per warehouse to avoid redundant queries
-		item_codes_by_warehouse = {}
-		for item in doc.items:
-			item_code = getattr(item, "item_code", None)
-			warehouse = getattr(item, "warehouse", None)
-
-			# Skip rows that don't affect stock
-			if not item_code or not warehouse:
-				continue
-
-			if hasattr(item, "is_stock_item") and item.is_stock_item is not None:
-				if not int(item.is_stock_item):
-					continue
-			elif hasattr(item, "stock_qty") and not frappe.utils.flt(item.stock_qty):
-				continue
-
-			item_codes_by_warehouse.setdefault(warehouse, set()).add(item_code)
-
-		if not item_codes_by_warehouse:
-			return
-
-		# Build stock updates with current quantities
-		stock_updates = []
-		warehouses = set()
-		for warehouse, codes in item_codes_by_warehouse.items():
-			warehouses.add(warehouse)
+		cache = frappe.cache()
+		key = cache.make_key(STOCK_EVENT_DELTA_KEY)
+		pipe = cache.pipeline(transaction=False)
+		for (item_code, warehouse, voucher, is_cancelled), qty in deltas.items():
+			field = _PAIR_SEPARATOR.join((item_code, warehouse, voucher, str(is_cancelled)))
+			pipe.hincrbyfloat(key, field, qty)
+		pipe.execute()
+		_schedule_publisher(cache)
+	except Exception as e:
+		frappe.log_error(
+			title=_("Real-time Stock Update Event Error"),
+			message=f"Failed to queue stock delta event: {str(e)}"
+		)
+
+
+def _take_pending(command, key):
+	"""Atomically read and delete a pending Redis key."""
+	cache = frappe.cache()
+	pipe = cache.pipeline(transaction=True)
+	getattr(pipe, command)(cache.make_key(key))
+	pipe.delete(cache.make_key(key))
+	return pipe.execute()[0]
+
+
+def _take_pending_pairs():
+	"""Atomically remove and return the pending pairs as {warehouse: {item_code}}."""
+	item_codes_by_warehouse = {}
+	for member in _take_pending("smembers", STOCK_EVENT_PENDING_KEY) or set():
+		item_code, _sep, warehouse = frappe.safe_decode(member).partition(_PAIR_SEPARATOR)
+		item_codes_by_warehouse.setdefault(warehouse, set()).add(item_code)
+	return item_codes_by_warehouse
+
+
+def _take_pending_deltas():
+	"""Atomically remove and return the pending deltas as {warehouse: {(item_code, voucher, is_cancelled): qty}}."""
+	deltas_by_warehouse = {}
+	for field, qty in (_take_pending("hgetall", STOCK_EVENT_DELTA_KEY) or {}).items():
+		item_code, warehouse, voucher, is_cancelled = frappe.safe_decode(field).split(_PAIR_SEPARATOR)
+		deltas_by_warehouse.setdefault(warehouse, {})[(item_code, voucher, int(is_cancelled))] = (
+			frappe.utils.flt(frappe.safe_decode(qty))
+		)
+	return deltas_by_warehouse
+
+
+def publish_stock_updates():
+	"""
+	Background job: wait for the coalescing window, then publish one
+	pos_stock_update event per warehouse room with the current quantities of
+	every item changed in it. Group warehouse rooms get the group's totals.
+
+	Queued deltas are published first, as a separate "delta" event per room,
+	so quantities read afterwards (which already include them) win.
+	"""
+	time.sleep(STOCK_EVENT_WINDOW_MS / 1000)
+
+	# Clear the schedule flag first: changes queued from now on schedule a new run
+	cache = frappe.cache()
+	cache.delete(cache.make_key(STOCK_EVENT_SCHEDULED_KEY))
+
+	deltas_by_room = {}
+	for warehouse, deltas in _take_pending_deltas().items():
+		for room_warehouse in get_warehouse_ancestors([warehouse]):
+			room_deltas = deltas_by_room.setdefault(room_warehouse, {})
+			for key, qty in deltas.items():
+				room_deltas[key] = room_deltas.get(key, 0) + qty
+
+	for warehouse, deltas in deltas_by_room.items():
+		stock_updates = [
+			{
+				"item_code": item_code,
+				"warehouse": warehouse,
+				"delta_qty": qty,
+				"voucher": voucher,
+				"is_cancelled": is_cancelled,
+			}
+			for (item_code, voucher, is_cancelled), qty in deltas.items()
+			if qty
+		]
+		if stock_updates:
+			_publish_stock_event(warehouse, stock_updates, "delta")
+
+	codes_by_room = {}
+	for warehouse, codes in _take_pending_pairs().items():
+		for room_warehouse in get_warehouse_ancestors([warehouse]):
+			codes_by_room.setdefault(room_warehouse, set()).update(codes)
+
+	for warehouse, codes in codes_by_room.items():
+		try:
 			# Use shared stock utility to keep logic consistent with API responses
-			warehouse_updates = get_stock_quantities(list(codes), warehouse)
+			stock_updates = get_stock_quantities(list(codes), warehouse)
+		except Exception as e:
+			frappe.log_error(
+				title=_("Real-time Stock Update Event Error"),
+				message=f"Failed to read stock for {warehouse}: {str(e)}"
+			)
+			continue
 
-			# Ensure events always have numeric qty fields, even if API returns None
-			for update in warehouse_updates:
-				actual_qty = frappe.utils.flt(update.get("actual_qty"))
-				update["actual_qty"] = actual_qty
-				update["stock_qty"] = actual_qty if update.get("stock_qty") is None else update["stock_qty"]
-				update["warehouse"] = update.get("warehouse") or warehouse
+		# Ensure events always have numeric qty fields, even if API returns None
+		for update in stock_updates:
+			actual_qty = frappe.utils.flt(update.get("actual_qty"))
+			update["actual_qty"] = actual_qty
+			update["stock_qty"] = actual_qty if update.get("stock_qty") is None else update["stock_qty"]
+			update["warehouse"] = update.get("warehouse") or warehouse
 
-			stock_updates.extend(warehouse_updates)
+		if stock_updates:
+			_publish_stock_event(warehouse, stock_updates, "update")
 
-		if not stock_updates:
-			return
 
-		# Prepare event data
-		event_data = {
-			"invoice_name": doc.name,
-			"warehouses": list(warehouses),
-			"stock_updates": stock_updates,
-			"timestamp": frappe.utils.now(),
-			"event_type": "cancel" if method == "on_cancel" else "submit"
-		}
+def _publish_stock_event(warehouse, stock_updates, event_type):
+	"""Number, log and broadcast one pos_stock_update event to a warehouse room."""
+	try:
+		# Numbered and logged first, so a client seeing this seq can replay anything before it
+		message = append_stock_event(
+			warehouse,
+			{
+				"warehouses": [warehouse],
+				"stock_updates": stock_updates,
+				"timestamp": frappe.utils.now(),
+				"event_type": event_type,
+			},
+		)
 
-		# Emit event to all connected clients
 		# Event name: pos_stock_update
-		# Clients can subscribe to this event and filter by warehouse
+		# Only terminals that joined the warehouse's room receive it
 		frappe.publish_realtime(
 			event="pos_stock_update",
-			message=event_data,
-			user=None,  # Broadcast to all users
-			after_commit=True  # Only emit after successful DB commit
+			message=message,
+			doctype="Warehouse",
+			docname=warehouse,
 		)
-
 	except Exception as e:
-		# Log error but don't fail the transaction
 		frappe.log_error(
 			title=_("Real-time Stock Update Event Error"),
-			message=f"Failed to emit stock update event for {doc.name}: {str(e)}"
+			message=f"Failed to publish stock update event for {warehouse}: {str(e)}"
 		)
 
 
@@ -111,7 +377,8 @@ def emit_invoice_created_event(doc, method=None):
 		doc: Sales Invoice document
 		method: Hook method name
 	"""
-	if not doc.is_pos:
+	# Without a profile there is no room to publish to
+	if not doc.is_pos or not doc.pos_profile:
 		return
 
 	try:
@@ -126,7 +393,8 @@ def emit_invoice_created_event(doc, method=None):
 		frappe.publish_realtime(
 			event="pos_invoice_created",
 			message=event_data,
-			user=None,
+			doctype="POS Profile",
+			docname=doc.pos_profile,  # Terminals of the same profile only
 			after_commit=True
 		)
 
@@ -163,13 +431,14 @@ def emit_pos_profile_updated_event(doc, method=None):
 				"change_type": "item_groups_updated"
 			}
 
-			# Emit event to all connected clients
+			# Emit event to the terminals using this profile
 			# Event name: pos_profile_updated
 			# Clients can subscribe to this event and invalidate their cache
 			frappe.publish_realtime(
 				event="pos_profile_updated",
 				message=event_data,
-				user=None,  # Broadcast to all users
+				doctype="POS Profile",
+				docname=doc.name,  # Room joined by terminals of this profile
 				after_commit=True  # Only emit after successful DB commit
 			)
 
@@ -7,6 +7,8 @@
 import frappe
 from frappe.utils import nowdate, getdate
 
+from pos_next.api.change_tracking import mark_changed
+
 
 def disable_expired_pricing_rules():
 	"""
@@ -62,6 +64,10 @@ def disable_expired_pricing_rules():
 				frappe.logger().error(error_msg)
 				errors.append(error_msg)
 
+		# set_value fires no doc events: invalidate cached offers explicitly
+		if disabled_count:
+			mark_changed("Pricing Rule")
+
 		# Commit all changes
 		frappe.db.commit()
 
@@ -153,6 +159,10 @@ def disable_expired_promotional_schemes():
 				frappe.logger().error(error_msg)
 				errors.append(error_msg)
 
+		# set_value fires no doc events: invalidate cached offers explicitly
+		if disabled_count:
+			mark_changed("Promotional Scheme")
+
 		# Commit all changes
 		frappe.db.commit()
 